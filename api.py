@@ -1,54 +1,438 @@
-from fastapi import FastAPI
-from app.models import QueryModel, RecommendationResponse, HealthResponse, AssessmentRecommendation
-from app.data_processing import load_and_preprocess_data, create_embeddings
-from app.search import search_assessments
-from app.gemini import setup_gemini, extract_parameters
+import asyncio
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from app.models import (
+    QueryModel, BatchQueryModel, RecommendationResponse, BatchRecommendationResponse,
+    HealthResponse, CacheStatsResponse, ReloadResponse, StartupResponse
+)
+from app.catalog import CatalogManager
+from app.data_processing import query_encoder
+from app.search import (
+    encode_queries, search_assessments_async, search_assessments_batch_async, search_assessments_fused_async,
+    search_assessments_stream,
+    query_embedding_cache, semantic_cache, semantic_cache_key
+)
+from app.rerankers import get_reranker
+from app.metrics import (
+    REQUESTS, REQUEST_SECONDS, timed, record_cache, run_in_executor,
+    start_request_timings, server_timing_header, render_metrics
+)
+from app.tracing import setup_tracing, shutdown_tracing
+from app.gemini import (
+    LazyGeminiModel, AsyncGeminiClient, extract_parameters_async, llm_deadline, track_llm_fallbacks, response_cache
+)
+from app.startup import StartupTimer
+from app.config import SEARCH_WORKERS, METRICS_ENABLED, ADMIN_TOKEN, LLM_MODE, RERANKER, WARMUP_MODELS, LLM_DEADLINE
 
-# Initialize the application
-app = FastAPI(title="SHL Assessment Recommendation API")
+# Phase timings from process start to serving, ready (catalog mapped) and warm (models loaded)
+startup = StartupTimer()
+
+# The catalog (DataFrame, embeddings, indexes, filters) lives in swappable snapshots.
+# It is loaded in the background at startup so each worker only maps the shared
+# on-disk index. Nothing heavy happens at import: the models and the Gemini SDK are
+# loaded by the background warm-up (or on the first query that needs them).
+catalog = CatalogManager()
+# Queries may use an optimized encoder (QUERY_ENCODER); catalog rows use the catalog model
+embedding_model = query_encoder(catalog.embedding_model)
+gemini_model = LazyGeminiModel()
+llm_client = AsyncGeminiClient()
+
+# Encoding and scoring are CPU-bound, keep them off the event loop and the default threadpool
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+def load_catalog():
+    """Load the first snapshot, then start watching the CSV"""
+    print("Loading catalog...")
+    try:
+        catalog.reload()
+    except Exception as e:
+        print(f"Error loading catalog: {e}")
+        return
+    catalog.start_watching()
+    print("Catalog loaded successfully!")
+
+def warm_up():
+    """Load the catalog, then the query encoder and the Gemini SDK, timing each phase"""
+    with startup.phase("catalog"):
+        load_catalog()
+    if catalog.ready:
+        startup.mark("ready")
+    if WARMUP_MODELS:
+        # One encode also runs the first forward pass, which is slower than the rest
+        models = [("query_encoder", lambda: embedding_model.encode(["warm-up"])), ("gemini_sdk", gemini_model.load)]
+        for name, load in models:
+            try:
+                with startup.phase(name):
+                    load()
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+        startup.mark("warm")
+    print(f"Startup: {startup.summary()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup.phase("tracing"):
+        setup_tracing()
+    # The server starts answering now: /health right away, /ready with 503 until the catalog is mapped
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    startup.mark("serving")
+    yield
+    await warmup
+    catalog.stop_watching()
+    await llm_client.aclose()
+    search_executor.shutdown(wait=False)
+    shutdown_tracing()
+
+router = APIRouter()
+
+async def record_request_metrics(request: Request, call_next):
+    """Count and time requests; add a Server-Timing header when enabled"""
+    request_timings = start_request_timings()
+    if not METRICS_ENABLED and request_timings is None:
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, to keep the label set bounded
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+    REQUESTS.inc(endpoint, str(response.status_code))
+    if request_timings:
+        response.headers["Server-Timing"] = server_timing_header(request_timings)
+    return response
+
+async def bound_llm_calls(request: Request, call_next):
+    """Give each request one LLM_DEADLINE budget shared by all its Gemini calls and retries
+
+    /recommend/batch is exempt: it bounds each query's calls itself (see within_deadline).
+    """
+    if request.url.path == "/recommend/batch":
+        return await call_next(request)
+    with llm_deadline(LLM_DEADLINE):
+        return await call_next(request)
 
-# Load and preprocess data
-print("Loading and preprocessing data...")
-df = load_and_preprocess_data()
-embedding_model, embeddings_array = create_embeddings(df)
-gemini_model = setup_gemini()
-print("Data and models loaded successfully!")
+async def within_deadline(awaitable):
+    """Await one batch query's LLM work under its own LLM_DEADLINE
 
-@app.get("/health", response_model=HealthResponse)
+    Run it as its own task (asyncio.gather does this), so the deadline does not
+    leak into the other queries of the batch.
+    """
+    with llm_deadline(LLM_DEADLINE):
+        return await awaitable
+
+@router.get("/health", response_model=HealthResponse)
 def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up (see /ready for readiness)"""
     return {"status": "healthy", "message": "API is running"}
 
-@app.post("/recommend", response_model=RecommendationResponse)
-def recommend_assessments(request: QueryModel):
+@router.get("/ready", response_model=HealthResponse)
+def readiness_check(response: Response):
+    """Readiness check: 200 once the catalog index is mapped, 503 while loading"""
+    if not catalog.ready:
+        response.status_code = 503
+        return {"status": "starting", "message": "Catalog is loading"}
+    snapshot = catalog.snapshot
+    return {"status": "ready", "message": f"Catalog version {snapshot.version} mapped ({len(snapshot.store)} rows)"}
+
+def current_snapshot():
+    """The catalog snapshot for a request, or 503 while the first one is loading"""
+    if not catalog.ready:
+        raise HTTPException(status_code=503, detail="Catalog is loading, retry shortly")
+    return catalog.snapshot
+
+@router.get("/startup", response_model=StartupResponse)
+def startup_report():
+    """Startup phase durations and seconds from process start to serving, ready and warm"""
+    return startup.report()
+
+@router.get("/metrics")
+def metrics():
+    """Request, stage latency, cache and LLM error metrics in Prometheus text format"""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.post("/admin/reload", response_model=ReloadResponse)
+async def reload_catalog(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Load the changed catalog CSV into a new snapshot without interrupting requests"""
+    # Fail closed: without a configured ADMIN_TOKEN the endpoint does not exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        # Runs outside the search executor so searches keep their workers during a reload
+        summary = await asyncio.to_thread(catalog.reload, force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Catalog reload failed: {e}")
+    # Other API workers hold their own snapshot; their catalog watchers pick this up
+    catalog.request_reload(force)
+    return summary
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+def cache_stats():
+    """Hit, miss and eviction counters of the LLM response cache"""
+    return {
+        "llm": response_cache.stats(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "semantic": semantic_cache.stats() if semantic_cache is not None else None
+    }
+
+def encode_query(query):
+    """Normalized embedding of one query, timed as the encode stage"""
+    with timed("encode"):
+        return encode_queries(embedding_model, [query])[0]
+
+def use_fused_llm(reranker_name):
+    """LLM_MODE=fused replaces the two Gemini calls only when Gemini reranks"""
+    return LLM_MODE == "fused" and (reranker_name or RERANKER) == "gemini"
+
+def cacheable(reranker_name, fallbacks):
+    """Only results Gemini actually reranked, with no LLM call falling back, go to the semantic cache"""
+    return (reranker_name or RERANKER) == "gemini" and not fallbacks
+
+def build_recommendations(results):
+    """Response models of the results, reused from the catalog store"""
+    return results.recommendations()
+
+@router.post("/recommend", response_model=RecommendationResponse)
+async def recommend_assessments(request: QueryModel):
     """Recommend assessments based on query"""
     query = request.query
+    # Keep the same catalog snapshot for the whole request, even if a reload swaps it
+    snapshot = current_snapshot()
+    fallbacks = track_llm_fallbacks()
+    fused = use_fused_llm(request.reranker)
+    
+    # Encode the query while parameter extraction is in flight; extraction starts right
+    # away rather than after the semantic cache lookup, and is cancelled on a hit
+    embedding_future = run_in_executor(search_executor, encode_query, query)
+    extraction = None if fused else asyncio.ensure_future(extract_parameters_async(query, llm_client))
+    try:
+        # A near-duplicate of a recently served query with the same filters skips Gemini entirely
+        if semantic_cache is not None:
+            filter_key = semantic_cache_key(
+                duration_limit=request.duration_limit,
+                test_types=request.test_types,
+                remote_support=request.remote_support,
+                adaptive_support=request.adaptive_support,
+                reranker=request.reranker,
+                catalog_version=snapshot.version
+            )
+            cached = semantic_cache.lookup(await embedding_future, filter_key)
+            record_cache("semantic", cached is not None)
+            if cached is not None:
+                return {"recommendations": cached}
+        
+        if fused:
+            query_embedding = await embedding_future
+            # One Gemini call extracts the parameters and ranks; its duration limit is applied afterwards
+            results, _, trace_id = await search_assessments_fused_async(
+                query=query,
+                df=snapshot.store,
+                embedding_model=embedding_model,
+                embeddings_array=snapshot.vector_index,
+                llm_client=llm_client,
+                executor=search_executor,
+                top_k=10,
+                duration_limit=request.duration_limit,
+                filters=snapshot.filters,
+                test_types=request.test_types,
+                remote_support=request.remote_support,
+                adaptive_support=request.adaptive_support,
+                query_embedding=query_embedding,
+                lexical_index=snapshot.lexical_index
+            )
+        else:
+            params = await extraction
+            query_embedding = await embedding_future
+            
+            # An explicit duration limit in the request overrides the extracted one
+            duration_limit = request.duration_limit or params.get("duration_limit")
+            
+            # Search for relevant assessments
+            results, trace_id = await search_assessments_async(
+                query=query,
+                df=snapshot.store,
+                embedding_model=embedding_model,
+                embeddings_array=snapshot.vector_index,
+                llm_client=llm_client,
+                executor=search_executor,
+                top_k=10,
+                duration_limit=duration_limit,
+                filters=snapshot.filters,
+                test_types=request.test_types,
+                remote_support=request.remote_support,
+                adaptive_support=request.adaptive_support,
+                query_embedding=query_embedding,
+                lexical_index=snapshot.lexical_index,
+                reranker=get_reranker(request.reranker, gemini_model, llm_client)
+            )
+    finally:
+        if extraction is not None and not extraction.done():
+            extraction.cancel()
+    
+    with timed("build_response"):
+        recommendations = build_recommendations(results)
+    if semantic_cache is not None and cacheable(request.reranker, fallbacks):
+        # Parameter extraction and reranking: Gemini calls saved per future hit
+        semantic_cache.store(query_embedding, filter_key, recommendations, llm_calls=1 if fused else 2)
+    
+    return {"recommendations": recommendations}
+
+def stream_event(stage, recommendations, reranked, trace_id, sse):
+    """One event of /recommend/stream as an SSE message or an NDJSON line"""
+    payload = json.dumps({
+        "stage": stage,
+        "reranked": reranked,
+        "trace_id": trace_id,
+        "recommendations": [recommendation.model_dump() for recommendation in recommendations]
+    })
+    return f"event: {stage}\ndata: {payload}\n\n" if sse else payload + "\n"
+
+@router.post("/recommend/stream")
+async def recommend_assessments_stream(request: QueryModel, accept: Optional[str] = Header(None)):
+    """Stream recommendations: vector search results at once, then the LLM-refined list
+
+    Events are NDJSON lines, or Server-Sent Events with Accept: text/event-stream.
+    The "vector" event comes before any Gemini call; the "final" event has the
+    reranked list, or the vector order with reranked false if the LLM timed out.
+    """
+    query = request.query
+    snapshot = current_snapshot()
+    sse = "text/event-stream" in (accept or "")
     
+    # Encode first: the semantic cache needs the embedding and the stream reuses it
+    query_embedding = await run_in_executor(search_executor, encode_query, query)
+    if semantic_cache is not None:
+        filter_key = semantic_cache_key(
+            duration_limit=request.duration_limit,
+            test_types=request.test_types,
+            remote_support=request.remote_support,
+            adaptive_support=request.adaptive_support,
+            reranker=request.reranker,
+            catalog_version=snapshot.version
+        )
+        cached = semantic_cache.lookup(query_embedding, filter_key)
+        record_cache("semantic", cached is not None)
     
-    params = extract_parameters(query, gemini_model)
+    fused = use_fused_llm(request.reranker)
     
-    # Search for relevant assessments
-    results = search_assessments(
-        query=query,
-        df=df,
+    async def events():
+        if semantic_cache is not None and cached is not None:
+            yield stream_event("final", cached, True, None, sse)
+            return
+        # Set here: the LLM calls run in (tasks started from) the task iterating this stream
+        fallbacks = track_llm_fallbacks()
+        # aclosing: a client that disconnects also cancels the pending LLM calls
+        stream = aclosing(search_assessments_stream(
+            query=query,
+            df=snapshot.store,
+            embedding_model=embedding_model,
+            embeddings_array=snapshot.vector_index,
+            llm_client=llm_client,
+            executor=search_executor,
+            top_k=10,
+            duration_limit=request.duration_limit,
+            filters=snapshot.filters,
+            test_types=request.test_types,
+            remote_support=request.remote_support,
+            adaptive_support=request.adaptive_support,
+            query_embedding=query_embedding,
+            lexical_index=snapshot.lexical_index,
+            reranker=None if fused else get_reranker(request.reranker, gemini_model, llm_client),
+            fused=fused
+        ))
+        async with stream as events_stream:
+            async for event in events_stream:
+                recommendations = build_recommendations(event.results)
+                if event.reranked and semantic_cache is not None and cacheable(request.reranker, fallbacks):
+                    semantic_cache.store(query_embedding, filter_key, recommendations, llm_calls=1 if fused else 2)
+                yield stream_event(event.stage, recommendations, event.reranked, event.trace_id, sse)
+    
+    return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+@router.post("/recommend/batch", response_model=BatchRecommendationResponse)
+async def recommend_assessments_batch(request: BatchQueryModel):
+    """Recommend assessments for many queries, encoding them in one pass"""
+    snapshot = current_snapshot()
+    if use_fused_llm(request.reranker):
+        return await recommend_batch_fused(request, snapshot)
+    # Extract parameters, and later rerank, for all queries concurrently (bounded by the client).
+    # Every query gets its own LLM deadline for extraction and another for its rerank, so a
+    # large batch is not cut short by one request-wide budget
+    extracted = await asyncio.gather(
+        *(within_deadline(extract_parameters_async(item.query, llm_client)) for item in request.queries)
+    )
+    
+    constraints = []
+    for item, params in zip(request.queries, extracted):
+        constraints.append({
+            "duration_limit": item.duration_limit or params.get("duration_limit"),
+            "test_types": item.test_types,
+            "remote_support": item.remote_support,
+            "adaptive_support": item.adaptive_support
+        })
+    
+    outputs = await search_assessments_batch_async(
+        queries=[item.query for item in request.queries],
+        df=snapshot.store,
         embedding_model=embedding_model,
-        embeddings_array=embeddings_array,
-        gemini_model=gemini_model,
+        embeddings_array=snapshot.vector_index,
+        llm_client=llm_client,
+        executor=search_executor,
         top_k=10,
-        duration_limit=params.get("duration_limit")
+        constraints=constraints,
+        filters=snapshot.filters,
+        lexical_index=snapshot.lexical_index,
+        reranker=get_reranker(request.reranker, gemini_model, llm_client),
+        llm_deadline_seconds=LLM_DEADLINE
     )
     
- 
-    recommendations = []
-    for _, row in results.iterrows():
-        recommendation = AssessmentRecommendation(
-            name=row["title"],
-            url=row["url"],
-            remote_testing_support=row["remote_support"],
-            adaptive_support=row["adaptive_support"],
-            duration=int(row["duration"]),
-            test_type=row["test_type"]
+    with timed("build_response"):
+        return {"results": [{"recommendations": build_recommendations(results)} for results, _ in outputs]}
+
+async def recommend_batch_fused(request: BatchQueryModel, snapshot):
+    """Batch recommendations with LLM_MODE=fused: one encoding pass, one Gemini call per query"""
+    with timed("encode"):
+        query_embeddings = await run_in_executor(
+            search_executor, encode_queries, embedding_model, [item.query for item in request.queries]
         )
-        recommendations.append(recommendation)
+    outputs = await asyncio.gather(*(
+        within_deadline(search_assessments_fused_async(
+            query=item.query,
+            df=snapshot.store,
+            embedding_model=embedding_model,
+            embeddings_array=snapshot.vector_index,
+            llm_client=llm_client,
+            executor=search_executor,
+            top_k=10,
+            duration_limit=item.duration_limit,
+            filters=snapshot.filters,
+            test_types=item.test_types,
+            remote_support=item.remote_support,
+            adaptive_support=item.adaptive_support,
+            query_embedding=query_embedding,
+            lexical_index=snapshot.lexical_index
+        ))
+        for item, query_embedding in zip(request.queries, query_embeddings)
+    ))
     
-    return {"recommendations": recommendations}
\ No newline at end of file
+    with timed("build_response"):
+        return {"results": [{"recommendations": build_recommendations(results)} for results, _, _ in outputs]}
+
+def create_app() -> FastAPI:
+    """Build the API application; loading happens in the lifespan, after the server starts"""
+    startup.mark("imported")
+    application = FastAPI(title="SHL Assessment Recommendation API", lifespan=lifespan)
+    application.middleware("http")(bound_llm_calls)
+    application.middleware("http")(record_request_metrics)
+    application.include_router(router)
+    return application
+
+# Initialize the application
+app = create_app()
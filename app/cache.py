@@ -0,0 +1,243 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Optional
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query for cache keys"""
+    return " ".join(query.lower().split())
+
+
+def make_key(*parts) -> str:
+    """Stable cache key from JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry time to live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class SQLiteCache:
+    """Persistent cache tier backed by SQLite, storing JSON values"""
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            # Drop expired rows first, then the least recently used ones over the limit
+            self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            over = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if over > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (over,)
+                )
+                self.evictions += over
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class ResponseCache:
+    """In-process LRU tier with an optional persistent SQLite tier behind it"""
+
+    def __init__(self, memory: LRUCache, persistent: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key, default=None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.persistent is not None:
+            value = self.persistent.get(key, _MISSING)
+            if value is not _MISSING:
+                # Promote to the memory tier for the next lookup
+                self.memory.set(key, value)
+                return value
+        return default
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+
+    def stats(self) -> dict:
+        stats = {"memory": self.memory.stats()}
+        if self.persistent is not None:
+            stats["persistent"] = self.persistent.stats()
+        return stats
+
+
+class SemanticCache:
+    """Final results of recently served queries, matched by embedding similarity
+
+    A lookup hits when a stored query with the same filter key has cosine
+    similarity >= threshold with the new (normalized) query embedding. Entries
+    live in a fixed-size ring buffer, so the oldest are replaced first.
+    """
+
+    def __init__(self, capacity: int = 512, threshold: float = 0.97, ttl: Optional[float] = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = None
+        self._entries = [None] * capacity
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_llm_calls = 0
+
+    def lookup(self, embedding, filter_key: str):
+        """Return the stored value for the closest matching query, or None"""
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ embedding
+            now = time.monotonic()
+            best, best_score = None, self.threshold
+            for slot in np.flatnonzero(similarities >= self.threshold):
+                entry = self._entries[slot]
+                if entry is None or entry[0] != filter_key:
+                    continue
+                if entry[3] is not None and entry[3] <= now:
+                    continue
+                if similarities[slot] >= best_score:
+                    best, best_score = entry, similarities[slot]
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_llm_calls += best[2]
+            return best[1]
+
+    def store(self, embedding, filter_key: str, value, llm_calls: int = 0):
+        """Remember the final results of a query and the LLM calls they took"""
+        if self.capacity <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(embedding)), dtype=np.float32)
+            slot = self._next
+            self._vectors[slot] = embedding
+            self._entries[slot] = (filter_key, value, llm_calls, expires_at)
+            self._next = (slot + 1) % self.capacity
+
+    def stats(self) -> dict:
+        return {
+            "size": sum(entry is not None for entry in self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "saved_llm_calls": self.saved_llm_calls
+        }
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+from .config import DATA_PATH, EMBEDDING_STORE_DIR, RETRIEVAL_MODE, CATALOG_POLL_INTERVAL
+from .data_processing import (
+    LazyEmbeddingModel, load_and_preprocess_data, create_embeddings, build_vector_index, build_lexical_index
+)
+from .embedding_store import file_hash, store_lock
+from .catalog_store import CatalogStore
+from .filters import FilterColumns, save_filter_columns, load_filter_columns
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# File in the store directory through which one API worker asks the others to reload
+RELOAD_REQUEST_FILE = "reload_request.json"
+
+# Columns compared to decide whether a row with a known URL changed
+CATALOG_COLUMNS = ['title', 'description', 'duration', 'test_type', 'remote_support', 'adaptive_support']
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Everything a request needs from the catalog, built together and never mutated
+
+    Requests take one snapshot at the start and use it throughout, so a reload
+    swapping in a new snapshot does not affect them. Requests read the compact
+    store; df is kept for diffing against the next version.
+    """
+    df: "pd.DataFrame"
+    store: CatalogStore
+    embeddings: Any
+    vector_index: Any
+    lexical_index: Any
+    filters: FilterColumns
+    version: int
+    csv_hash: str
+    loaded_at: float
+
+
+def diff_catalogs(old_df: "pd.DataFrame", new_df: "pd.DataFrame") -> dict:
+    """Compare two catalogs by URL
+
+    Returns:
+        {"added": [...], "removed": [...], "updated": [...], "reembedded": n}
+        where reembedded counts added rows plus rows whose embedded text changed
+    """
+    old_rows = dict(zip(old_df['url'], old_df[CATALOG_COLUMNS].astype(str).itertuples(index=False, name=None)))
+    new_rows = dict(zip(new_df['url'], new_df[CATALOG_COLUMNS].astype(str).itertuples(index=False, name=None)))
+    old_texts = dict(zip(old_df['url'], old_df['combined_text']))
+    new_texts = dict(zip(new_df['url'], new_df['combined_text']))
+
+    added = [url for url in new_rows if url not in old_rows]
+    removed = [url for url in old_rows if url not in new_rows]
+    updated = [url for url, row in new_rows.items() if url in old_rows and old_rows[url] != row]
+    text_changed = sum(1 for url in updated if old_texts[url] != new_texts[url])
+    return {"added": added, "removed": removed, "updated": updated, "reembedded": len(added) + text_changed}
+
+
+def _file_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CatalogManager:
+    """Owns the current catalog snapshot and replaces it when the CSV changes
+
+    reload() builds a complete new snapshot next to the current one (only rows
+    whose text changed are re-encoded, via the embedding store) and then swaps
+    the reference. The file can also be watched by a background thread.
+
+    Embeddings, the IVF index and the filter columns are memory-mapped from
+    store_dir, so processes loading the same catalog share their pages. The
+    embedding model is loaded lazily, only when something needs encoding.
+
+    Processes sharing store_dir (API workers) each hold their own snapshot:
+    request_reload() writes a reload request there, which the watcher of
+    every other process picks up on its next poll. When several of them see
+    the same CSV change, one rebuilds the store under store_lock() and the
+    others wait for it and only map the new files.
+    """
+
+    def __init__(
+        self,
+        data_path: str = DATA_PATH,
+        store_dir: str = EMBEDDING_STORE_DIR,
+        embedding_model=None,
+        retrieval_mode: str = RETRIEVAL_MODE
+    ):
+        self.data_path = data_path
+        self.store_dir = store_dir
+        self.embedding_model = embedding_model if embedding_model is not None else LazyEmbeddingModel()
+        self.retrieval_mode = retrieval_mode
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._reload_request_path = os.path.join(store_dir, RELOAD_REQUEST_FILE)
+        self._seen_request = None
+
+    @property
+    def ready(self) -> bool:
+        """True once a snapshot (with its index mapped) is available"""
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        if self._snapshot is None:
+            self.reload()
+        return self._snapshot
+
+    def _build(self, csv_hash: str, version: int):
+        df = load_and_preprocess_data(self.data_path)
+        store = CatalogStore.from_dataframe(df)
+        filters_dir = os.path.join(self.store_dir, "filters")
+        # Only one process sharing store_dir rebuilds; the others wait here and then map its files
+        with store_lock(self.store_dir):
+            self.embedding_model, embeddings = create_embeddings(
+                df, self.data_path, self.store_dir, model=self.embedding_model
+            )
+            filters = load_filter_columns(filters_dir, csv_hash)
+            if filters is None:
+                filters = store.filter_columns()
+                save_filter_columns(filters, filters_dir, csv_hash)
+            vector_index = build_vector_index(embeddings, store_dir=self.store_dir)
+        return df, CatalogSnapshot(
+            df=df,
+            store=store,
+            embeddings=embeddings,
+            vector_index=vector_index,
+            lexical_index=build_lexical_index(df) if self.retrieval_mode == "hybrid" else None,
+            filters=filters,
+            version=version,
+            csv_hash=csv_hash,
+            loaded_at=time.time()
+        )
+
+    def reload(self, force: bool = False) -> dict:
+        """Load the CSV into a new snapshot if it changed; returns a summary of the changes"""
+        with self._reload_lock:
+            start = time.perf_counter()
+            current = self._snapshot
+            csv_hash = file_hash(self.data_path)
+            if current is not None and current.csv_hash == csv_hash and not force:
+                return {"reloaded": False, "version": current.version, "rows": len(current.df)}
+
+            df, snapshot = self._build(csv_hash, current.version + 1 if current is not None else 1)
+            changes = diff_catalogs(current.df, df) if current is not None else {
+                "added": df['url'].tolist(), "removed": [], "updated": [], "reembedded": len(df)
+            }
+            # Single reference assignment: readers see either the old or the new snapshot
+            self._snapshot = snapshot
+            summary = {
+                "reloaded": True,
+                "version": snapshot.version,
+                "rows": len(df),
+                "added": len(changes["added"]),
+                "updated": len(changes["updated"]),
+                "removed": len(changes["removed"]),
+                "reembedded": changes["reembedded"],
+                "seconds": time.perf_counter() - start
+            }
+            print(f"Catalog version {snapshot.version} loaded: {summary}")
+            return summary
+
+    def request_reload(self, force: bool = False):
+        """Ask the other processes watching store_dir to reload (this one already has)"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{self._reload_request_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"force": force, "pid": os.getpid(), "requested_at": time.time()}, f)
+        os.replace(tmp_path, self._reload_request_path)
+        self._seen_request = _file_signature(self._reload_request_path)
+
+    def _check_reload_request(self):
+        """Reload if another process wrote a reload request since the last check"""
+        signature = _file_signature(self._reload_request_path)
+        if signature is None or signature == self._seen_request:
+            return
+        self._seen_request = signature
+        try:
+            with open(self._reload_request_path, "r", encoding="utf-8") as f:
+                force = bool(json.load(f).get("force"))
+        except (OSError, ValueError):
+            force = False
+        self.reload(force)
+
+    def _watch(self, interval: float):
+        last = _file_signature(self.data_path)
+        pending = None
+        while not self._stop.wait(interval):
+            try:
+                self._check_reload_request()
+            except Exception as e:
+                print(f"Error reloading catalog on request: {e}")
+            signature = _file_signature(self.data_path)
+            if signature is None or signature == last:
+                pending = None
+                continue
+            if signature != pending:
+                # Wait one more interval so a file still being written is not read half-way
+                pending = signature
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading catalog from {self.data_path}: {e}")
+            last, pending = signature, None
+
+    def start_watching(self, interval: float = CATALOG_POLL_INTERVAL):
+        """Poll the CSV and reload requests every interval seconds and reload on a change (0 disables)"""
+        if interval <= 0 or self._watcher is not None:
+            return
+        # Only requests made from now on: the first load already read the current CSV
+        self._seen_request = _file_signature(self._reload_request_path)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,191 @@
+import sys
+import numpy as np
+from typing import TYPE_CHECKING, List, Optional, Sequence
+from .filters import TEST_TYPE_BITS, FilterColumns
+from .models import AssessmentRecommendation
+from .prompts import estimate_tokens, prompt_row, type_letters
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns a CatalogStore keeps, in the order of the catalog CSV
+STORE_COLUMNS = ('url', 'title', 'description', 'duration', 'test_type', 'remote_support', 'adaptive_support')
+CATEGORICAL_COLUMNS = ('test_type', 'remote_support', 'adaptive_support')
+
+
+def _interned(values) -> np.ndarray:
+    """Read-only object array of interned strings (missing values become "")"""
+    array = np.array([sys.intern(value) if isinstance(value, str) else "" for value in values], dtype=object)
+    array.flags.writeable = False
+    return array
+
+
+def _categorical(values):
+    """Small integer codes plus the distinct values they index"""
+    import pandas as pd
+    codes, categories = pd.factorize(pd.Series(values).fillna("").astype(str))
+    categories = _interned(categories)
+    dtype = np.uint8 if len(categories) <= np.iinfo(np.uint8).max else np.int32
+    codes = codes.astype(dtype)
+    codes.flags.writeable = False
+    return codes, categories
+
+
+class CatalogStore:
+    """Immutable struct-of-arrays copy of the catalog for the request path
+
+    Strings are interned object arrays, the test type and support columns are
+    categorical codes, and response objects are built once per row on first use.
+    Each row's rerank prompt line and its token estimate are built at load.
+    Rows are addressed by their integer position, the same ids the vector
+    indexes return.
+    """
+    __slots__ = ('url', 'title', 'description', 'duration', '_codes', '_categories',
+                 '_test_type_category_bits', '_recommendations', 'prompt_row', 'prompt_tokens')
+
+    def __init__(self, url, title, description, duration, codes, categories):
+        self.url = url
+        self.title = title
+        self.description = description
+        self.duration = duration
+        self._codes = codes
+        self._categories = categories
+        # Test type bitmask of each distinct test_type string
+        self._test_type_category_bits = np.array([
+            sum(bit for name, bit in TEST_TYPE_BITS.items() if name in value)
+            for value in categories['test_type']
+        ], dtype=np.uint16)
+        self._recommendations: List[Optional[AssessmentRecommendation]] = [None] * len(url)
+        letters = [type_letters(value) for value in categories['test_type']]
+        self.prompt_row = _interned([
+            prompt_row(title[i], description[i], int(duration[i]), letters[code])
+            for i, code in enumerate(codes['test_type'].tolist())
+        ])
+        self.prompt_tokens = np.fromiter(
+            (estimate_tokens(row) for row in self.prompt_row), dtype=np.int32, count=len(url)
+        )
+        self.prompt_tokens.flags.writeable = False
+
+    @classmethod
+    def from_dataframe(cls, df: "pd.DataFrame") -> "CatalogStore":
+        import pandas as pd
+        duration = pd.to_numeric(df['duration'], errors='coerce').fillna(0).to_numpy(dtype=np.int32)
+        duration.flags.writeable = False
+        codes, categories = {}, {}
+        for column in CATEGORICAL_COLUMNS:
+            codes[column], categories[column] = _categorical(df[column])
+        return cls(
+            url=_interned(df['url']),
+            title=_interned(df['title']),
+            description=_interned(df['description']),
+            duration=duration,
+            codes=codes,
+            categories=categories
+        )
+
+    def __len__(self):
+        return len(self.url)
+
+    def column(self, name: str, ids: np.ndarray) -> np.ndarray:
+        """Values of one column for the given row ids"""
+        if name in self._codes:
+            return self._categories[name][self._codes[name][ids]]
+        if name == 'test_type_bits':
+            return self._test_type_category_bits[self._codes['test_type'][ids]]
+        if name in ('url', 'title', 'description', 'duration', 'prompt_row', 'prompt_tokens'):
+            return getattr(self, name)[ids]
+        raise KeyError(name)
+
+    def recommendation(self, row_id: int) -> AssessmentRecommendation:
+        """The response object for one row, built on first use and then reused"""
+        recommendation = self._recommendations[row_id]
+        if recommendation is None:
+            recommendation = AssessmentRecommendation(
+                name=self.title[row_id],
+                url=self.url[row_id],
+                remote_testing_support=self._categories['remote_support'][self._codes['remote_support'][row_id]],
+                adaptive_support=self._categories['adaptive_support'][self._codes['adaptive_support'][row_id]],
+                duration=int(self.duration[row_id]),
+                test_type=self._categories['test_type'][self._codes['test_type'][row_id]]
+            )
+            self._recommendations[row_id] = recommendation
+        return recommendation
+
+    def filter_columns(self) -> FilterColumns:
+        """The same columns build_filter_columns() derives from the DataFrame"""
+        def yes_no(column):
+            is_yes = np.array([value.strip().lower() == "yes" for value in self._categories[column]], dtype=bool)
+            return is_yes[self._codes[column]]
+
+        return FilterColumns(
+            duration=self.duration,
+            test_type_bits=self._test_type_category_bits[self._codes['test_type']],
+            remote=yes_no('remote_support'),
+            adaptive=yes_no('adaptive_support')
+        )
+
+    def select(self, ids, scores) -> "Candidates":
+        return Candidates(self, np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32))
+
+
+class Candidates:
+    """Ranked row ids with similarity scores; column values are looked up on demand
+
+    Supports the column access used by rerankers and tracing
+    (candidates['title'].tolist()) without materializing a DataFrame.
+    """
+    __slots__ = ('store', 'ids', 'scores')
+
+    def __init__(self, store: CatalogStore, ids: np.ndarray, scores: np.ndarray):
+        self.store = store
+        self.ids = ids
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.ids) == 0
+
+    def __contains__(self, name: str) -> bool:
+        derived = ('similarity_score', 'row_id', 'test_type_bits', 'prompt_row', 'prompt_tokens')
+        return name in derived or name in STORE_COLUMNS
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == 'similarity_score':
+            return self.scores
+        if name == 'row_id':
+            return self.ids
+        return self.store.column(name, self.ids)
+
+    def take(self, positions) -> "Candidates":
+        """Candidates at the given positions (a slice, list or array), in that order"""
+        if not isinstance(positions, slice):
+            positions = np.asarray(positions, dtype=np.int64)
+        return Candidates(self.store, self.ids[positions], self.scores[positions])
+
+    def to_records(self, columns: Sequence[str]) -> List[dict]:
+        """One dict of plain Python values per candidate"""
+        values = [self[column].tolist() for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def recommendations(self) -> List[AssessmentRecommendation]:
+        return [self.store.recommendation(row_id) for row_id in self.ids.tolist()]
+
+    def to_frame(self) -> "pd.DataFrame":
+        """DataFrame view for display and debugging (not used on the request path)"""
+        import pandas as pd
+        frame = pd.DataFrame({column: self[column] for column in STORE_COLUMNS})
+        frame['similarity_score'] = self.scores
+        return frame
+
+
+def as_catalog_store(catalog) -> CatalogStore:
+    """Convert a preprocessed DataFrame into a CatalogStore; pass stores through
+
+    Converting is O(rows), so long-lived callers should build the store once.
+    """
+    if isinstance(catalog, CatalogStore):
+        return catalog
+    return CatalogStore.from_dataframe(catalog)
@@ -8,14 +8,129 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # Model configuration
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Storage precision of the catalog vectors: "float32" or "float16"
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
 GEMINI_MODEL = "gemini-pro"
+# Override the Gemini endpoint, e.g. to load-test against benchmarks/stub_llm_server.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+# Seconds allowed for a single Gemini attempt and max calls in flight per process
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 4))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+# Seconds a request may spend on Gemini in total; attempts are cut to the time left
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 8))
+# Retries of timeouts, connection errors and 429/5xx answers, after a random
+# wait of up to LLM_RETRY_BACKOFF * 2**attempt seconds (only while the deadline allows)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 0.2))
+# Seconds before a second, hedged request is sent for a slow call (0 disables hedging)
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 0))
+# Circuit breaker: after LLM_BREAKER_FAILURES consecutive failed attempts Gemini is
+# skipped (fallbacks are used) for LLM_BREAKER_RESET seconds, then probed (0 disables)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))
+# Gemini calls per request with the Gemini reranker: "two-call" (extract parameters,
+# then rerank) or "fused" (one call returning both, filters applied afterwards)
+LLM_MODE = os.getenv("LLM_MODE", "two-call")
+# Seconds /recommend/stream waits for the LLM after sending the vector results;
+# on timeout the final event repeats the vector order
+STREAM_REFINE_TIMEOUT = float(os.getenv("STREAM_REFINE_TIMEOUT", 8))
+# Maximum number of recommendations returned after reranking
+RERANK_LIMIT = 10
+
+# Candidates in rerank prompts: "json" (full records) or "table" (one compact
+# id|title|description|duration|type row each, descriptions cut to PROMPT_DESCRIPTION_CHARS,
+# fewer tokens but a lower recall). Table rows past LLM_PROMPT_TOKEN_BUDGET estimated
+# prompt tokens are left out (0: no limit)
+LLM_PROMPT_FORMAT = os.getenv("LLM_PROMPT_FORMAT", "json")
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", 2000))
+PROMPT_DESCRIPTION_CHARS = int(os.getenv("PROMPT_DESCRIPTION_CHARS", 120))
+
+# LLM response cache: in-process LRU entries, TTL in seconds, optional SQLite file
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1024))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")
+
+# Query embedding cache entries
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+
+# Semantic result cache: reuse the final recommendations of a recent query whose
+# embedding is at least SEMANTIC_CACHE_THRESHOLD cosine-similar, skipping Gemini
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.97))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 512))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+
+# Vector search backend: "exact" (brute force), "ivf" (approximate, for large catalogs)
+# or "quantized" (brute force over an int8/float16 copy, top candidates rescored at full precision)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "exact")
+# IVF clusters (0 picks sqrt of the catalog size) and clusters probed per query
+IVF_NLIST = int(os.getenv("IVF_NLIST", 0))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))
+# Precision of the quantized copy ("int8" or "float16") and candidates rescored per result
+QUANTIZED_PRECISION = os.getenv("QUANTIZED_PRECISION", "int8")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", 4))
+# Query encoder: "default" (the SentenceTransformer), "int8" (torch dynamic quantization)
+# or "onnx" (ONNX Runtime backend, needs sentence-transformers[onnx]); catalog rows always use the default
+QUERY_ENCODER = os.getenv("QUERY_ENCODER", "default")
+
+# Retrieval: "dense" (embeddings only) or "hybrid" (embeddings fused with BM25)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+# Hybrid fusion: "rrf" (reciprocal rank) or "weighted" (min-max normalized scores)
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", 0.5))
+RRF_K = int(os.getenv("RRF_K", 60))
+# Rows taken from each ranking before fusion
+HYBRID_DEPTH = int(os.getenv("HYBRID_DEPTH", 100))
+
+# Default reranker: "gemini", "heuristic" (CPU scorer), "cross-encoder" or "none"
+RERANKER = os.getenv("RERANKER", "gemini")
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Recommendation traces: JSON lines written by a background thread, rotated by size.
+# TRACE_SAMPLE_RATE is the share of requests traced; records are dropped when
+# more than TRACE_QUEUE_SIZE are waiting to be written
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "logs/recommendation_traces.log")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 10000))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", 5))
+TRACE_STDOUT = os.getenv("TRACE_STDOUT", "false").lower() == "true"
+# Write to {TRACE_LOG_PATH}.{pid} instead, one file per process. main.py turns this on for
+# several API workers, which would otherwise rotate the same file from under each other
+TRACE_PER_PROCESS = os.getenv("TRACE_PER_PROCESS", "false").lower() == "true"
+
+# Prometheus metrics at /metrics, and a per-request Server-Timing header with stage durations
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
 
 # Data paths
 DATA_PATH = "data/shl_assessments.csv"
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "data/embeddings")
+
+# Catalog ingest: CSV rows read and cleaned per chunk, processes cleaning chunks in
+# parallel (1: in-process), and changed rows encoded per batch straight into the store file
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", 10000))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 1))
+ENCODE_BATCH_ROWS = int(os.getenv("ENCODE_BATCH_ROWS", 4096))
+
+# Seconds between checks of DATA_PATH for changes (0 disables watching; POST /admin/reload still works).
+# With several API workers the watcher also carries /admin/reload to the other workers, so it
+# always runs there (main.py uses MULTI_WORKER_POLL_INTERVAL when this is 0)
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", 0))
+MULTI_WORKER_POLL_INTERVAL = 5.0
+# Token required in the X-Admin-Token header of admin endpoints (unset: admin endpoints answer 404)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # API configuration
 API_HOST = "0.0.0.0"
 API_PORT = int(os.getenv("PORT", 8000))
+# API worker processes for main.py --mode api (they share the memory-mapped index)
+API_WORKERS = int(os.getenv("API_WORKERS", 1))
+# Load the query encoder and the Gemini SDK in the background after startup,
+# instead of on the first request that needs them
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "true").lower() == "true"
+# Threads used for query encoding and similarity scoring
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", 4))
 
 # Streamlit configuration
 STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", 8501))
\ No newline at end of file
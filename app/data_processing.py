@@ -1,41 +1,242 @@
-import pandas as pd
-import numpy as np
+import json
+import os
 import re
-from sentence_transformers import SentenceTransformer
-from .config import EMBEDDING_MODEL, DATA_PATH
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Iterator
+from .config import (
+    EMBEDDING_MODEL, DATA_PATH, EMBEDDING_STORE_DIR, VECTOR_INDEX_BACKEND, IVF_NLIST, IVF_NPROBE,
+    QUANTIZED_PRECISION, RESCORE_FACTOR, QUERY_ENCODER, INGEST_CHUNK_ROWS, INGEST_WORKERS
+)
+from .embedding_store import (
+    file_hash, text_hash, read_manifest, load_embedding_store, build_embedding_store, write_embedding_store,
+    store_lock
+)
+from .vector_index import ExactIndex, IVFIndex, QuantizedIndex
+from .lexical_index import BM25Index
 
-def load_and_preprocess_data():
-    """Load and preprocess the SHL assessment data"""
+if TYPE_CHECKING:
+    import pandas as pd
 
-    df = pd.read_csv(DATA_PATH)
-    
-   
-    def preprocess_text(text):
-        if isinstance(text, str):
-            
-            text = re.sub(r'[^\w\s]', ' ', text)
-            text = re.sub(r'\s+', ' ', text).strip()
-            return text
-        return ""
-    
+# Runs of anything but letters, digits and underscores. Replacing them with one space
+# is the same as replacing punctuation with spaces and then collapsing whitespace
+NON_WORD_PATTERN = re.compile(r'\W+')
 
-    df['processed_title'] = df['title'].apply(preprocess_text)
-    df['processed_description'] = df['description'].apply(preprocess_text)
-    
-   
+
+def preprocess_text(values: "pd.Series") -> "pd.Series":
+    """Replace punctuation with spaces and collapse whitespace over a whole column
+
+    Values that are not strings (missing text) become "".
+    """
+    # A compiled pattern keeps Python's Unicode-aware \w whatever the string storage
+    text = values.where(values.map(type).eq(str), "").astype(str)
+    return text.str.replace(NON_WORD_PATTERN, ' ', regex=True).str.strip()
+
+
+def preprocess_chunk(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Add the processed_* columns and combined_text to a block of catalog rows"""
+    df['processed_title'] = preprocess_text(df['title'])
+    df['processed_description'] = preprocess_text(df['description'])
     df['combined_text'] = df['processed_title'] + " " + df['processed_description'] + " " + df['test_type']
-    
     return df
 
-def create_embeddings(df):
-    """Create embeddings for the assessment data"""
+
+def iter_preprocessed_chunks(
+    data_path: str = DATA_PATH,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    workers: int = INGEST_WORKERS
+) -> Iterator["pd.DataFrame"]:
+    """Read the catalog CSV chunk_rows at a time and yield the chunks preprocessed, in order
+
+    With workers > 1 chunks are cleaned in a process pool; at most workers + 1
+    chunks are in flight, so memory use does not grow with the file.
+    """
+    import pandas as pd
+    chunks = pd.read_csv(data_path, chunksize=chunk_rows)
+    if workers <= 1:
+        for chunk in chunks:
+            yield preprocess_chunk(chunk)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(preprocess_chunk, chunk))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def count_csv_rows(data_path: str = DATA_PATH, chunk_rows: int = INGEST_CHUNK_ROWS) -> int:
+    """Number of rows in a CSV, parsing a single column (quoted line breaks are handled)"""
+    import pandas as pd
+    return sum(len(chunk) for chunk in pd.read_csv(data_path, usecols=[0], chunksize=chunk_rows))
+
+
+def load_and_preprocess_data(data_path: str = DATA_PATH):
+    """Load and preprocess the SHL assessment data"""
+    # pandas is imported on first load, not when the API or CLI starts
+    import pandas as pd
+
+    # Cleaned chunk by chunk, so the temporary copies made while cleaning only exist for one chunk
+    return pd.concat(iter_preprocessed_chunks(data_path), ignore_index=True)
+
+
+class LazyEmbeddingModel:
+    """SentenceTransformer that is only loaded when something needs encoding
+
+    Each process (e.g. an API worker) loads its own copy on first use, and
+    starting from a current embedding store does not load it at all.
+    variant "int8" applies torch dynamic int8 quantization to the Linear
+    layers and "onnx" runs the model with ONNX Runtime; both are meant for
+    query encoding on CPU, see query_encoder().
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, variant: str = "default"):
+        if variant not in ("default", "int8", "onnx"):
+            raise ValueError(f"Unknown encoder variant: {variant}")
+        self.model_name = model_name
+        self.variant = variant
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        if self.variant == "onnx":
+            return SentenceTransformer(self.model_name, device="cpu", backend="onnx")
+        model = SentenceTransformer(self.model_name, device="cpu" if self.variant == "int8" else None)
+        if self.variant == "int8":
+            import torch
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def encode(self, sentences, **kwargs):
+        return self.load().encode(sentences, **kwargs)
+
+    def get_sentence_embedding_dimension(self):
+        return self.load().get_sentence_embedding_dimension()
+
+
+def embedding_model_name(model) -> str:
+    """Name a model's vectors are stored under: its model_name, else its class name"""
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def query_encoder(catalog_model, variant: str = QUERY_ENCODER):
+    """Model used to encode queries: the catalog model unless an optimized variant is configured"""
+    if variant == "default":
+        return catalog_model
+    return LazyEmbeddingModel(getattr(catalog_model, "model_name", EMBEDDING_MODEL), variant)
+
+
+def create_embeddings(df, data_path: str = DATA_PATH, store_dir: str = EMBEDDING_STORE_DIR, model=None):
+    """Create embeddings for the assessment data, reusing the on-disk store when it is current
+
+    model replaces the EMBEDDING_MODEL sentence transformer, e.g. an offline
+    encoder in benchmarks/; the store is keyed by its embedding_model_name, so
+    switching models re-encodes every row. By default the model is only loaded
+    if rows need encoding.
+    """
  
-    model = SentenceTransformer(EMBEDDING_MODEL)
+    if model is None:
+        model = LazyEmbeddingModel()
     
-   
-    embeddings = model.encode(df['combined_text'].tolist(), show_progress_bar=True)
+    # Fast path: the store was built from exactly this CSV, so just map it
+    csv_hash = file_hash(data_path) if data_path else None
+    model_name = embedding_model_name(model)
+    embeddings_array = load_embedding_store(store_dir, model_name, csv_hash)
     
-   
-    embeddings_array = np.array(embeddings)
+    if embeddings_array is None:
+        # Only rows whose combined_text changed are re-encoded
+        embeddings_array = build_embedding_store(df, model, store_dir, model_name, csv_hash)
     
-    return model, embeddings_array
\ No newline at end of file
+    return model, embeddings_array
+
+
+def index_fingerprint(manifest: dict, **params) -> str:
+    """Identify what a persisted index was built from: the store rows, model, dtype
+    and store version, plus the index's own build parameters"""
+    return text_hash(json.dumps({
+        "rows": text_hash("".join(manifest["row_hashes"])),
+        "model": manifest["model_name"],
+        "dtype": manifest["dtype"],
+        "store_version": manifest["version"],
+        **params
+    }, sort_keys=True))
+
+
+def build_vector_index(
+    embeddings_array,
+    backend: str = VECTOR_INDEX_BACKEND,
+    store_dir: str = EMBEDDING_STORE_DIR
+):
+    """Wrap the catalog embeddings in the configured VectorIndex backend
+
+    The IVF clusters and the quantized copy are persisted next to the embedding
+    store and reused as long as the store content and the build parameters are
+    unchanged (see index_fingerprint); both read the full vectors from the
+    store's memory map. The configured nprobe always applies.
+    """
+    if backend == "exact":
+        return ExactIndex(embeddings_array)
+    if backend not in ("ivf", "quantized"):
+        raise ValueError(f"Unknown vector index backend: {backend}")
+
+    manifest = read_manifest(store_dir)
+    if backend == "quantized":
+        fingerprint = index_fingerprint(manifest, precision=QUANTIZED_PRECISION) if manifest else None
+        quantized_dir = os.path.join(store_dir, "quantized")
+        index = QuantizedIndex.load(
+            quantized_dir, embeddings_array, fingerprint, QUANTIZED_PRECISION, RESCORE_FACTOR
+        ) if fingerprint else None
+        if index is None:
+            index = QuantizedIndex(QUANTIZED_PRECISION, RESCORE_FACTOR).build(embeddings_array)
+            if fingerprint:
+                index.save(quantized_dir, fingerprint)
+        return index
+
+    fingerprint = index_fingerprint(manifest, nlist=IVF_NLIST) if manifest else None
+    ivf_dir = os.path.join(store_dir, "ivf")
+    index = IVFIndex.load(ivf_dir, embeddings_array, fingerprint) if fingerprint else None
+    if index is None:
+        index = IVFIndex(nlist=IVF_NLIST, nprobe=IVF_NPROBE).build(embeddings_array)
+        if fingerprint:
+            index.save(ivf_dir, fingerprint)
+    # nprobe is a search setting, not part of the saved index
+    index.nprobe = IVF_NPROBE
+    return index
+
+
+def build_lexical_index(df):
+    """Build the BM25 inverted index over the same combined_text that gets embedded"""
+    return BM25Index.from_texts(df['combined_text'].tolist())
+
+
+def build_embedding_index(data_path: str = DATA_PATH, store_dir: str = EMBEDDING_STORE_DIR, model=None):
+    """Build or refresh the on-disk embedding store offline
+
+    The CSV is streamed in chunks and never loaded as a whole, so catalogs much
+    larger than memory can be indexed.
+    """
+    if model is None:
+        model = LazyEmbeddingModel()
+    text_chunks = (chunk['combined_text'].tolist() for chunk in iter_preprocessed_chunks(data_path))
+    with store_lock(store_dir):
+        embeddings_array = write_embedding_store(
+            text_chunks, count_csv_rows(data_path), model, store_dir, embedding_model_name(model), file_hash(data_path)
+        )
+    print(f"Embedding store written to {store_dir}: {embeddings_array.shape[0]} rows x {embeddings_array.shape[1]} dims")
+    return embeddings_array
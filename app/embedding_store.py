@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterable, List, Optional
+from .config import EMBEDDING_MODEL, EMBEDDING_STORE_DIR, EMBEDDING_DTYPE, ENCODE_BATCH_ROWS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Bump when the on-disk layout changes so stale stores are rebuilt
+STORE_VERSION = 3
+
+# Each build writes a new embeddings.<id>.npy and then swaps the manifest naming it, so
+# the manifest and the vectors it describes are replaced together in one step
+EMBEDDINGS_FILE = "embeddings.{}.npy"
+MANIFEST_FILE = "manifest.json"
+# Held while a process builds the store and the indexes derived from it
+LOCK_FILE = "rebuild.lock"
+
+
+def file_hash(path: str) -> str:
+    """Hash the content of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    """Hash the text that gets embedded for a single row"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def l2_normalize(vectors: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """Scale vectors to unit length so cosine similarity becomes a dot product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.maximum(norms, np.finfo(np.float32).tiny)).astype(dtype, copy=False)
+
+
+def _allocate(path: str, dtype: str, shape) -> None:
+    """Create an .npy file of the given shape; the data is not written (sparse where supported)"""
+    np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape).flush()
+
+
+@contextmanager
+def store_lock(store_dir: str = EMBEDDING_STORE_DIR):
+    """Hold the store directory's rebuild lock for the duration of the block
+
+    Processes sharing store_dir (API workers) that notice the same CSV change
+    queue up here: the first one rebuilds, the others then find the store
+    current and only map it. Without fcntl (Windows) nothing is locked and
+    each process may rebuild on its own.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(store_dir, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_manifest(store_dir: str = EMBEDDING_STORE_DIR) -> Optional[dict]:
+    """Read the store manifest, or None if there is no usable store"""
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != STORE_VERSION or not os.path.exists(embeddings_path(store_dir, manifest)):
+        return None
+    return manifest
+
+
+def embeddings_path(store_dir: str, manifest: dict) -> str:
+    """Path of the embeddings file a manifest describes"""
+    return os.path.join(store_dir, manifest.get("embeddings_file", ""))
+
+
+def load_embedding_store(
+    store_dir: str = EMBEDDING_STORE_DIR,
+    model_name: str = EMBEDDING_MODEL,
+    csv_hash: Optional[str] = None,
+    dtype: str = EMBEDDING_DTYPE
+):
+    """Memory-map the stored embeddings if they match the model and the CSV content"""
+    # A rebuild swapping in a new manifest removes the old file: read the manifest again then
+    for _ in range(2):
+        manifest = read_manifest(store_dir)
+        if manifest is None or manifest.get("model_name") != model_name or manifest.get("dtype") != dtype:
+            return None
+        if csv_hash is not None and manifest.get("csv_hash") != csv_hash:
+            return None
+        try:
+            # Zero-copy load: pages are only read from disk when touched
+            embeddings = np.load(embeddings_path(store_dir, manifest), mmap_mode="r")
+        except FileNotFoundError:
+            continue
+        if embeddings.shape[0] != len(manifest.get("row_hashes", [])):
+            return None
+        return embeddings
+    return None
+
+
+def build_embedding_store(
+    df: "pd.DataFrame",
+    model,
+    store_dir: str = EMBEDDING_STORE_DIR,
+    model_name: str = EMBEDDING_MODEL,
+    csv_hash: Optional[str] = None,
+    dtype: str = EMBEDDING_DTYPE
+):
+    """Write the embedding store for df, re-encoding only rows whose text changed
+
+    Vectors are stored L2-normalized in the requested dtype (float32 or float16)
+    so they can be scored directly without any per-query normalization.
+    """
+    return write_embedding_store([df['combined_text'].tolist()], len(df), model, store_dir, model_name, csv_hash, dtype)
+
+
+def write_embedding_store(
+    text_chunks: Iterable[List[str]],
+    n_rows: int,
+    model,
+    store_dir: str = EMBEDDING_STORE_DIR,
+    model_name: str = EMBEDDING_MODEL,
+    csv_hash: Optional[str] = None,
+    dtype: str = EMBEDDING_DTYPE,
+    batch_rows: int = ENCODE_BATCH_ROWS
+):
+    """Write the embedding store from the combined texts of n_rows rows, given in chunks in row order
+
+    Changed rows are encoded batch_rows at a time and written straight into a
+    preallocated memory-mapped file, so apart from one hash per row, memory use
+    depends on the chunk and batch sizes rather than on the number of rows.
+
+    The vectors go to a new file that only the new manifest names, so readers
+    see either the old store or the new one, never a mix.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    # Reuse vectors from the previous store when the model is the same. The previous
+    # file stays mapped for the whole copy, so the row mapping read from its manifest
+    # holds even if another process swaps in a newer store meanwhile
+    previous = None
+    previous_rows = {}
+    previous_dim = None
+    previous_path = None
+    manifest = read_manifest(store_dir)
+    if manifest is not None:
+        previous_path = embeddings_path(store_dir, manifest)
+        if manifest.get("model_name") == model_name:
+            try:
+                previous = np.load(previous_path, mmap_mode="r")
+            except FileNotFoundError:
+                previous = None
+            if previous is not None and previous.shape[0] == len(manifest["row_hashes"]):
+                previous_rows = {h: i for i, h in enumerate(manifest["row_hashes"])}
+                previous_dim = previous.shape[1]
+
+    embeddings_file = EMBEDDINGS_FILE.format(uuid.uuid4().hex[:16])
+    store_path = os.path.join(store_dir, embeddings_file)
+    dim = None
+    row_hashes = []
+    pending_rows, pending_texts = [], []
+
+    def write_rows(rows, vectors):
+        # The file is mapped per write, so written pages do not stay in this
+        # process's resident memory until the whole store is done
+        nonlocal dim
+        if dim is None:
+            dim = vectors.shape[1]
+            _allocate(store_path, dtype, (n_rows, dim))
+        out = np.load(store_path, mmap_mode="r+")
+        out[rows] = vectors
+        out.flush()
+
+    def encode_pending():
+        vectors = l2_normalize(model.encode(pending_texts, show_progress_bar=False), dtype=dtype)
+        write_rows(np.array(pending_rows), vectors)
+        pending_rows.clear()
+        pending_texts.clear()
+
+    try:
+        for texts in text_chunks:
+            start = len(row_hashes)
+            hashes = [text_hash(text) for text in texts]
+            if start + len(hashes) > n_rows:
+                raise ValueError(f"Embedding store: more than the expected {n_rows} rows")
+            row_hashes.extend(hashes)
+            reused = [(start + i, previous_rows[h]) for i, h in enumerate(hashes) if h in previous_rows]
+            if reused:
+                targets, sources = (np.array(col) for col in zip(*reused))
+                write_rows(targets, previous[sources])
+            for i, (text, h) in enumerate(zip(texts, hashes)):
+                if h not in previous_rows:
+                    pending_rows.append(start + i)
+                    pending_texts.append(text)
+                    if len(pending_rows) >= batch_rows:
+                        encode_pending()
+        if pending_rows:
+            encode_pending()
+        if len(row_hashes) != n_rows:
+            raise ValueError(f"Embedding store: expected {n_rows} rows, got {len(row_hashes)}")
+    except BaseException:
+        if os.path.exists(store_path):
+            os.remove(store_path)
+        raise
+    del previous
+
+    n_reused = sum(h in previous_rows for h in row_hashes)
+    print(f"Embedding store: reused {n_reused} rows, encoded {n_rows - n_reused} rows")
+    if dim is None:
+        # No rows at all
+        dim = previous_dim or model.get_sentence_embedding_dimension()
+        _allocate(store_path, dtype, (n_rows, dim))
+
+    manifest = {
+        "version": STORE_VERSION,
+        "model_name": model_name,
+        "csv_hash": csv_hash,
+        "dim": dim,
+        "dtype": dtype,
+        "embeddings_file": embeddings_file,
+        "row_hashes": row_hashes
+    }
+    tmp_manifest = os.path.join(store_dir, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    # The store being replaced, which may be newer than the one the vectors were copied from
+    replaced = read_manifest(store_dir)
+    # The one step that publishes the new store
+    os.replace(tmp_manifest, os.path.join(store_dir, MANIFEST_FILE))
+    stale = {previous_path, embeddings_path(store_dir, replaced) if replaced is not None else None}
+    for path in stale - {None, store_path}:
+        # Processes that mapped it keep their pages until they let go
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    return np.load(store_path, mmap_mode="r")
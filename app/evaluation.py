@@ -1,50 +1,331 @@
-from typing import List
+import json
+import numpy as np
+from itertools import chain
+import pandas as pd
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+DEFAULT_KS = (1, 3, 5, 10)
+METRIC_NAMES = ("recall", "precision", "map", "ndcg", "mrr")
+
+
+def relevance_matrix(
+    predictions: Sequence[Sequence[Hashable]],
+    ground_truth: Sequence[Sequence[Hashable]],
+    max_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map assessment IDs to integers once and mark which predictions are relevant
+
+    Returns:
+        relevance: (n_queries, max_k) bool matrix, True where the prediction at
+            that rank is in the query's ground truth and was not predicted at a
+            higher rank (repeats and padding are False)
+        n_relevant: number of distinct ground truth IDs per query
+    """
+    n_queries = len(predictions)
+    ground_truth = list(ground_truth[:n_queries]) + [[]] * max(0, n_queries - len(ground_truth))
+    predictions = [pred[:max_k] for pred in predictions]
+    truth_lengths = np.fromiter((len(truth) for truth in ground_truth), dtype=np.int64, count=n_queries)
+    pred_lengths = np.fromiter((len(pred) for pred in predictions), dtype=np.int64, count=n_queries)
+
+    # Integer codes for every ID, assigned in one hashing pass. Missing IDs (None) get a code
+    # of their own rather than -1, which would make keys collide with the previous query's
+    flat = list(chain.from_iterable(ground_truth)) + list(chain.from_iterable(predictions))
+    codes, uniques = pd.factorize(pd.Series(flat, dtype=object), use_na_sentinel=False)
+    n_ids = max(len(uniques), 1)
+    n_truth = int(truth_lengths.sum())
+
+    # One key per (query, id) pair, so membership is a single vectorized lookup
+    rows = np.arange(n_queries, dtype=np.int64)
+    truth_keys = np.unique(np.repeat(rows, truth_lengths) * n_ids + codes[:n_truth])
+    n_relevant = np.bincount(truth_keys // n_ids, minlength=n_queries)
+
+    pred_rows = np.repeat(rows, pred_lengths)
+    pred_ranks = np.arange(len(pred_rows)) - np.repeat(np.cumsum(pred_lengths) - pred_lengths, pred_lengths)
+    pred_keys = pred_rows * n_ids + codes[n_truth:]
+    # A repeated prediction is not another hit: keep the first occurrence of each key
+    first = np.zeros(len(pred_keys), dtype=bool)
+    first[np.unique(pred_keys, return_index=True)[1]] = True
+    relevance = np.zeros((n_queries, max_k), dtype=bool)
+    relevance[pred_rows, pred_ranks] = first & np.isin(pred_keys, truth_keys)
+    return relevance, n_relevant
+
+
+def ranking_metrics(
+    relevance: np.ndarray,
+    n_relevant: np.ndarray,
+    ks: Sequence[int] = DEFAULT_KS,
+    per_query: bool = False
+) -> Dict[str, object]:
+    """
+    Recall, Precision, MAP, NDCG and MRR at every K from one relevance matrix
+
+    Queries without ground truth are skipped. AP@K is normalized by
+    min(K, number of relevant IDs), as in calculate_metrics.
+
+    Returns:
+        {"recall@K": mean, ...} for each metric and K; with per_query the
+        values are arrays with one entry per evaluated query
+    """
+    keep = n_relevant > 0
+    relevance, n_relevant = relevance[keep], n_relevant[keep]
+    n_queries, max_k = relevance.shape
+    ks = [k for k in ks if k > 0]
+    if max_k < max(ks, default=0):
+        relevance = np.pad(relevance, ((0, 0), (0, max(ks) - max_k)))
+        max_k = relevance.shape[1]
+
+    ranks = np.arange(1, max_k + 1, dtype=np.float64)
+    rel = relevance.astype(np.float64)
+    hits = np.cumsum(rel, axis=1)
+    precision_sum = np.cumsum(rel * hits / ranks, axis=1)
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = np.cumsum(rel * discounts, axis=1)
+    ideal_dcg = np.cumsum(discounts)
+    first_hit = np.where(relevance.any(axis=1), relevance.argmax(axis=1), max_k)
+
+    results = {}
+    for k in ks:
+        at_k = min(k, max_k) - 1
+        values = {
+            "recall": hits[:, at_k] / n_relevant,
+            "precision": hits[:, at_k] / k,
+            "map": precision_sum[:, at_k] / np.minimum(k, n_relevant),
+            "ndcg": dcg[:, at_k] / ideal_dcg[np.minimum(k, n_relevant) - 1],
+            "mrr": np.where(first_hit < k, 1.0 / (first_hit + 1), 0.0)
+        }
+        for name in METRIC_NAMES:
+            metric = values[name]
+            results[f"{name}@{k}"] = metric if per_query else (float(metric.mean()) if n_queries else 0.0)
+    return results
+
+
+def evaluate_rankings(
+    predictions: Sequence[Sequence[Hashable]],
+    ground_truth: Sequence[Sequence[Hashable]],
+    ks: Sequence[int] = DEFAULT_KS,
+    per_query: bool = False
+) -> Dict[str, object]:
+    """
+    Compute all ranking metrics for ranked predictions against ground truth
+
+    Args:
+        predictions: Ranked assessment IDs per query
+        ground_truth: Relevant assessment IDs per query
+        ks: Cutoffs to report, all computed in one pass
+    """
+    relevance, n_relevant = relevance_matrix(predictions, ground_truth, max(ks))
+    return ranking_metrics(relevance, n_relevant, ks, per_query)
+
 
 def calculate_metrics(predictions: List[List[str]], ground_truth: List[List[str]], k: int = 3):
     """
     Calculate Mean Recall@K and MAP@K
-    
+
     Args:
         predictions: List of lists, where each inner list contains the predicted assessment IDs
         ground_truth: List of lists, where each inner list contains the ground truth assessment IDs
         k: The K value for the metrics
-    
+
     Returns:
         mean_recall_k: Mean Recall@K
         map_k: Mean Average Precision@K
     """
-    recalls = []
-    aps = []
-    
-    for pred, truth in zip(predictions, ground_truth):
-        # Calculate Recall@K
-        if not truth:  # Skip if no ground truth
-            continue
-        
-        # Get top K predictions
-        pred_k = pred[:k]
-        
-        # Calculate recall
-        relevant_count = len(set(pred_k).intersection(set(truth)))
-        recall = relevant_count / len(truth) if truth else 0
-        recalls.append(recall)
-        
-        # Calculate AP@K
-        ap = 0
-        relevant_count = 0
-        
-        for i, p in enumerate(pred_k):
-            if p in truth:
-                relevant_count += 1
-                precision_at_i = relevant_count / (i + 1)
-                ap += precision_at_i
-        
-        if len(truth) > 0:
-            ap /= min(k, len(truth))
-            aps.append(ap)
-    
-    # Calculate Mean Recall@K and MAP@K
-    mean_recall_k = sum(recalls) / len(recalls) if recalls else 0
-    map_k = sum(aps) / len(aps) if aps else 0
-    
-    return mean_recall_k, map_k
\ No newline at end of file
+    metrics = evaluate_rankings(predictions, ground_truth, ks=(k,))
+    return metrics[f"recall@{k}"], metrics[f"map@{k}"]
+
+
+def evaluate_retrieval(
+    queries: List[str],
+    ground_truth: List[List[str]],
+    df,
+    embedding_model,
+    embeddings_array,
+    filters=None,
+    lexical_index=None,
+    k: int = 3
+):
+    """
+    Calculate Mean Recall@K and MAP@K of the retrieval step alone (no Gemini reranking)
+
+    Assessment IDs are the catalog URLs. Pass a lexical_index to evaluate
+    hybrid retrieval instead of dense-only retrieval.
+    """
+    from .catalog_store import as_catalog_store
+    from .search import encode_queries, retrieve_candidates
+
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    query_embeddings = encode_queries(embedding_model, queries)
+
+    predictions = []
+    for query, query_embedding in zip(queries, query_embeddings):
+        candidates = retrieve_candidates(
+            query_embedding, catalog, embeddings_array, filters, top_k=k,
+            query=query, lexical_index=lexical_index
+        )
+        predictions.append(candidates['url'].tolist()[:k])
+
+    return calculate_metrics(predictions, ground_truth, k)
+
+
+def compare_retrieval(
+    queries: List[str],
+    ground_truth: List[List[str]],
+    df,
+    embedding_model,
+    embeddings_array,
+    lexical_index,
+    filters=None,
+    k: int = 3
+):
+    """
+    Compare dense-only retrieval with hybrid (dense + BM25) retrieval
+
+    Returns:
+        {"dense": {"recall@k": ..., "map@k": ...}, "hybrid": {...}}
+    """
+    results = {}
+    for mode, index in (("dense", None), ("hybrid", lexical_index)):
+        recall_k, map_k = evaluate_retrieval(
+            queries, ground_truth, df, embedding_model, embeddings_array, filters, index, k
+        )
+        results[mode] = {f"recall@{k}": recall_k, f"map@{k}": map_k}
+    return results
+
+
+def compare_rerankers(
+    queries: List[str],
+    ground_truth: List[List[str]],
+    df,
+    embedding_model,
+    embeddings_array,
+    rerankers,
+    filters=None,
+    lexical_index=None,
+    k: int = 3
+):
+    """
+    Compare rerankers on the same vector search candidates
+
+    Args:
+        rerankers: Mapping of name to Reranker (see app.rerankers.get_reranker)
+
+    Returns:
+        {name: {"recall@k": ..., "map@k": ..., "ms_per_query": ...}}
+    """
+    import time
+    from .catalog_store import as_catalog_store
+    from .config import RERANK_LIMIT
+    from .search import encode_queries, retrieve_candidates
+
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    query_embeddings = encode_queries(embedding_model, queries)
+    # Rerankers see at least the usual RERANK_LIMIT candidates and keep k of them
+    candidate_sets = [
+        retrieve_candidates(
+            query_embedding, catalog, embeddings_array, filters, top_k=max(k, RERANK_LIMIT),
+            query=query, lexical_index=lexical_index
+        )
+        for query, query_embedding in zip(queries, query_embeddings)
+    ]
+
+    results = {}
+    for name, reranker in rerankers.items():
+        start = time.perf_counter()
+        predictions = [
+            reranker.rerank(query, candidates, limit=k)['url'].tolist()
+            for query, candidates in zip(queries, candidate_sets)
+        ]
+        elapsed = time.perf_counter() - start
+        recall_k, map_k = calculate_metrics(predictions, ground_truth, k)
+        results[name] = {
+            f"recall@{k}": recall_k,
+            f"map@{k}": map_k,
+            "ms_per_query": 1000 * elapsed / max(len(queries), 1)
+        }
+    return results
+
+
+def load_labelled_queries(path: str):
+    """
+    Read labelled queries from a JSON lines or CSV file
+
+    JSON lines: {"query": ..., "relevant": [url, ...]} plus optional
+    duration_limit, test_types, remote_support and adaptive_support.
+    CSV: a query column and a URL column with one row per relevant assessment
+    (e.g. "Query,Assessment_url"); rows of the same query are grouped.
+
+    Returns:
+        queries, ground_truth, constraints (one dict per query)
+    """
+    if path.endswith((".jsonl", ".json")):
+        queries, ground_truth, constraints = [], [], []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                queries.append(record["query"])
+                ground_truth.append(list(record.get("relevant", [])))
+                constraints.append({
+                    key: record[key]
+                    for key in ("duration_limit", "test_types", "remote_support", "adaptive_support")
+                    if record.get(key) is not None
+                })
+        return queries, ground_truth, constraints
+
+    labels = pd.read_csv(path)
+    query_column = next(column for column in labels.columns if "query" in column.lower())
+    url_column = next(column for column in labels.columns if "url" in column.lower())
+    grouped = labels.groupby(query_column, sort=False)[url_column].agg(list)
+    return grouped.index.tolist(), grouped.tolist(), [{} for _ in range(len(grouped))]
+
+
+def evaluate_query_file(
+    path: str,
+    df,
+    embedding_model,
+    embeddings_array,
+    gemini_model=None,
+    filters=None,
+    lexical_index=None,
+    reranker=None,
+    ks: Sequence[int] = DEFAULT_KS,
+    top_k: Optional[int] = None
+) -> Dict[str, object]:
+    """
+    Evaluate a labelled query file end to end through search_assessments_batch
+
+    Without a gemini_model the candidates are kept in vector search order
+    unless another reranker is given. Ranked URLs are compared with the
+    labels, normalized by trailing slash.
+
+    Returns:
+        {"queries": n, "seconds": ..., "recall@K": ..., ...}
+    """
+    import time
+    from .catalog_store import as_catalog_store
+    from .rerankers import get_reranker
+    from .search import search_assessments_batch
+
+    queries, ground_truth, constraints = load_labelled_queries(path)
+    catalog = as_catalog_store(df)
+    if reranker is None and gemini_model is None:
+        reranker = get_reranker("none")
+
+    start = time.perf_counter()
+    outputs = search_assessments_batch(
+        queries, catalog, embedding_model, embeddings_array, gemini_model,
+        top_k=top_k or max(ks), constraints=constraints, filters=filters,
+        lexical_index=lexical_index, reranker=reranker
+    )
+    elapsed = time.perf_counter() - start
+
+    predictions = [[url.rstrip("/") for url in results['url'].tolist()] for results, _ in outputs]
+    truth = [[url.rstrip("/") for url in relevant] for relevant in ground_truth]
+    metrics = evaluate_rankings(predictions, truth, ks)
+    return {"queries": len(queries), "seconds": elapsed, **metrics}
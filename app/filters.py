@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Test type letters used by the SHL catalog (same mapping as the crawler)
+TEST_TYPE_CODES = {
+    'A': 'Ability & Aptitude',
+    'B': 'Biodata & Situational Judgement',
+    'C': 'Competencies',
+    'D': 'Development & 360',
+    'E': 'Assessment Exercises',
+    'K': 'Knowledge & Skills',
+    'P': 'Personality & Behavior',
+    'S': 'Simulations'
+}
+
+# One bit per test type so a row's types fit in a single integer
+TEST_TYPE_BITS = {name: 1 << i for i, name in enumerate(TEST_TYPE_CODES.values())}
+
+
+def test_type_bitmask(test_types: Iterable[str]) -> int:
+    """Convert test type names or letter codes into a bitmask"""
+    names = {name.lower(): name for name in TEST_TYPE_BITS}
+    bits = 0
+    for test_type in test_types:
+        key = test_type.strip()
+        if key.upper() in TEST_TYPE_CODES:
+            bits |= TEST_TYPE_BITS[TEST_TYPE_CODES[key.upper()]]
+        elif key.lower() in names:
+            bits |= TEST_TYPE_BITS[names[key.lower()]]
+    return bits
+
+
+@dataclass(frozen=True)
+class FilterColumns:
+    """Columnar metadata used to pre-filter assessments before scoring"""
+    duration: np.ndarray
+    test_type_bits: np.ndarray
+    remote: np.ndarray
+    adaptive: np.ndarray
+
+    def __len__(self):
+        return len(self.duration)
+
+    def mask(
+        self,
+        duration_limit: Optional[int] = None,
+        test_types: Optional[Iterable[str]] = None,
+        remote_support: Optional[bool] = None,
+        adaptive_support: Optional[bool] = None
+    ) -> Optional[np.ndarray]:
+        """Combined boolean mask for the given constraints, or None if nothing is constrained"""
+        mask = None
+
+        def combine(current, condition):
+            return condition if current is None else current & condition
+
+        if duration_limit:
+            mask = combine(mask, self.duration <= duration_limit)
+        if test_types:
+            # A row matches if it has any of the requested types
+            mask = combine(mask, (self.test_type_bits & test_type_bitmask(test_types)) != 0)
+        if remote_support is not None:
+            mask = combine(mask, self.remote == remote_support)
+        if adaptive_support is not None:
+            mask = combine(mask, self.adaptive == adaptive_support)
+        return mask
+
+
+def build_filter_columns(df: "pd.DataFrame") -> FilterColumns:
+    """Build the filter columns once from the preprocessed catalog"""
+    import pandas as pd
+    test_type_bits = np.zeros(len(df), dtype=np.uint16)
+    for name, bit in TEST_TYPE_BITS.items():
+        has_type = df['test_type'].fillna("").str.contains(name, regex=False).to_numpy()
+        test_type_bits[has_type] |= bit
+
+    def yes_no(column):
+        return df[column].fillna("").str.strip().str.lower().eq("yes").to_numpy()
+
+    return FilterColumns(
+        duration=pd.to_numeric(df['duration'], errors='coerce').fillna(0).to_numpy(dtype=np.int32),
+        test_type_bits=test_type_bits,
+        remote=yes_no('remote_support'),
+        adaptive=yes_no('adaptive_support')
+    )
+
+
+def save_filter_columns(filters: FilterColumns, path: str, fingerprint: Optional[str] = None):
+    """Persist the columns as .npy files that other processes can memory-map
+
+    Temporary files carry the process id, so workers saving at the same time
+    do not write into each other's files.
+    """
+    os.makedirs(path, exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+    for field in fields(FilterColumns):
+        tmp_path = os.path.join(path, field.name + ".npy" + suffix)
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(getattr(filters, field.name)))
+        os.replace(tmp_path, os.path.join(path, field.name + ".npy"))
+    # Written last: a matching fingerprint means the files above are complete
+    tmp_meta = os.path.join(path, "meta.json" + suffix)
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "rows": len(filters)}, f)
+    os.replace(tmp_meta, os.path.join(path, "meta.json"))
+
+
+def load_filter_columns(path: str, fingerprint: Optional[str] = None) -> Optional[FilterColumns]:
+    """Memory-map saved filter columns, or None if they are missing or from other data"""
+    meta_path = os.path.join(path, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+        return None
+    try:
+        filters = FilterColumns(**{
+            field.name: np.load(os.path.join(path, field.name + ".npy"), mmap_mode="r")
+            for field in fields(FilterColumns)
+        })
+    except (OSError, ValueError):
+        return None
+    if any(len(getattr(filters, field.name)) != meta.get("rows") for field in fields(FilterColumns)):
+        return None
+    return filters
@@ -1,74 +1,736 @@
-import google.generativeai as genai
+import asyncio
+import contextvars
+import copy
 import json
-import pandas as pd
-from .config import GEMINI_API_KEY, GEMINI_MODEL
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+from .catalog_store import Candidates
+from .models import ExtractedParameters, FusedLLMAnswer
+from .prompts import candidate_block, estimate_tokens
+from .metrics import (
+    timed, record_cache, LLM_ERRORS, LLM_FALLBACKS, LLM_SKIPPED, LLM_RETRIES, LLM_HEDGES, LLM_BREAKER_OPENED,
+    LLM_PROMPT_TOKENS, LLM_PROMPT_ROWS_DROPPED
+)
+from .cache import LRUCache, SQLiteCache, ResponseCache, make_key, normalize_query
+from .config import (
+    GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_ENDPOINT, GEMINI_TIMEOUT, GEMINI_MAX_CONCURRENCY,
+    LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, LLM_HEDGE_DELAY,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET, LLM_PROMPT_FORMAT, LLM_PROMPT_TOKEN_BUDGET, PROMPT_DESCRIPTION_CHARS,
+    RERANK_LIMIT
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {"duration_limit": None, "skills": [], "level": None}
+
+# Bump when a prompt template or the checks on its answer change so cached answers are not reused
+EXTRACT_PROMPT_VERSION = "extract-v2"
+RERANK_PROMPT_VERSION = "rerank-v4"
+FUSED_PROMPT_VERSION = "fused-v4"
+
+# Durations written in a query, e.g. "40 minutes", "90-min", "1.5 hours", "an hour"
+DURATION_PATTERN = re.compile(
+    r"\b(half an?|an?|\d+(?:\.\d+)?)\s*-?\s*(minutes?|mins?|hours?|hrs?)\b", re.IGNORECASE
+)
+
+# Shared cache of LLM answers, keyed by normalized query, model, prompt version and candidates
+response_cache = ResponseCache(
+    LRUCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL),
+    SQLiteCache(LLM_CACHE_DB, ttl=LLM_CACHE_TTL) if LLM_CACHE_DB else None
+)
+
+# Monotonic time by which the current request's Gemini calls must be done (None: no deadline).
+# Context variables follow tasks and run_in_executor threads, so the deadline reaches every call
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+
+# Gemini calls of the current request that fell back (None: not tracked). The list is shared
+# with the tasks and executor threads the request starts, so their fallbacks land in it too
+_fallbacks = contextvars.ContextVar("llm_fallbacks", default=None)
+
+
+class LLMUnavailable(Exception):
+    """Gemini was not called: the circuit breaker is open or the deadline has passed"""
+
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """Bound all Gemini calls made inside the block to seconds in total (an earlier outer deadline wins)"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def track_llm_fallbacks() -> list:
+    """Collect the Gemini calls of the current request that fall back; returns the list"""
+    fallbacks = []
+    _fallbacks.set(fallbacks)
+    return fallbacks
+
+
+def remaining_time(timeout: float = GEMINI_TIMEOUT) -> float:
+    """Seconds the next attempt may take: timeout, cut to what is left of the deadline"""
+    deadline = _deadline.get()
+    return timeout if deadline is None else min(timeout, deadline - time.monotonic())
+
+
+class CircuitBreaker:
+    """Stops calls to an unhealthy backend
+
+    After failure_threshold consecutive failed attempts the breaker opens
+    and allow() refuses calls for reset_timeout seconds. Then a single trial
+    call is let through (half-open): success closes the breaker, failure
+    opens it again, and a trial that never reports back (e.g. cancelled)
+    is replaced by a new one after another reset_timeout. failure_threshold
+    0 disables it.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial_at = None
+        self._lock = threading.Lock()
+
+    def _waiting(self, now: float) -> bool:
+        # Open and not due for a trial, or a recent trial call still in flight
+        if self._trial_at is not None:
+            return now - self._trial_at < self.reset_timeout
+        return now - self._opened_at < self.reset_timeout
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "open" if self._waiting(time.monotonic()) else "half-open"
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are refused (does not use up the half-open trial)"""
+        return self.state == "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._waiting(now):
+                return False
+            self._trial_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            if self._opened_at is None and self.failures < self.failure_threshold:
+                return
+            if self._opened_at is None:
+                LLM_BREAKER_OPENED.inc()
+                logger.warning("Gemini circuit breaker opened after %d consecutive failures", self.failures)
+            # Opening, or a failed trial: wait another reset_timeout before the next trial
+            self._opened_at = time.monotonic()
+            self._trial_at = None
+
+
+# Shared by every client in the process, so one unhealthy backend is detected once
+llm_breaker = CircuitBreaker()
+
+
+def _retryable(error: Exception) -> bool:
+    """Timeouts, connection errors and 429/5xx answers may succeed on another attempt"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # httpx transport errors (connect, read, pool timeouts) and SDK deadline/unavailable errors
+    return type(error).__name__ in ("ConnectError", "ReadError", "ReadTimeout", "ConnectTimeout", "PoolTimeout",
+                                    "RemoteProtocolError", "DeadlineExceeded", "ServiceUnavailable",
+                                    "ResourceExhausted", "InternalServerError")
+
+
+def _retry_delay(attempt: int, error: Exception, max_retries: int, backoff: float, timeout: float) -> Optional[float]:
+    """Jittered wait before retrying a failed attempt, or None to give up
+
+    Gives up on errors that would fail again, after max_retries retries, and
+    when the wait would leave no time before the deadline.
+    """
+    if attempt >= max_retries or not _retryable(error):
+        return None
+    delay = random.uniform(0, backoff * 2 ** attempt)
+    if remaining_time(timeout) - delay <= 0:
+        return None
+    return delay
+
+
+def _timed_out(error: Exception) -> bool:
+    """asyncio and httpx timeouts, and SDK deadline errors"""
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or type(error).__name__ in (
+        "ReadTimeout", "WriteTimeout", "ConnectTimeout", "PoolTimeout", "DeadlineExceeded"
+    )
+
+
+def _upstream_failure(error: Exception, attempt_timeout: float, timeout: float) -> bool:
+    """True for failures that tell the circuit breaker Gemini is unhealthy
+
+    Only retryable errors of a request that was actually sent count (429/5xx,
+    connection errors, timeouts); not local waits for a concurrency slot, and
+    not a timeout cut short by the caller's deadline.
+    """
+    if isinstance(error, LLMUnavailable) or not _retryable(error):
+        return False
+    return not (_timed_out(error) and attempt_timeout < timeout)
+
+
+def _check_available(breaker: CircuitBreaker, timeout: float) -> float:
+    """Timeout for the next attempt; raises LLMUnavailable when no call should be made"""
+    attempt_timeout = remaining_time(timeout)
+    if attempt_timeout <= 0:
+        raise LLMUnavailable("LLM deadline exceeded")
+    if not breaker.allow():
+        raise LLMUnavailable("LLM circuit breaker is open")
+    return attempt_timeout
+
+
+def generate_text(
+    genai_client, prompt: str, timeout: float = GEMINI_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+    backoff: float = LLM_RETRY_BACKOFF, breaker: CircuitBreaker = llm_breaker
+) -> str:
+    """Blocking Gemini call through the SDK model with the deadline, retries and circuit breaker
+
+    The SDK call cannot be cancelled, so there is no hedging here; use
+    AsyncGeminiClient for that.
+    """
+    attempt = 0
+    while True:
+        attempt_timeout = _check_available(breaker, timeout)
+        try:
+            response = genai_client.generate_content(prompt, request_options={"timeout": attempt_timeout})
+            text = _response_text(response)
+        except Exception as e:
+            if _upstream_failure(e, attempt_timeout, timeout):
+                breaker.record_failure()
+            delay = _retry_delay(attempt, e, max_retries, backoff, timeout)
+            if delay is None:
+                raise
+            LLM_RETRIES.inc()
+            time.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return text
+
 
 def setup_gemini():
     """Configure and set up the Google Gemini model"""
-    genai.configure(api_key=GEMINI_API_KEY)
-    
-    
-
-def extract_parameters(query: str, genai_client):
-    """Extract relevant parameters from the query using Gemini"""
-    prompt = f"""Extract the following parameters from this job description or query:
-    
+    # The SDK takes most of a second to import, so only pay for it when a model is built
+    import google.generativeai as genai
+    options = {}
+    if GEMINI_API_ENDPOINT:
+        # Point the SDK at another endpoint, e.g. the local stub in benchmarks/
+        options = {"transport": "rest", "client_options": {"api_endpoint": GEMINI_API_ENDPOINT}}
+    genai.configure(api_key=GEMINI_API_KEY, **options)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+
+class LazyGeminiModel:
+    """Gemini model that is only set up (SDK import included) on first use"""
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = setup_gemini()
+        return self._model
+
+    def generate_content(self, *args, **kwargs):
+        return self.load().generate_content(*args, **kwargs)
+
+
+class AsyncGeminiClient:
+    """Async client for the Gemini generateContent REST endpoint
+
+    Calls share one pooled HTTP connection and at most max_concurrency
+    requests are in flight at once. Each attempt is bounded by timeout
+    seconds from when it is sent (waiting for a slot only counts against the
+    request deadline, llm_deadline), retryable failures are
+    retried with jittered backoff while the deadline allows, a second
+    request is sent when the first has not answered after hedge_delay
+    seconds, and no call is made while the circuit breaker is open.
+    """
+
+    def __init__(
+        self,
+        api_key: str = GEMINI_API_KEY,
+        model: str = GEMINI_MODEL,
+        endpoint: str = GEMINI_API_ENDPOINT,
+        timeout: float = GEMINI_TIMEOUT,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF,
+        hedge_delay: float = LLM_HEDGE_DELAY,
+        breaker: CircuitBreaker = llm_breaker
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.endpoint = (endpoint or "https://generativelanguage.googleapis.com").rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    async def generate(self, prompt: str) -> str:
+        """Send a prompt and return the text of the first candidate
+
+        Raises LLMUnavailable without calling Gemini when the breaker is open
+        or the deadline has passed, otherwise the error of the last attempt.
+        """
+        attempt = 0
+        while True:
+            attempt_timeout = _check_available(self.breaker, self.timeout)
+            try:
+                text = await self._hedged(prompt, attempt_timeout)
+            except Exception as e:
+                if _upstream_failure(e, attempt_timeout, self.timeout):
+                    self.breaker.record_failure()
+                delay = _retry_delay(attempt, e, self.max_retries, self.backoff, self.timeout)
+                if delay is None:
+                    raise
+                LLM_RETRIES.inc()
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return text
+
+    async def _hedged(self, prompt: str, timeout: float) -> str:
+        """One attempt, plus a second request if the first is slower than hedge_delay; the first answer wins"""
+        if not self.hedge_delay or self.hedge_delay >= timeout:
+            return await self._post(prompt, timeout)
+        first = asyncio.ensure_future(self._post(prompt, timeout))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+        LLM_HEDGES.inc()
+        pending = {first, asyncio.ensure_future(self._post(prompt, timeout - self.hedge_delay))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    # Prefer an upstream error over a local one (no slot before the deadline)
+                    if error is None or isinstance(error, LLMUnavailable):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(self, prompt: str, timeout: float) -> str:
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        url = f"{self.endpoint}/v1beta/models/{self.model}:generateContent"
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        # The key goes in a header, not the URL, so it never shows up in logged errors
+        headers = {"x-goog-api-key": self.api_key or ""}
+
+        # Waiting for a concurrency slot is local queueing: it is bounded by the request
+        # deadline only, and the attempt's timeout starts once the request is sent
+        slot_wait = remaining_time(float("inf"))
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=None if slot_wait == float("inf") else slot_wait)
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("LLM deadline exceeded waiting for a concurrency slot") from None
+        try:
+            deadline_left = remaining_time(float("inf"))
+            if deadline_left <= 0:
+                raise LLMUnavailable("LLM deadline exceeded waiting for a concurrency slot")
+            post_timeout = min(timeout, deadline_left)
+            try:
+                response = await asyncio.wait_for(
+                    self._client.post(url, json=body, headers=headers, timeout=post_timeout), timeout=post_timeout
+                )
+            except Exception as e:
+                if _timed_out(e) and deadline_left <= timeout:
+                    # Cut short by the caller's deadline, which says nothing about Gemini's health
+                    raise LLMUnavailable("LLM deadline exceeded") from None
+                raise
+        finally:
+            self._semaphore.release()
+        response.raise_for_status()
+        parts = response.json()["candidates"][0]["content"]["parts"]
+        return "".join(part.get("text", "") for part in parts)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def heuristic_duration(query: str) -> Optional[int]:
+    """Duration limit in minutes mentioned in the query, found without an LLM call
+
+    With several mentions the largest is used: the value only pre-filters
+    retrieval, so it should not exclude rows the LLM would keep.
+    """
+    minutes = []
+    for amount, unit in DURATION_PATTERN.findall(query):
+        amount = amount.lower()
+        value = 0.5 if amount.startswith("half") else 1.0 if amount in ("a", "an") else float(amount)
+        minutes.append(value * 60 if unit.lower().startswith(("hour", "hr")) else value)
+    return int(max(minutes)) if minutes else None
+
+
+def heuristic_parameters(query: str) -> dict:
+    """Locally extracted parameters in the extract_parameters format"""
+    return {**copy.deepcopy(DEFAULT_PARAMS), "duration_limit": heuristic_duration(query)}
+
+
+def _parse_json(response_text: str):
+    """Parse a JSON answer, tolerating markdown code fences around it"""
+    text = response_text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+    return json.loads(text)
+
+
+def _response_text(response) -> str:
+    # Handle the response based on its structure
+    return response.text if hasattr(response, 'text') else str(response)
+
+
+def _extract_prompt(query: str) -> str:
+    return f"""Extract the following parameters from this job description or query:
+
     Query: "{query}"
-    
+
     1. Maximum assessment duration in minutes (if specified)
     2. Skills or technologies mentioned
     3. Job level (entry, mid, senior, etc.)
-    
+
     Return a JSON object with these fields:
     {{
         "duration_limit": <number or null>,
         "skills": ["skill1", "skill2", ...],
         "level": "<level or null>"
     }}"""
-    
+
+
+def _rerank_prompt(query: str, candidates: Candidates) -> str:
+    template = """Rank the assessments below by relevance to this job description or query. Check it for the assessment duration and the number of assessments asked for.
+
+Query: "{query}"
+
+Assessments:
+{block}
+
+Return a JSON array with the ids of the assessments in order of relevance, most relevant first, e.g. [0, 3, 1]. Only include assessments that are actually relevant to the query."""
+    return _with_candidates(template, query, candidates, "rerank")
+
+
+def _fused_prompt(query: str, candidates: Candidates) -> str:
+    template = """Extract the search parameters from this job description or query and rank the assessments below by relevance to it.
+
+Query: "{query}"
+
+Assessments:
+{block}
+
+Return a single JSON object with these fields:
+{{"duration_limit": <maximum assessment duration in minutes, or null>, "skills": ["skill1", ...], "level": "<job level (entry, mid, senior, etc.) or null>", "ranking": [<ids of the assessments, most relevant first>]}}
+Only include assessments that are actually relevant to the query in "ranking"."""
+    return _with_candidates(template, query, candidates, "fused")
+
+
+def _with_candidates(template: str, query: str, candidates: Candidates, call: str) -> str:
+    """Fill a prompt template, fitting the candidate block into the token budget"""
+    reserved = estimate_tokens(template.format(query=query, block=""))
+    block, n_rows = candidate_block(candidates, reserved, LLM_PROMPT_FORMAT, LLM_PROMPT_TOKEN_BUDGET)
+    prompt = template.format(query=query, block=block)
+    LLM_PROMPT_TOKENS.inc(call, amount=estimate_tokens(prompt))
+    if n_rows < len(candidates):
+        LLM_PROMPT_ROWS_DROPPED.inc(call, amount=len(candidates) - n_rows)
+    return prompt
+
+
+def _valid_ranking(ranked_indices, n_candidates: int) -> list:
+    """The candidate positions of a ranking answer, in order
+
+    Raises ValueError unless the answer is a list of ints naming at least one
+    candidate (e.g. for a JSON object or an empty list), so callers fall back
+    to the vector order instead of returning, and caching, no results.
+    """
+    if not isinstance(ranked_indices, list):
+        raise ValueError(f"Ranking is not a JSON array: {type(ranked_indices).__name__}")
+    valid = [
+        i for i in ranked_indices if isinstance(i, int) and not isinstance(i, bool) and 0 <= i < n_candidates
+    ]
+    if not valid:
+        raise ValueError("Ranking names none of the candidates")
+    return valid
+
+
+def _apply_ranking(candidates: Candidates, ranked_indices, limit: int = RERANK_LIMIT) -> Candidates:
+    # Return the reranked results (at most limit)
+    return candidates.take(_valid_ranking(ranked_indices, len(candidates))[:limit])
+
+
+def _fallback_ranking(candidates: Candidates, limit: int = RERANK_LIMIT) -> Candidates:
+    return candidates.take(slice(0, limit))
+
+
+def _prompt_settings():
+    # The candidate encoding changes which rows the model saw, so answers are cached per setting
+    return [LLM_PROMPT_FORMAT, LLM_PROMPT_TOKEN_BUDGET, PROMPT_DESCRIPTION_CHARS]
+
+
+def _extract_key(query: str) -> str:
+    return make_key(normalize_query(query), GEMINI_MODEL, EXTRACT_PROMPT_VERSION)
+
+
+def _rerank_key(query: str, candidates: Candidates) -> str:
+    # The ranking refers to candidate positions, so the key includes their order
+    return make_key(
+        normalize_query(query), GEMINI_MODEL, RERANK_PROMPT_VERSION, _prompt_settings(), candidates['url'].tolist()
+    )
+
+
+def _fused_key(query: str, candidates: Candidates) -> str:
+    return make_key(
+        normalize_query(query), GEMINI_MODEL, FUSED_PROMPT_VERSION, _prompt_settings(), candidates['url'].tolist()
+    )
+
+
+def _valid_parameters(answer) -> dict:
+    """The parameters of an extraction answer in the DEFAULT_PARAMS format
+
+    Raises ValueError (pydantic's ValidationError) unless the answer matches
+    ExtractedParameters, e.g. for a duration_limit of "30 minutes", so callers
+    fall back instead of passing it on to the filters.
+    """
+    return ExtractedParameters.model_validate(answer).model_dump()
+
+
+def _fused_result(candidates: Candidates, answer: FusedLLMAnswer, limit: int = RERANK_LIMIT):
+    params = {"duration_limit": answer.duration_limit, "skills": answer.skills, "level": answer.level}
+    return params, _apply_ranking(candidates, answer.ranking, limit)
+
+
+def _fused_fallback(query: str, candidates: Candidates, limit: int = RERANK_LIMIT):
+    return heuristic_parameters(query), _fallback_ranking(candidates, limit)
+
+
+def _llm_skipped(call: str, breaker: CircuitBreaker) -> bool:
+    """True (and counted) while the circuit breaker keeps Gemini off the request path"""
+    if not breaker.is_open:
+        return False
+    LLM_SKIPPED.inc(call)
+    _fell_back(call)
+    return True
+
+
+def _llm_failed(call: str, error: Exception):
+    if isinstance(error, LLMUnavailable):
+        LLM_SKIPPED.inc(call)
+    else:
+        LLM_ERRORS.inc(call)
+        logger.warning("Gemini %s call failed, using the fallback: %r", call, error)
+    _fell_back(call)
+
+
+def _fell_back(call: str):
+    LLM_FALLBACKS.inc(call)
+    fallbacks = _fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(call)
+
+
+@dataclass(frozen=True)
+class _LLMCall:
+    """Everything about one Gemini call except how the prompt is sent
+
+    parse turns the answer text into (value to cache, result) and raises on an
+    unusable answer; from_cache turns a cached value into the result.
+    """
+    name: str
+    stage: str
+    cache_stat: str
+    key: str
+    prompt: Callable[[], str]
+    parse: Callable[[str], tuple]
+    from_cache: Callable[[Any], Any]
+    fallback: Callable[[], Any]
+
+
+def _extract_call(query: str) -> _LLMCall:
+    def parse(response_text):
+        params = _valid_parameters(_parse_json(response_text))
+        return params, copy.deepcopy(params)
+
+    return _LLMCall(
+        "extract_parameters", "extract_parameters", "llm_extract", _extract_key(query),
+        prompt=lambda: _extract_prompt(query),
+        parse=parse,
+        from_cache=copy.deepcopy,
+        fallback=lambda: copy.deepcopy(DEFAULT_PARAMS)
+    )
+
+
+def _rerank_call(query: str, candidates: Candidates, limit: int) -> _LLMCall:
+    def parse(response_text):
+        ranked_indices = _valid_ranking(_parse_json(response_text), len(candidates))
+        return ranked_indices, _apply_ranking(candidates, ranked_indices, limit)
+
+    return _LLMCall(
+        "rerank", "gemini_rerank", "llm_rerank", _rerank_key(query, candidates),
+        prompt=lambda: _rerank_prompt(query, candidates),
+        parse=parse,
+        from_cache=lambda ranked_indices: _apply_ranking(candidates, ranked_indices, limit),
+        fallback=lambda: _fallback_ranking(candidates, limit)
+    )
+
+
+def _fused_call(query: str, candidates: Candidates, limit: int) -> _LLMCall:
+    def parse(response_text):
+        answer = FusedLLMAnswer.model_validate(_parse_json(response_text))
+        return answer.model_dump(), _fused_result(candidates, answer, limit)
+
+    return _LLMCall(
+        "fused", "gemini_fused", "llm_fused", _fused_key(query, candidates),
+        prompt=lambda: _fused_prompt(query, candidates),
+        parse=parse,
+        from_cache=lambda cached: _fused_result(candidates, FusedLLMAnswer.model_validate(cached), limit),
+        fallback=lambda: _fused_fallback(query, candidates, limit)
+    )
+
+
+def _cached_answer(call: _LLMCall, cache: Optional[ResponseCache]):
+    cached = cache.get(call.key) if cache is not None else None
+    record_cache(call.cache_stat, cached is not None)
+    return cached
+
+
+def _run_call(call: _LLMCall, generate: Callable[[str], str], breaker: CircuitBreaker, cache: Optional[ResponseCache]):
+    """Answer call from the cache or through generate, falling back on any failure"""
+    cached = _cached_answer(call, cache)
+    if cached is not None:
+        return call.from_cache(cached)
+    if _llm_skipped(call.name, breaker):
+        return call.fallback()
     try:
-       
-        model = genai_client.models.get_model(GEMINI_MODEL)
-        response = model.generate_content(prompt)
-        
-        # Handle the response based on its structure
-        response_text = response.text if hasattr(response, 'text') else str(response)
-        params = json.loads(response_text)
-        return params
+        with timed(call.stage):
+            response_text = generate(call.prompt())
+        answer, result = call.parse(response_text)
     except Exception as e:
-        print(f"Error in extract_parameters: {e}")
-        return {"duration_limit": None, "skills": [], "level": None}
-
-def rerank_with_gemini(query: str, candidates: pd.DataFrame, genai_client):
-    """Rerank assessment candidates using Gemini"""
-    # Prepare data for Gemini
-    assessment_info = candidates[['title', 'description', 'duration', 'test_type']].to_dict('records')
-    
-    # Create prompt for Gemini
-    prompt = f"""Given the job description or query you have to check for duration of assessments mentioned and there no of assessments asked: "{query}", 
-    rank the following assessments based on relevance:
-    
-    {json.dumps(assessment_info, indent=2)}
-    
-    Return a JSON array with the indices of the assessments in order of relevance, 
-    from most relevant to least relevant. Only include assessments that are actually 
-    relevant to the query. Format: [0, 3, 1, ...]"""
-    
+        _llm_failed(call.name, e)
+        return call.fallback()
+    if cache is not None:
+        cache.set(call.key, answer)
+    return result
+
+
+async def _run_call_async(call: _LLMCall, llm_client: AsyncGeminiClient, cache: Optional[ResponseCache]):
+    """_run_call with the prompt sent through the async client"""
+    cached = _cached_answer(call, cache)
+    if cached is not None:
+        return call.from_cache(cached)
+    if _llm_skipped(call.name, llm_client.breaker):
+        return call.fallback()
     try:
-    
-        model = genai_client.models.get_model(GEMINI_MODEL)
-        response = model.generate_content(prompt)
-        
-        # Handle the response based on its structure
-        response_text = response.text if hasattr(response, 'text') else str(response)
-        ranked_indices = json.loads(response_text)
-        
-        # Make sure the indices are valid
-        ranked_indices = [i for i in ranked_indices if i < len(candidates)]
-        
-        # Return the reranked results (maximum 10)
-        return candidates.iloc[ranked_indices[:min(10, len(ranked_indices))]]
+        with timed(call.stage):
+            response_text = await llm_client.generate(call.prompt())
+        answer, result = call.parse(response_text)
     except Exception as e:
-        print(f"Error in rerank_with_gemini: {e}")
-        
-        return candidates.iloc[:min(10, len(candidates))]
\ No newline at end of file
+        _llm_failed(call.name, e)
+        return call.fallback()
+    if cache is not None:
+        cache.set(call.key, answer)
+    return result
+
+
+def extract_parameters(query: str, genai_client, cache: ResponseCache = response_cache):
+    """Extract relevant parameters from the query using Gemini
+
+    An answer that is not JSON or does not match ExtractedParameters falls
+    back to DEFAULT_PARAMS and is not cached.
+    """
+    return _run_call(_extract_call(query), lambda prompt: generate_text(genai_client, prompt), llm_breaker, cache)
+
+
+def rerank_with_gemini(
+    query: str, candidates: Candidates, genai_client, cache: ResponseCache = response_cache, limit: int = RERANK_LIMIT
+):
+    """Rerank assessment candidates using Gemini, keeping at most limit of them"""
+    return _run_call(
+        _rerank_call(query, candidates, limit), lambda prompt: generate_text(genai_client, prompt), llm_breaker, cache
+    )
+
+
+async def extract_parameters_async(query: str, llm_client: AsyncGeminiClient, cache: ResponseCache = response_cache):
+    """Async variant of extract_parameters for the API request path"""
+    return await _run_call_async(_extract_call(query), llm_client, cache)
+
+
+async def rerank_with_gemini_async(
+    query: str, candidates: Candidates, llm_client: AsyncGeminiClient, cache: ResponseCache = response_cache,
+    limit: int = RERANK_LIMIT
+):
+    """Async variant of rerank_with_gemini for the API request path"""
+    return await _run_call_async(_rerank_call(query, candidates, limit), llm_client, cache)
+
+
+def extract_and_rerank(
+    query: str, candidates: Candidates, genai_client, cache: ResponseCache = response_cache, limit: int = RERANK_LIMIT
+):
+    """Extract parameters and rank candidates with one Gemini call (LLM_MODE=fused)
+
+    Returns (params, ranked candidates). An answer that is not JSON, does
+    not match FusedLLMAnswer or ranks none of the candidates falls back to
+    heuristic_parameters() and the vector search order.
+    """
+    return _run_call(
+        _fused_call(query, candidates, limit), lambda prompt: generate_text(genai_client, prompt), llm_breaker, cache
+    )
+
+
+async def extract_and_rerank_async(
+    query: str, candidates: Candidates, llm_client: AsyncGeminiClient, cache: ResponseCache = response_cache,
+    limit: int = RERANK_LIMIT
+):
+    """Async variant of extract_and_rerank for the API request path"""
+    return await _run_call_async(_fused_call(query, candidates, limit), llm_client, cache)
@@ -0,0 +1,124 @@
+import re
+import numpy as np
+from typing import Iterable, Optional, Tuple
+from .vector_index import select_top_k
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Very common words that carry no signal for matching assessments
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was
+we will with who you your our their they can should need needs looking want
+""".split())
+
+
+def tokenize(text: str):
+    """Lowercased word tokens, matching the punctuation stripping in preprocessing"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring
+
+    Postings are stored as flat arrays (CSR layout): for term t, rows
+    docs[indptr[t]:indptr[t + 1]] with precomputed BM25 weights, so a lookup
+    only touches the postings of the query terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.n_docs = 0
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        return cls(k1, b).build(texts)
+
+    def build(self, texts: Iterable[str]) -> "BM25Index":
+        term_ids, doc_ids, counts = [], [], []
+        vocabulary = {}
+        doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text if isinstance(text, str) else "")
+            doc_lengths.append(len(tokens))
+            term_counts = {}
+            for token in tokens:
+                term_counts[token] = term_counts.get(token, 0) + 1
+            for token, count in term_counts.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(doc_id)
+                counts.append(count)
+
+        self.vocabulary = vocabulary
+        self.n_docs = len(doc_lengths)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float32)
+        doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+
+        # Group postings by term
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tf = term_ids[order], doc_ids[order], tf[order]
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        self.indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        self.docs = doc_ids
+
+        # Precompute the full BM25 contribution of every posting
+        idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() if self.n_docs else 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / max(avg_length, 1e-6))
+        self.weights = (idf[term_ids] * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+        return self
+
+    def __len__(self):
+        return self.n_docs
+
+    def _postings(self, query: str):
+        term_ids = [self.vocabulary[token] for token in dict.fromkeys(tokenize(query)) if token in self.vocabulary]
+        if not term_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        return (np.concatenate([self.docs[s] for s in slices]),
+                np.concatenate([self.weights[s] for s in slices]))
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the k best matching rows, restricted to mask if given"""
+        docs, weights = self._postings(query)
+        if mask is not None:
+            keep = mask[docs]
+            docs, weights = docs[keep], weights[keep]
+        if not len(docs):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Sum the contributions per matched row only
+        ids, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        # ids are sorted, so equal scores stay in row order as in the dense ranking
+        top = select_top_k(scores, k)
+        return ids[top].astype(np.int64), scores[top]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank)"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def weighted_fusion(scored_lists, weights):
+    """Fuse (ids, scores) lists with min-max normalized scores and per-list weights"""
+    fused = {}
+    for (ids, scores), weight in zip(scored_lists, weights):
+        if not len(ids):
+            continue
+        low, high = float(np.min(scores)), float(np.max(scores))
+        span = high - low if high > low else 1.0
+        for doc_id, score in zip(ids.tolist(), scores.tolist()):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * (score - low) / span
+    return fused
@@ -0,0 +1,188 @@
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
+from functools import partial
+from typing import Dict, Optional, Sequence, Tuple
+from .config import METRICS_ENABLED, SERVER_TIMING_ENABLED
+
+# Upper bounds in seconds for the stage latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage durations (ms) of the current request, collected for the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+_NULL_TIMER = nullcontext()
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][slot] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUESTS = Counter("shl_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status"))
+REQUEST_SECONDS = Histogram("shl_request_seconds", "HTTP request latency in seconds", ("endpoint",))
+STAGE_SECONDS = Histogram("shl_stage_seconds", "Latency of recommendation stages in seconds", ("stage",))
+CACHE_REQUESTS = Counter("shl_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+LLM_ERRORS = Counter("shl_llm_errors_total", "Failed Gemini calls by call site", ("call",))
+LLM_FALLBACKS = Counter("shl_llm_fallbacks_total", "Default answers used instead of Gemini by call site", ("call",))
+LLM_SKIPPED = Counter(
+    "shl_llm_skipped_total", "Gemini calls not made (circuit breaker open or deadline spent) by call site", ("call",)
+)
+LLM_RETRIES = Counter("shl_llm_retries_total", "Gemini attempts retried after a retryable failure")
+LLM_HEDGES = Counter("shl_llm_hedged_total", "Hedged second requests sent for slow Gemini attempts")
+LLM_BREAKER_OPENED = Counter("shl_llm_breaker_opened_total", "Times the Gemini circuit breaker opened")
+LLM_PROMPT_TOKENS = Counter(
+    "shl_llm_prompt_tokens_total", "Estimated tokens of rerank and fused prompts sent to Gemini by call site", ("call",)
+)
+LLM_PROMPT_ROWS_DROPPED = Counter(
+    "shl_llm_prompt_rows_dropped_total", "Candidates left out of Gemini prompts by the token budget", ("call",)
+)
+
+METRICS = (
+    REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, CACHE_REQUESTS, LLM_ERRORS, LLM_FALLBACKS,
+    LLM_SKIPPED, LLM_RETRIES, LLM_HEDGES, LLM_BREAKER_OPENED, LLM_PROMPT_TOKENS, LLM_PROMPT_ROWS_DROPPED
+)
+
+
+class _StageTimer:
+    __slots__ = ("stage", "timings", "start")
+
+    def __init__(self, stage: str, timings: Optional[dict]):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        elapsed_ms = round(elapsed * 1000, 3)
+        if self.timings is not None:
+            self.timings[self.stage] = elapsed_ms
+        request_timings = _request_timings.get()
+        if request_timings is not None:
+            request_timings[self.stage] = request_timings.get(self.stage, 0.0) + elapsed_ms
+        return False
+
+
+def timed(stage: str, timings: Optional[dict] = None):
+    """Context manager timing one stage of a request
+
+    The duration goes to the stage histogram, to timings[stage] (ms) if a dict
+    is given and to the Server-Timing header of the current request. With
+    metrics and Server-Timing disabled and no dict it is a shared no-op.
+    """
+    if timings is None and not METRICS_ENABLED and _request_timings.get() is None:
+        return _NULL_TIMER
+    return _StageTimer(stage, timings)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def start_request_timings() -> Optional[Dict[str, float]]:
+    """Collect stage timings for the current request if Server-Timing is enabled"""
+    if not SERVER_TIMING_ENABLED:
+        return None
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={duration:.3f}" for stage, duration in timings.items())
+
+
+def run_in_executor(executor, func, *args, **kwargs):
+    """loop.run_in_executor that carries the caller's context (request timings) into the thread"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,27 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union, Literal
 
 class QueryModel(BaseModel):
     query: str
+    duration_limit: Optional[int] = None
+    test_types: Optional[List[str]] = None
+    remote_support: Optional[bool] = None
+    adaptive_support: Optional[bool] = None
+    reranker: Optional[Literal["gemini", "heuristic", "cross-encoder", "none"]] = None
+
+class BatchQueryModel(BaseModel):
+    queries: List[QueryModel]
+    reranker: Optional[Literal["gemini", "heuristic", "cross-encoder", "none"]] = None
+
+class ExtractedParameters(BaseModel):
+    """Schema of the Gemini parameter extraction answer"""
+    duration_limit: Optional[int] = None
+    skills: List[str] = []
+    level: Optional[str] = None
+
+class FusedLLMAnswer(ExtractedParameters):
+    """Schema of the single-call (LLM_MODE=fused) Gemini answer"""
+    ranking: List[int]
 
 class AssessmentRecommendation(BaseModel):
     name: str
@@ -15,6 +34,29 @@ class AssessmentRecommendation(BaseModel):
 class RecommendationResponse(BaseModel):
     recommendations: List[AssessmentRecommendation]
 
+class BatchRecommendationResponse(BaseModel):
+    results: List[RecommendationResponse]
+
+class CacheStatsResponse(BaseModel):
+    llm: Dict[str, Dict[str, int]]
+    query_embeddings: Dict[str, int]
+    semantic: Optional[Dict[str, Union[int, float]]] = None
+
+class ReloadResponse(BaseModel):
+    reloaded: bool
+    version: int
+    rows: int
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    reembedded: int = 0
+    seconds: float = 0.0
+
 class HealthResponse(BaseModel):
     status: str
-    message: str
\ No newline at end of file
+    message: str
+
+
+class StartupResponse(BaseModel):
+    phases: Dict[str, Dict[str, float]]
+    milestones: Dict[str, float]
@@ -0,0 +1,83 @@
+import json
+import numpy as np
+from typing import TYPE_CHECKING, Tuple
+from .filters import TEST_TYPE_CODES
+from .config import LLM_PROMPT_FORMAT, LLM_PROMPT_TOKEN_BUDGET, PROMPT_DESCRIPTION_CHARS
+
+if TYPE_CHECKING:
+    from .catalog_store import Candidates
+
+# Test type name -> catalog letter, e.g. "Knowledge & Skills" -> "K"
+TEST_TYPE_LETTERS = {name: letter for letter, name in TEST_TYPE_CODES.items()}
+
+# Header and legend of the tabular candidate encoding
+TABLE_HEADER = "id|title|description|duration|type"
+TABLE_LEGEND = (
+    "duration in minutes (blank if unknown); type letters: "
+    + ", ".join(f"{letter}={name}" for letter, name in TEST_TYPE_CODES.items())
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def _clean(text: str) -> str:
+    # Pipes and line breaks would split a table row
+    return " ".join(text.replace("|", "/").split())
+
+
+def truncate(text: str, max_chars: int = PROMPT_DESCRIPTION_CHARS) -> str:
+    """Shorten text to max_chars at a word boundary, marking the cut with "..." """
+    text = _clean(text)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:.") + "..."
+
+
+def type_letters(test_type: str) -> str:
+    """Catalog letters of a comma-separated test_type string, e.g. "AP" """
+    return "".join(
+        TEST_TYPE_LETTERS.get(name.strip(), "") for name in test_type.split(",")
+    )
+
+
+def prompt_row(title: str, description: str, duration: int, letters: str) -> str:
+    """One table row without its id, e.g. "Java 8 (New)|Multi-choice test...|18|K" """
+    return f"{_clean(title)}|{truncate(description)}|{duration or ''}|{letters}"
+
+
+def candidate_table(candidates: "Candidates", reserved_tokens: int = 0,
+                    budget: int = LLM_PROMPT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """Candidates as table rows numbered by position, cut to fit the token budget
+
+    reserved_tokens is what the rest of the prompt takes. Rows are dropped from
+    the end (the lowest vector scores), but the first one is always kept.
+    Returns (table, number of rows included).
+    """
+    rows = candidates['prompt_row'].tolist()
+    # Row tokens are counted at catalog load; the id and separator add about one
+    row_tokens = np.cumsum(candidates['prompt_tokens'] + 1)
+    available = budget - reserved_tokens - estimate_tokens(TABLE_HEADER) - 1
+    n_rows = int(np.searchsorted(row_tokens, available, side='right')) if budget > 0 else len(rows)
+    n_rows = max(n_rows, min(len(rows), 1))
+    lines = [TABLE_HEADER] + [f"{i}|{row}" for i, row in enumerate(rows[:n_rows])]
+    return "\n".join(lines), n_rows
+
+
+def candidate_block(candidates: "Candidates", reserved_tokens: int = 0, prompt_format: str = LLM_PROMPT_FORMAT,
+                    budget: int = LLM_PROMPT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """The candidates section of a rerank prompt in the configured format
+
+    "json" is pretty-printed records with full descriptions, without a budget,
+    each carrying the id the model answers with; "table" is the compact encoding above.
+    """
+    if prompt_format == "json":
+        records = candidates.to_records(['title', 'description', 'duration', 'test_type'])
+        records = [{"id": i, **record} for i, record in enumerate(records)]
+        return json.dumps(records, indent=2), len(records)
+    reserved_tokens += estimate_tokens(TABLE_LEGEND) + 1
+    table, n_rows = candidate_table(candidates, reserved_tokens, budget)
+    return f"{TABLE_LEGEND}\n{table}", n_rows
@@ -0,0 +1,160 @@
+import re
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from .config import RERANKER, CROSS_ENCODER_MODEL, RERANK_LIMIT
+from .catalog_store import Candidates
+from .filters import TEST_TYPE_BITS, test_type_bitmask
+from .metrics import run_in_executor
+from .gemini import rerank_with_gemini, rerank_with_gemini_async
+
+RERANKER_NAMES = ("gemini", "heuristic", "cross-encoder", "none")
+
+# Query words hinting at each test type
+TEST_TYPE_HINTS = {
+    'Ability & Aptitude': r"aptitude|ability|cognitive|reasoning|numerical|verbal|inductive|deductive",
+    'Biodata & Situational Judgement': r"situational|judgement|judgment|biodata|scenario",
+    'Competencies': r"competenc",
+    'Development & 360': r"360|development|feedback",
+    'Assessment Exercises': r"exercise|in-tray|role play|case study",
+    'Knowledge & Skills': r"knowledge|skill|technical|programming|coding|developer|java|python|sql|\.net|excel",
+    'Personality & Behavior': r"personality|behavio|culture|motivation|teamwork|collaborat",
+    'Simulations': r"simulation|simulated|hands-on|data entry|typing"
+}
+_HINT_PATTERNS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in TEST_TYPE_HINTS.items()}
+
+
+class Reranker(ABC):
+    """Reorders vector search candidates, keeping at most limit of them"""
+    name = ""
+
+    @abstractmethod
+    def rerank(
+        self, query: str, candidates: Candidates, params: Optional[dict] = None, limit: int = RERANK_LIMIT
+    ) -> Candidates:
+        """Return the best candidates for query, most relevant first"""
+
+    async def rerank_async(
+        self, query: str, candidates: Candidates, params: Optional[dict] = None, executor=None,
+        limit: int = RERANK_LIMIT
+    ) -> Candidates:
+        """Local rerankers are CPU-bound, so run them off the event loop"""
+        return await run_in_executor(executor, self.rerank, query, candidates, params, limit)
+
+
+class NoReranker(Reranker):
+    """Keep the vector search order"""
+    name = "none"
+
+    def rerank(self, query, candidates, params=None, limit=RERANK_LIMIT):
+        return candidates.take(slice(0, limit))
+
+    async def rerank_async(self, query, candidates, params=None, executor=None, limit=RERANK_LIMIT):
+        return self.rerank(query, candidates, params, limit)
+
+
+class GeminiReranker(Reranker):
+    """Rerank with a Gemini call (sync SDK model and/or AsyncGeminiClient)"""
+    name = "gemini"
+
+    def __init__(self, genai_client=None, llm_client=None):
+        self.genai_client = genai_client
+        self.llm_client = llm_client
+
+    def rerank(self, query, candidates, params=None, limit=RERANK_LIMIT):
+        return rerank_with_gemini(query, candidates, self.genai_client, limit=limit)
+
+    async def rerank_async(self, query, candidates, params=None, executor=None, limit=RERANK_LIMIT):
+        return await rerank_with_gemini_async(query, candidates, self.llm_client, limit=limit)
+
+
+class HeuristicReranker(Reranker):
+    """CPU-only scorer over similarity, duration fit, test type match and title overlap"""
+    name = "heuristic"
+
+    def __init__(self, similarity_weight=1.0, duration_weight=0.3, test_type_weight=0.2, title_weight=0.3):
+        self.similarity_weight = similarity_weight
+        self.duration_weight = duration_weight
+        self.test_type_weight = test_type_weight
+        self.title_weight = title_weight
+
+    def rerank(self, query, candidates, params=None, limit=RERANK_LIMIT):
+        if candidates.empty:
+            return candidates
+        params = params or {}
+        similarity = candidates['similarity_score'].astype(np.float32)
+
+        # Duration fit: full credit within the limit, decaying beyond it
+        duration = candidates['duration'].astype(np.float32)
+        duration_limit = params.get("duration_limit")
+        if duration_limit:
+            duration_fit = np.where(duration <= duration_limit, 1.0, duration_limit / np.maximum(duration, 1.0))
+        else:
+            duration_fit = np.zeros(len(candidates), dtype=np.float32)
+
+        # Test types requested explicitly or hinted at by the query text
+        wanted = test_type_bitmask(params.get("test_types") or [])
+        for name, pattern in _HINT_PATTERNS.items():
+            if pattern.search(query):
+                wanted |= TEST_TYPE_BITS[name]
+        if wanted:
+            test_type_match = (candidates['test_type_bits'] & wanted) != 0
+        else:
+            test_type_match = np.zeros(len(candidates), dtype=bool)
+
+        # Share of title words that appear in the query
+        query_words = set(re.findall(r"\w+", query.lower()))
+        title_overlap = np.array([
+            len(words & query_words) / max(len(words), 1)
+            for words in (set(re.findall(r"\w+", title.lower())) for title in candidates['title'])
+        ], dtype=np.float32)
+
+        scores = (
+            self.similarity_weight * similarity
+            + self.duration_weight * duration_fit
+            + self.test_type_weight * test_type_match
+            + self.title_weight * title_overlap
+        )
+        order = np.argsort(-scores, kind="stable")
+        return candidates.take(order[:limit])
+
+
+class CrossEncoderReranker(Reranker):
+    """Score (query, assessment) pairs with a small local cross-encoder"""
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    def rerank(self, query, candidates, params=None, limit=RERANK_LIMIT):
+        if candidates.empty:
+            return candidates
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name)
+        texts = [f"{title}. {description}" for title, description in zip(candidates['title'], candidates['description'])]
+        scores = np.asarray(self._model.predict([(query, text) for text in texts]))
+        order = np.argsort(-scores, kind="stable")
+        return candidates.take(order[:limit])
+
+
+# Local rerankers are stateless apart from loaded models, so share one instance each
+_local_rerankers: Dict[str, Reranker] = {}
+
+
+def get_reranker(name: Optional[str] = None, genai_client=None, llm_client=None) -> Reranker:
+    """Return the reranker for name (defaults to the RERANKER config setting)"""
+    name = name or RERANKER
+    if name == "gemini":
+        return GeminiReranker(genai_client, llm_client)
+    if name not in _local_rerankers:
+        if name == "heuristic":
+            _local_rerankers[name] = HeuristicReranker()
+        elif name == "cross-encoder":
+            _local_rerankers[name] = CrossEncoderReranker()
+        elif name == "none":
+            _local_rerankers[name] = NoReranker()
+        else:
+            raise ValueError(f"Unknown reranker: {name}")
+    return _local_rerankers[name]
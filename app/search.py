@@ -1,55 +1,609 @@
+import asyncio
 import numpy as np
-import pandas as pd
+from contextlib import nullcontext
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
-from .gemini import rerank_with_gemini
+from .rerankers import Reranker, get_reranker
+from .gemini import heuristic_duration, extract_parameters_async, extract_and_rerank, extract_and_rerank_async, llm_deadline
 from .tracing import trace_recommendation
+from .catalog_store import CatalogStore, Candidates, as_catalog_store
+from .embedding_store import l2_normalize
+from .filters import FilterColumns
+from .vector_index import as_vector_index
+from .lexical_index import BM25Index, reciprocal_rank_fusion, weighted_fusion
+from .metrics import timed, record_cache, run_in_executor
+from .cache import LRUCache, SemanticCache, make_key, normalize_query
+from .config import (
+    EMBEDDING_MODEL, QUERY_EMBEDDING_CACHE_SIZE,
+    HYBRID_FUSION, HYBRID_DENSE_WEIGHT, RRF_K, HYBRID_DEPTH,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL,
+    STREAM_REFINE_TIMEOUT, RERANK_LIMIT
+)
 
-def search_assessments(
-    query: str, 
-    df: pd.DataFrame, 
-    embedding_model,
-    embeddings_array: np.ndarray,
-    gemini_model,
-    top_k: int = 10, 
-    duration_limit: Optional[int] = None
+
+# Queries scored together in one matrix-matrix product by the batch search
+QUERY_BLOCK_SIZE = 64
+
+# Normalized query embeddings keyed by the preprocessed query text
+query_embedding_cache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+
+# Final results of recent queries, reused for near-duplicate queries with the same filters
+semantic_cache = SemanticCache(
+    capacity=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL
+) if SEMANTIC_CACHE_ENABLED else None
+
+
+def encode_queries(embedding_model, queries: List[str], cache: Optional[LRUCache] = query_embedding_cache) -> np.ndarray:
+    """Encode queries in a single model call and normalize them
+
+    Queries are preprocessed (lowercased, whitespace collapsed) before encoding;
+    the embedding model is uncased, so this does not change the vectors, and it
+    lets variants of the same query share one cache entry.
+    """
+    texts = [normalize_query(query) for query in queries]
+    if cache is None:
+        return l2_normalize(embedding_model.encode(texts))
+
+    cached = {text: cache.get(text) for text in dict.fromkeys(texts)}
+    missing = [text for text, vector in cached.items() if vector is None]
+    record_cache("query_embedding", not missing)
+    if missing:
+        # Encode each distinct uncached query once, in a single call
+        for text, vector in zip(missing, l2_normalize(embedding_model.encode(missing))):
+            vector.flags.writeable = False
+            cache.set(text, vector)
+            cached[text] = vector
+    return np.stack([cached[text] for text in texts]) if texts else np.empty((0, 0), dtype=np.float32)
+
+
+def semantic_cache_key(**constraints) -> str:
+    """Cache key for the filters a query was served with"""
+    return make_key(EMBEDDING_MODEL, sorted(constraints.items()))
+
+
+def eligible_mask(
+    filters: FilterColumns,
+    duration_limit: Optional[int] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None
+) -> Optional[np.ndarray]:
+    """Mask of rows passing the constraints, or None to search the whole catalog"""
+    mask = filters.mask(duration_limit, test_types, remote_support, adaptive_support)
+    # Fall back to everything if nothing matches
+    if mask is None or not mask.any():
+        return None
+    return mask
+
+
+def hybrid_search(
+    query: str,
+    query_embedding: np.ndarray,
+    index,
+    lexical_index: BM25Index,
+    mask: Optional[np.ndarray],
+    n_candidates: int,
+    dense_hits=None
 ):
-    """Search for relevant assessments based on query"""
-    # Generate embedding for the query
-    query_embedding = embedding_model.encode([query])[0]
-    
-    # Compute cosine similarity between query and all assessments
-    similarities = np.dot(embeddings_array, query_embedding) / (
-        np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_embedding)
-    )
-    
-    # Get indices of top similar assessments
-    top_indices = np.argsort(similarities)[::-1]
-    
-    # Filter by duration if specified
-    if duration_limit:
-        filtered_indices = [idx for idx in top_indices if df.iloc[idx]['duration'] <= duration_limit]
-        top_indices = filtered_indices if filtered_indices else top_indices
-    
-    # Get the top K assessments
-    top_indices = top_indices[:min(top_k*2, len(top_indices))]  # Get more candidates for reranking
-    
-    # Prepare the candidates
-    candidates = df.iloc[top_indices].copy()
-    candidates['similarity_score'] = similarities[top_indices]
-    
-    # Store vector search results for tracing
-    vector_results = candidates.copy()
-    
-    # Use Gemini to rerank and filter the candidates
-    reranked_results = rerank_with_gemini(query, candidates, gemini_model)
-    
+    """Fuse dense and BM25 rankings; returns (ids, dense similarity scores)"""
+    depth = max(n_candidates, HYBRID_DEPTH)
+    dense_ids, dense_scores = dense_hits if dense_hits is not None else index.search(query_embedding, depth, mask)
+    lexical_ids, lexical_scores = lexical_index.search(query, depth, mask)
+
+    if HYBRID_FUSION == "weighted":
+        fused = weighted_fusion(
+            [(dense_ids, dense_scores), (lexical_ids, lexical_scores)],
+            [HYBRID_DENSE_WEIGHT, 1 - HYBRID_DENSE_WEIGHT]
+        )
+    else:
+        fused = reciprocal_rank_fusion([dense_ids.tolist(), lexical_ids.tolist()], RRF_K)
+
+    top_indices = np.array(sorted(fused, key=fused.get, reverse=True)[:n_candidates], dtype=np.int64)
+    return top_indices, index.score_ids(query_embedding, top_indices)
+
+
+def _constraint_params(duration_limit=None, test_types=None, remote_support=None, adaptive_support=None):
+    return {
+        "duration_limit": duration_limit,
+        "test_types": test_types,
+        "remote_support": remote_support,
+        "adaptive_support": adaptive_support
+    }
+
+
+def _trace(query, params, vector_results, reranked_results, timings=None):
     # Trace the recommendation process
-    trace_id = trace_recommendation(
+    return trace_recommendation(
         query=query,
-        params={"duration_limit": duration_limit},
+        params=params,
         vector_results=vector_results,
         gemini_results=reranked_results,
-        final_results=reranked_results
+        final_results=reranked_results,
+        timings=timings
+    )
+
+
+def _rerank_and_trace(query, candidates, reranker, params, timings=None, top_k=RERANK_LIMIT):
+    """Rerank vector search candidates and trace the result"""
+    timings = dict(timings or {})
+
+    # Rerank and filter the candidates (Gemini unless another reranker is chosen).
+    # Rerankers return new Candidates, so candidates still holds the vector order
+    with timed("rerank", timings):
+        reranked_results = reranker.rerank(query, candidates, params, top_k)
+
+    return reranked_results, _trace(query, params, candidates, reranked_results, timings)
+
+
+async def _rerank_and_trace_async(
+    query, candidates, reranker, params, executor, timings=None, deadline=None, top_k=RERANK_LIMIT
+):
+    """Async variant of _rerank_and_trace; with deadline the rerank gets its own LLM deadline
+
+    Run it as its own task (asyncio.gather does this), so the deadline does not
+    leak into other queries.
+    """
+    timings = dict(timings or {})
+    with llm_deadline(deadline) if deadline is not None else nullcontext():
+        with timed("rerank", timings):
+            reranked_results = await reranker.rerank_async(query, candidates, params, executor, top_k)
+
+    return reranked_results, _trace(query, params, candidates, reranked_results, timings)
+
+
+def retrieve_candidates(
+    query_embedding: np.ndarray,
+    df: CatalogStore,
+    embeddings_array,
+    filters: FilterColumns,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    query: Optional[str] = None,
+    lexical_index: Optional[BM25Index] = None
+) -> Candidates:
+    """Vector search step: filter, score and return top_k*2 candidates for reranking
+
+    df is a CatalogStore (or the preprocessed DataFrame, converted on each call).
+    embeddings_array is either the normalized embeddings or a VectorIndex over them.
+    With a lexical_index (and the query text) dense and BM25 rankings are fused.
+    """
+    index = as_vector_index(embeddings_array)
+
+    # Restrict the catalog before scoring
+    mask = eligible_mask(filters, duration_limit, test_types, remote_support, adaptive_support)
+
+    # Get more candidates than needed for reranking
+    if lexical_index is not None and query:
+        top_indices, top_scores = hybrid_search(query, query_embedding, index, lexical_index, mask, top_k * 2)
+    else:
+        top_indices, top_scores = index.search(query_embedding, top_k * 2, mask)
+    return as_catalog_store(df).select(top_indices, top_scores)
+
+
+def search_assessments(
+    query: str,
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    gemini_model,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    filters: Optional[FilterColumns] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[Reranker] = None
+):
+    """Search for relevant assessments based on query
+
+    df should be the catalog's CatalogStore; a preprocessed DataFrame also
+    works but is converted on every call. Results are Candidates (row ids and
+    scores; call to_frame() for a DataFrame).
+
+    embeddings_array is expected to hold L2-normalized rows, as produced by
+    create_embeddings(), so cosine similarity is a single matrix-vector product.
+    It may also be a VectorIndex (see build_vector_index). filters should be
+    built once per catalog with store.filter_columns(). Passing a
+    lexical_index (see build_lexical_index) turns on hybrid retrieval.
+    reranker defaults to the configured RERANKER, using gemini_model for Gemini.
+    """
+    if reranker is None:
+        reranker = get_reranker(genai_client=gemini_model)
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    params = _constraint_params(duration_limit, test_types, remote_support, adaptive_support)
+
+    timings = {}
+
+    # Generate embedding for the query
+    with timed("encode", timings):
+        query_embedding = encode_queries(embedding_model, [query])[0]
+
+    with timed("retrieve", timings):
+        candidates = retrieve_candidates(
+            query_embedding, catalog, embeddings_array, filters, top_k, **params,
+            query=query, lexical_index=lexical_index
+        )
+    return _rerank_and_trace(query, candidates, reranker, params, timings, top_k)
+
+
+async def search_assessments_async(
+    query: str,
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    llm_client,
+    executor,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    filters: Optional[FilterColumns] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    query_embedding: Optional[np.ndarray] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[Reranker] = None
+):
+    """Async search_assessments for the API
+
+    Encoding and scoring run in executor so the event loop stays free
+    while reranking is awaited. Pass query_embedding if encoding was
+    already started elsewhere, e.g. alongside parameter extraction.
+    """
+    if reranker is None:
+        reranker = get_reranker(llm_client=llm_client)
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    params = _constraint_params(duration_limit, test_types, remote_support, adaptive_support)
+
+    timings = {}
+
+    if query_embedding is None:
+        with timed("encode", timings):
+            query_embedding = (await run_in_executor(executor, encode_queries, embedding_model, [query]))[0]
+
+    with timed("retrieve", timings):
+        candidates = await run_in_executor(
+            executor, retrieve_candidates, query_embedding, catalog, embeddings_array, filters, top_k, **params,
+            query=query, lexical_index=lexical_index
+        )
+
+    with timed("rerank", timings):
+        reranked_results = await reranker.rerank_async(query, candidates, params, executor, top_k)
+
+    # Tracing only enqueues a record, so it is cheap enough for the event loop
+    return reranked_results, _trace(query, params, candidates, reranked_results, timings)
+
+
+def _post_filter(results: Candidates, filters: FilterColumns, duration_limit: Optional[int]) -> Candidates:
+    """Apply a duration limit that was only known after retrieval"""
+    if not duration_limit:
+        return results
+    keep = filters.duration[results.ids] <= duration_limit
+    # Like eligible_mask, keep everything rather than return nothing
+    if not keep.any():
+        return results
+    return results.take(np.flatnonzero(keep))
+
+
+def _fused_finish(query, candidates, filters, params, extracted, ranked, timings, duration_limit=None):
+    """Post-filter the fused answer's ranking and trace the request"""
+    # An explicit duration limit wins over the extracted one, as in the two-call flow
+    final_limit = duration_limit or extracted.get("duration_limit")
+    results = _post_filter(ranked, filters, final_limit)
+    trace_params = {**params, "duration_limit": final_limit, "extracted": extracted}
+    return results, extracted, _trace(query, trace_params, candidates, results, timings)
+
+
+def search_assessments_fused(
+    query: str,
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    gemini_model,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    filters: Optional[FilterColumns] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    lexical_index: Optional[BM25Index] = None
+):
+    """search_assessments with a single Gemini call for parameters and ranking (LLM_MODE=fused)
+
+    Retrieval uses the given constraints and, without an explicit
+    duration_limit, a duration found in the query text (heuristic_duration).
+    One call then returns the extracted parameters and the ranking, and the
+    extracted duration_limit is applied to the ranked results. Returns
+    (results, extracted params, trace_id).
+    """
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    params = _constraint_params(duration_limit or heuristic_duration(query), test_types, remote_support, adaptive_support)
+
+    timings = {}
+
+    with timed("encode", timings):
+        query_embedding = encode_queries(embedding_model, [query])[0]
+
+    with timed("retrieve", timings):
+        candidates = retrieve_candidates(
+            query_embedding, catalog, embeddings_array, filters, top_k, **params,
+            query=query, lexical_index=lexical_index
+        )
+
+    with timed("rerank", timings):
+        extracted, ranked = extract_and_rerank(query, candidates, gemini_model, limit=top_k)
+    return _fused_finish(query, candidates, filters, params, extracted, ranked, timings, duration_limit)
+
+
+async def search_assessments_fused_async(
+    query: str,
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    llm_client,
+    executor,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    filters: Optional[FilterColumns] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    query_embedding: Optional[np.ndarray] = None,
+    lexical_index: Optional[BM25Index] = None
+):
+    """Async search_assessments_fused for the API"""
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    params = _constraint_params(duration_limit or heuristic_duration(query), test_types, remote_support, adaptive_support)
+
+    timings = {}
+
+    if query_embedding is None:
+        with timed("encode", timings):
+            query_embedding = (await run_in_executor(executor, encode_queries, embedding_model, [query]))[0]
+
+    with timed("retrieve", timings):
+        candidates = await run_in_executor(
+            executor, retrieve_candidates, query_embedding, catalog, embeddings_array, filters, top_k, **params,
+            query=query, lexical_index=lexical_index
+        )
+
+    with timed("rerank", timings):
+        extracted, ranked = await extract_and_rerank_async(query, candidates, llm_client, limit=top_k)
+    return _fused_finish(query, candidates, filters, params, extracted, ranked, timings, duration_limit)
+
+
+@dataclass(frozen=True)
+class SearchEvent:
+    """One step of a streamed search
+
+    stage is "vector" (top_k by similarity, sent before any LLM call) or
+    "final" (reranked, or the vector order again when reranked is False
+    because the LLM did not answer in time). params are the constraints
+    the results were retrieved with; trace_id is set on the final event.
+    """
+    stage: str
+    results: Candidates
+    params: dict
+    reranked: bool = False
+    trace_id: Optional[str] = None
+
+
+async def search_assessments_stream(
+    query: str,
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    llm_client,
+    executor,
+    top_k: int = 10,
+    duration_limit: Optional[int] = None,
+    filters: Optional[FilterColumns] = None,
+    test_types: Optional[List[str]] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    query_embedding: Optional[np.ndarray] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[Reranker] = None,
+    fused: bool = False,
+    timeout: float = STREAM_REFINE_TIMEOUT
+):
+    """Async generator of SearchEvents: vector results first, LLM-refined results last
+
+    The vector results are retrieved with the explicit duration_limit or one
+    found in the query text, without waiting for the LLM. Then either the
+    extracted parameters (retrieving again if they change the constraints)
+    and the reranker refine them, or with fused=True a single
+    extract_and_rerank call does. Whatever is not done timeout seconds
+    after the vector results is abandoned and the final event keeps the
+    best results so far.
+    """
+    if reranker is None and not fused:
+        reranker = get_reranker(llm_client=llm_client)
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    params = _constraint_params(duration_limit or heuristic_duration(query), test_types, remote_support, adaptive_support)
+
+    timings = {}
+    # In two-call mode parameter extraction runs while the vector results are prepared and sent
+    extraction = None if fused else asyncio.ensure_future(extract_parameters_async(query, llm_client))
+    try:
+        if query_embedding is None:
+            with timed("encode", timings):
+                query_embedding = (await run_in_executor(executor, encode_queries, embedding_model, [query]))[0]
+
+        with timed("retrieve", timings):
+            candidates = await run_in_executor(
+                executor, retrieve_candidates, query_embedding, catalog, embeddings_array, filters, top_k, **params,
+                query=query, lexical_index=lexical_index
+            )
+        results = candidates.take(slice(0, top_k))
+        yield SearchEvent("vector", results, params)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        trace_params, reranked = params, False
+        try:
+            if fused:
+                with timed("rerank", timings):
+                    extracted, ranked = await asyncio.wait_for(
+                        extract_and_rerank_async(query, candidates, llm_client, limit=top_k), deadline - loop.time()
+                    )
+                results, _, trace_id = _fused_finish(
+                    query, candidates, filters, params, extracted, ranked, timings, duration_limit
+                )
+                params = {**params, "duration_limit": duration_limit or extracted.get("duration_limit")}
+                yield SearchEvent("final", results, params, True, trace_id)
+                return
+
+            extracted = await asyncio.wait_for(extraction, deadline - loop.time())
+            refined = {**params, "duration_limit": duration_limit or extracted.get("duration_limit")}
+            if refined != params:
+                # The LLM found a different duration limit than the query text heuristic
+                params = trace_params = refined
+                with timed("retrieve_refined", timings):
+                    candidates = await run_in_executor(
+                        executor, retrieve_candidates, query_embedding, catalog, embeddings_array, filters, top_k,
+                        **params, query=query, lexical_index=lexical_index
+                    )
+                results = candidates.take(slice(0, top_k))
+            with timed("rerank", timings):
+                results = await asyncio.wait_for(
+                    reranker.rerank_async(query, candidates, params, executor, top_k), deadline - loop.time()
+                )
+            reranked = True
+        except asyncio.TimeoutError:
+            trace_params = {**trace_params, "refine_timed_out": True}
+        yield SearchEvent("final", results, params, reranked, _trace(query, trace_params, candidates, results, timings))
+    finally:
+        if extraction is not None and not extraction.done():
+            extraction.cancel()
+
+
+def retrieve_candidates_batch(
+    queries: List[str],
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    top_k: int = 10,
+    constraints: Optional[List[Dict[str, Any]]] = None,
+    filters: Optional[FilterColumns] = None,
+    lexical_index: Optional[BM25Index] = None
+):
+    """Vector search step of the batch search
+
+    All queries are encoded in one model call and, with the exact index, scored
+    with one matrix-matrix product per block of queries. constraints holds one dict per
+    query with the keyword filters accepted by search_assessments (duration_limit,
+    test_types, remote_support, adaptive_support).
+    Returns a list of (query, params, candidates, timings) tuples in query order.
+    """
+    catalog = as_catalog_store(df)
+    if filters is None:
+        filters = catalog.filter_columns()
+    if constraints is None:
+        constraints = [{} for _ in queries]
+    if len(constraints) != len(queries):
+        raise ValueError("constraints must have one entry per query")
+
+    index = as_vector_index(embeddings_array)
+    batch_timings = {}
+    with timed("encode", batch_timings):
+        query_embeddings = encode_queries(embedding_model, queries) if queries else None
+
+    retrieved = []
+    for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+        block = slice(start, start + QUERY_BLOCK_SIZE)
+        block_params = [_constraint_params(**params) for params in constraints[block]]
+        masks = [eligible_mask(filters, **params) for params in block_params]
+        depth = max(top_k * 2, HYBRID_DEPTH) if lexical_index is not None else top_k * 2
+        with timed("retrieve", batch_timings):
+            hits = index.search_batch(query_embeddings[block], depth, masks)
+        # Encoding and block scoring are shared, so traces carry the batch-level times
+        timings = {"encode_batch": batch_timings["encode"], "search_block": batch_timings["retrieve"]}
+
+        for column, (query, params, dense_hits) in enumerate(zip(queries[block], block_params, hits)):
+            if lexical_index is not None:
+                top_indices, top_scores = hybrid_search(
+                    query, query_embeddings[start + column], index, lexical_index,
+                    masks[column], top_k * 2, dense_hits
+                )
+            else:
+                top_indices, top_scores = dense_hits
+            retrieved.append((query, params, catalog.select(top_indices, top_scores), timings))
+
+    return retrieved
+
+
+def search_assessments_batch(
+    queries: List[str],
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    gemini_model,
+    top_k: int = 10,
+    constraints: Optional[List[Dict[str, Any]]] = None,
+    filters: Optional[FilterColumns] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[Reranker] = None,
+    llm_deadline_seconds: Optional[float] = None
+):
+    """Search for many queries at once (see retrieve_candidates_batch), reranking them one after another
+
+    With llm_deadline_seconds each query's rerank gets its own deadline, starting
+    when that query is reranked. The API uses search_assessments_batch_async.
+    Returns a list of (results, trace_id) tuples in query order.
+    """
+    if reranker is None:
+        reranker = get_reranker(genai_client=gemini_model)
+    outputs = []
+    for query, params, candidates, timings in retrieve_candidates_batch(
+        queries, df, embedding_model, embeddings_array, top_k, constraints, filters, lexical_index
+    ):
+        with llm_deadline(llm_deadline_seconds) if llm_deadline_seconds is not None else nullcontext():
+            outputs.append(_rerank_and_trace(query, candidates, reranker, params, timings, top_k))
+
+    return outputs
+
+
+async def search_assessments_batch_async(
+    queries: List[str],
+    df: CatalogStore,
+    embedding_model,
+    embeddings_array,
+    llm_client,
+    executor,
+    top_k: int = 10,
+    constraints: Optional[List[Dict[str, Any]]] = None,
+    filters: Optional[FilterColumns] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[Reranker] = None,
+    llm_deadline_seconds: Optional[float] = None
+):
+    """Async variant of search_assessments_batch for the API request path
+
+    The batch retrieval runs in executor; the reranks then run concurrently,
+    each under its own llm_deadline_seconds deadline.
+    Returns a list of (results, trace_id) tuples in query order.
+    """
+    if reranker is None:
+        reranker = get_reranker(llm_client=llm_client)
+    retrieved = await run_in_executor(
+        executor, retrieve_candidates_batch,
+        queries, df, embedding_model, embeddings_array, top_k, constraints, filters, lexical_index
     )
-    
-    return reranked_results, trace_id
\ No newline at end of file
+    return list(await asyncio.gather(*(
+        _rerank_and_trace_async(query, candidates, reranker, params, executor, timings, llm_deadline_seconds, top_k)
+        for query, params, candidates, timings in retrieved
+    )))
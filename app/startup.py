@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+def process_start_time() -> Optional[float]:
+    """Wall-clock time this process was started (Linux), or None elsewhere"""
+    try:
+        with open("/proc/self/stat", "r", encoding="utf-8") as f:
+            # Fields after the command name; starttime is field 22 of the whole line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r", encoding="utf-8") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupTimer:
+    """Durations of named startup phases, plus milestones measured from process start
+
+    The process start is read from /proc, so the first milestone also covers the
+    interpreter and module imports; elsewhere it falls back to when the timer
+    was created.
+    """
+
+    def __init__(self):
+        self.created = time.time()
+        self.started = process_start_time() or self.created
+        self.phases = {}
+        self.milestones = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as a startup phase"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = {
+                    "started_s": round(start - self.started, 4),
+                    "seconds": round(time.time() - start, 4)
+                }
+
+    def mark(self, name: str):
+        """Record that a milestone (e.g. "listening", "ready") was reached"""
+        with self._lock:
+            self.milestones.setdefault(name, round(time.time() - self.started, 4))
+
+    def report(self) -> dict:
+        with self._lock:
+            return {"phases": dict(self.phases), "milestones": dict(self.milestones)}
+
+    def summary(self) -> str:
+        """One line for the console, e.g. "listening 0.41s, ready 0.52s (catalog 0.09s, ...)" """
+        report = self.report()
+        milestones = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["milestones"].items())
+        phases = ", ".join(f"{name} {phase['seconds']:.2f}s" for name, phase in report["phases"].items())
+        return f"{milestones} ({phases})"
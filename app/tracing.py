@@ -1,42 +1,155 @@
+import atexit
+import json
 import logging
-from datetime import datetime
-import pandas as pd
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/recommendation_traces.log"),
-        logging.StreamHandler()
-    ]
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from .config import (
+    TRACE_LOG_PATH, TRACE_SAMPLE_RATE, TRACE_QUEUE_SIZE, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT, TRACE_STDOUT,
+    TRACE_PER_PROCESS
 )
 
 logger = logging.getLogger(__name__)
+# Trace records only go to the trace handlers set up below
+logger.propagate = False
 
-def trace_recommendation(query, params, vector_results, gemini_results, final_results):
-    """Log the recommendation process to understand how results were generated"""
-    trace_id = datetime.now().strftime("%Y%m%d%H%M%S")
-    
-    logger.info(f"Trace ID: {trace_id}")
-    logger.info(f"Query: {query}")
-    logger.info(f"Extracted Parameters: {params}")
-    
-    # Log vector search results
-    logger.info("Vector Search Results:")
-    for i, (_, row) in enumerate(vector_results.iterrows(), 1):
-        logger.info(f"  {i}. {row['title']} (Score: {row['similarity_score']:.4f})")
-    
-    # Log Gemini reranking
-    logger.info("Gemini Reranking Results:")
-    for i, (_, row) in enumerate(gemini_results.iterrows(), 1):
-        logger.info(f"  {i}. {row['title']}")
-    
-    # Log final results
-    logger.info("Final Recommendations:")
-    for i, (_, row) in enumerate(final_results.iterrows(), 1):
-        logger.info(f"  {i}. {row['title']}")
-    
-    logger.info("=" * 50)
-    
-    return trace_id
\ No newline at end of file
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per line; runs on the writer thread"""
+
+    def format(self, record):
+        payload = record.msg if isinstance(record.msg, dict) else {"message": record.getMessage()}
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue records without blocking; count and drop them when the queue is full"""
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread, so hand the record over as is
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TraceListener(QueueListener):
+    """QueueListener whose stop() waits for room instead of failing on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_tracing(
+    path: str = TRACE_LOG_PATH,
+    queue_size: int = TRACE_QUEUE_SIZE,
+    max_bytes: int = TRACE_MAX_BYTES,
+    backup_count: int = TRACE_BACKUP_COUNT,
+    echo: bool = TRACE_STDOUT,
+    per_process: bool = TRACE_PER_PROCESS
+):
+    """Start the background trace writer (idempotent)
+
+    With per_process the file is {path}.{pid}: RotatingFileHandler assumes it is
+    the only writer, so processes must not share (and rotate) one file.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+        if per_process:
+            path = f"{path}.{os.getpid()}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        formatter = JSONLinesFormatter()
+        handlers = [RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")]
+        if echo:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        logger.addHandler(_queue_handler)
+        logger.setLevel(logging.INFO)
+        _listener = TraceListener(_queue_handler.queue, *handlers, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_tracing)
+
+
+def shutdown_tracing():
+    """Flush queued trace records and stop the writer thread"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logger.removeHandler(_queue_handler)
+        _listener = None
+        _queue_handler = None
+
+
+def trace_stats() -> dict:
+    """Queue depth and number of trace records dropped because the queue was full"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+def _ranked(results, with_scores: bool = False):
+    """Titles (and similarity scores) of a result frame, without row iteration"""
+    if results is None:
+        return []
+    titles = results['title'].tolist()
+    if not with_scores or 'similarity_score' not in results:
+        return titles
+    scores = results['similarity_score'].tolist()
+    return [{"title": title, "score": round(score, 4)} for title, score in zip(titles, scores)]
+
+
+def trace_recommendation(
+    query, params, vector_results, gemini_results, final_results=None, timings=None,
+    sample_rate: float = TRACE_SAMPLE_RATE
+):
+    """Record how the results of a request were generated and return its trace ID
+
+    Every request gets a unique ID; only a sample_rate share of them is written.
+    The record is built from column lists and written by a background thread.
+    """
+    trace_id = uuid.uuid4().hex
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return trace_id
+
+    if _listener is None:
+        setup_tracing()
+    if final_results is None:
+        final_results = gemini_results
+    logger.info({
+        "trace_id": trace_id,
+        "timestamp": time.time(),
+        "query": query,
+        "params": params,
+        "timings_ms": timings or {},
+        "vector_results": _ranked(vector_results, with_scores=True),
+        "reranked_results": _ranked(gemini_results),
+        "final_results": _ranked(final_results)
+    })
+    return trace_id
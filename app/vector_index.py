@@ -0,0 +1,457 @@
+import json
+import os
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+# Rows per block when upcasting float16/int8 vectors for scoring; small blocks
+# stay in cache, which makes an int8 scan about as fast as float32 BLAS
+SCORE_BLOCK_ROWS = 2048
+
+
+def score_vectors(embeddings_array: np.ndarray, query_embedding: np.ndarray) -> np.ndarray:
+    """Dot product of every (normalized) row with the normalized query as float32
+
+    query_embedding may also be a (dim, n_queries) matrix, giving one column
+    of scores per query.
+    """
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    if embeddings_array.dtype == np.float32:
+        return np.asarray(embeddings_array @ query_embedding)
+
+    # NumPy has no BLAS kernel for float16, so upcast block by block
+    similarities = np.empty((embeddings_array.shape[0],) + query_embedding.shape[1:], dtype=np.float32)
+    for start in range(0, embeddings_array.shape[0], SCORE_BLOCK_ROWS):
+        block = embeddings_array[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+        similarities[start:start + SCORE_BLOCK_ROWS] = block @ query_embedding
+    return similarities
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, best first
+
+    Equal scores are ordered by index, so the result is the same as
+    np.argsort(-scores, kind="stable")[:k].
+    """
+    n = scores.shape[0]
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    # Partial selection is O(N); only the k winners get sorted
+    top = np.argpartition(scores, n - k)[n - k:]
+    # The partition keeps an arbitrary subset of the rows tied with the k-th score: take the lowest indices
+    threshold = scores[top].min()
+    above = np.sort(top[scores[top] > threshold])
+    tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+    top = np.concatenate([above, tied])
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class VectorIndex(ABC):
+    """Nearest-neighbour index over L2-normalized vectors
+
+    Rows are addressed by integer ids equal to their position in the catalog.
+    Removed rows keep their id and are never returned again.
+    """
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray) -> "VectorIndex":
+        """Index vectors, replacing any existing content"""
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Append vectors and return their ids"""
+
+    @abstractmethod
+    def remove(self, ids) -> None:
+        """Exclude ids from future searches"""
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the k best rows, restricted to mask if given"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of rows, including removed ones"""
+
+    def search_batch(self, queries: np.ndarray, k: int, masks: Optional[List[Optional[np.ndarray]]] = None):
+        """Search several queries; returns a list of (ids, scores)"""
+        masks = masks if masks is not None else [None] * len(queries)
+        return [self.search(query, k, mask) for query, mask in zip(queries, masks)]
+
+    def score_ids(self, query: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Similarity of the query with specific rows"""
+        return score_vectors(np.asarray(self.vectors[ids]), query)
+
+    def _allowed(self, mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        removed = getattr(self, "removed", None)
+        if removed is None or not removed.any():
+            return mask
+        return ~removed if mask is None else mask & ~removed
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force search with one matrix-vector product over all rows"""
+
+    def __init__(self, vectors: Optional[np.ndarray] = None):
+        self.vectors = None
+        self.removed = None
+        if vectors is not None:
+            self.build(vectors)
+
+    def build(self, vectors):
+        # Keep the array as is (it may be a read-only memory map)
+        self.vectors = vectors
+        self.removed = None
+        return self
+
+    def add(self, vectors):
+        start = len(self)
+        vectors = np.asarray(vectors, dtype=self.vectors.dtype)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        if self.removed is not None:
+            self.removed = np.concatenate([self.removed, np.zeros(len(vectors), dtype=bool)])
+        return np.arange(start, len(self))
+
+    def remove(self, ids):
+        if self.removed is None:
+            self.removed = np.zeros(len(self), dtype=bool)
+        self.removed[np.asarray(ids, dtype=np.int64)] = True
+
+    def search(self, query, k, mask=None):
+        mask = self._allowed(mask)
+        if mask is None:
+            similarities = score_vectors(self.vectors, query)
+            ids = select_top_k(similarities, k)
+            return ids, similarities[ids]
+
+        # Only score the rows that pass the mask
+        eligible = np.flatnonzero(mask)
+        similarities = score_vectors(self.vectors[eligible], query)
+        order = select_top_k(similarities, k)
+        return eligible[order], similarities[order]
+
+    def search_batch(self, queries, k, masks=None):
+        masks = masks if masks is not None else [None] * len(queries)
+        # One matrix-matrix product for all queries, masks applied per column
+        similarity_matrix = score_vectors(self.vectors, np.asarray(queries).T)
+        results = []
+        for column, mask in enumerate(masks):
+            mask = self._allowed(mask)
+            similarities = similarity_matrix[:, column]
+            if mask is None:
+                ids = select_top_k(similarities, k)
+                results.append((ids, similarities[ids]))
+            else:
+                eligible = np.flatnonzero(mask)
+                order = select_top_k(similarities[eligible], k)
+                results.append((eligible[order], similarities[eligible][order]))
+        return results
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: k-means coarse clusters, only nprobe clusters are scored
+
+    Row ids are kept grouped by cluster, so the rows of a probed cluster are one
+    contiguous slice of ids. Filtered searches widen the probe set until enough
+    rows pass the mask. The vectors themselves are not copied: a saved index
+    holds only the clusters and is loaded over the embedding store's memory map.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, n_iter: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.vectors = None
+        self.centroids = None
+        self.assignments = None
+        self.removed = None
+        self._order = None
+        self._offsets = None
+
+    def build(self, vectors):
+        vectors = np.asarray(vectors)
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        self.vectors = vectors
+        self.removed = None
+        self.centroids = self._train(vectors, nlist)
+        self.assignments = self._assign(vectors)
+        self._rebuild_lists()
+        return self
+
+    def _train(self, vectors, nlist):
+        """Spherical k-means on a sample of the rows"""
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), nlist * 256)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # Re-seed empty clusters with random sample rows
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def _assign(self, vectors):
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            assignments[start:start + SCORE_BLOCK_ROWS] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self):
+        self._order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def add(self, vectors):
+        start = len(self)
+        vectors = np.asarray(vectors, dtype=self.vectors.dtype)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        if self.removed is not None:
+            self.removed = np.concatenate([self.removed, np.zeros(len(vectors), dtype=bool)])
+        self._rebuild_lists()
+        return np.arange(start, len(self))
+
+    def remove(self, ids):
+        if self.removed is None:
+            self.removed = np.zeros(len(self), dtype=bool)
+        self.removed[np.asarray(ids, dtype=np.int64)] = True
+
+    def search(self, query, k, mask=None, nprobe: Optional[int] = None):
+        mask = self._allowed(mask)
+        query = np.asarray(query, dtype=np.float32)
+        nlist = len(self.centroids)
+        probe_order = np.argsort(self.centroids @ query)[::-1]
+        nprobe = min(nprobe or self.nprobe, nlist)
+        wanted = min(k, len(self) if mask is None else int(mask.sum()))
+
+        while True:
+            lists = probe_order[:nprobe]
+            ids = np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in lists])
+            if mask is not None:
+                ids = ids[mask[ids]]
+            if len(ids) >= wanted or nprobe >= nlist:
+                break
+            # Too few rows pass the filter in the probed clusters, look further
+            nprobe = min(nprobe * 2, nlist)
+
+        ids = np.sort(ids)
+        similarities = score_vectors(self.vectors[ids], query)
+        order = select_top_k(similarities, k)
+        return ids[order], similarities[order]
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def save(self, path: str, fingerprint: Optional[str] = None):
+        """Persist the clusters to a directory; the vectors stay in the embedding store
+
+        Files are replaced rather than overwritten, so an index loaded earlier
+        from the same directory is not affected.
+        """
+        os.makedirs(path, exist_ok=True)
+        removed = self.removed if self.removed is not None else np.zeros(len(self), dtype=bool)
+        arrays = {
+            "centroids.npy": self.centroids,
+            "assignments.npy": self.assignments,
+            "removed.npy": removed
+        }
+        for name, array in arrays.items():
+            tmp_path = os.path.join(path, f"{name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(path, name))
+        # Written last: a matching fingerprint means the files above are complete
+        tmp_meta = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"nprobe": self.nprobe, "n_iter": self.n_iter, "seed": self.seed,
+                       "fingerprint": fingerprint}, f)
+        os.replace(tmp_meta, os.path.join(path, "meta.json"))
+        # Indexes saved before the vectors were left in the embedding store kept a copy here
+        try:
+            os.remove(os.path.join(path, "vectors.npy"))
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, fingerprint: Optional[str] = None) -> Optional["IVFIndex"]:
+        """Load the saved clusters of vectors, or None if they are missing or built from other data"""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+
+        index = cls(nprobe=meta["nprobe"], n_iter=meta["n_iter"], seed=meta["seed"])
+        index.vectors = vectors
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        index.nlist = len(index.centroids)
+        index.assignments = np.load(os.path.join(path, "assignments.npy"))
+        if len(index.assignments) != len(vectors):
+            return None
+        removed = np.load(os.path.join(path, "removed.npy"))
+        index.removed = removed if removed.any() else None
+        index._rebuild_lists()
+        return index
+
+
+def quantize_vectors(vectors: np.ndarray, precision: str = "int8"):
+    """Compressed copy of normalized vectors; returns (codes, per-row scales or None)
+
+    int8 uses one symmetric scale per row (max |value| maps to 127), float16
+    needs no scale.
+    """
+    if precision == "float16":
+        return np.asarray(vectors, dtype=np.float16), None
+    if precision != "int8":
+        raise ValueError(f"Unknown quantization precision: {precision}")
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        block_scales = np.maximum(np.abs(block).max(axis=1), np.finfo(np.float32).tiny) / 127
+        codes[start:start + SCORE_BLOCK_ROWS] = np.rint(block / block_scales[:, None])
+        scales[start:start + SCORE_BLOCK_ROWS] = block_scales
+    return codes, scales
+
+
+class QuantizedIndex(VectorIndex):
+    """Exact scan over an int8 or float16 copy, with full-precision rescoring
+
+    The compressed copy picks rescore_factor * k candidates; only those rows
+    are read from the full-precision vectors, which can stay a memory map that
+    is mostly never paged in.
+    """
+
+    def __init__(self, precision: str = "int8", rescore_factor: int = 4):
+        self.precision = precision
+        self.rescore_factor = rescore_factor
+        self.vectors = None
+        self.codes = None
+        self.scales = None
+        self.removed = None
+
+    def build(self, vectors):
+        self.vectors = vectors
+        self.removed = None
+        self.codes, self.scales = quantize_vectors(vectors, self.precision)
+        return self
+
+    def add(self, vectors):
+        start = len(self)
+        vectors = np.asarray(vectors, dtype=self.vectors.dtype)
+        codes, scales = quantize_vectors(vectors, self.precision)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.codes = np.concatenate([self.codes, codes])
+        if scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        if self.removed is not None:
+            self.removed = np.concatenate([self.removed, np.zeros(len(vectors), dtype=bool)])
+        return np.arange(start, len(self))
+
+    def remove(self, ids):
+        if self.removed is None:
+            self.removed = np.zeros(len(self), dtype=bool)
+        self.removed[np.asarray(ids, dtype=np.int64)] = True
+
+    def _approximate(self, query, rows=None):
+        """Scores from the compressed copy (a column per query for a query matrix)"""
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = score_vectors(codes, query)
+        if self.scales is not None:
+            scales = self.scales if rows is None else self.scales[rows]
+            scores *= scales if scores.ndim == 1 else scales[:, None]
+        return scores
+
+    def _rescore(self, query, ids, approximate, k):
+        """Rescore the best approximate candidates with the full-precision vectors"""
+        shortlist = np.sort(ids[select_top_k(approximate, k * self.rescore_factor)])
+        similarities = self.score_ids(query, shortlist)
+        order = select_top_k(similarities, k)
+        return shortlist[order], similarities[order]
+
+    def search(self, query, k, mask=None):
+        query = np.asarray(query, dtype=np.float32)
+        mask = self._allowed(mask)
+        ids = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        return self._rescore(query, ids, self._approximate(query, None if mask is None else ids), k)
+
+    def search_batch(self, queries, k, masks=None):
+        queries = np.asarray(queries, dtype=np.float32)
+        masks = masks if masks is not None else [None] * len(queries)
+        # One matrix-matrix product over the compressed copy for all queries
+        approximate = self._approximate(queries.T)
+        results = []
+        for column, (query, mask) in enumerate(zip(queries, masks)):
+            mask = self._allowed(mask)
+            ids = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+            results.append(self._rescore(query, ids, approximate[ids, column], k))
+        return results
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the compressed copy that every search scans"""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def save(self, path: str, fingerprint: Optional[str] = None):
+        """Persist the compressed copy; the full-precision vectors stay in the embedding store"""
+        os.makedirs(path, exist_ok=True)
+        arrays = {"codes.npy": self.codes}
+        if self.scales is not None:
+            arrays["scales.npy"] = self.scales
+        for name, array in arrays.items():
+            tmp_path = os.path.join(path, f"{name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(path, name))
+        # Written last: a matching fingerprint means the files above are complete
+        tmp_meta = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"precision": self.precision, "fingerprint": fingerprint}, f)
+        os.replace(tmp_meta, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, fingerprint: Optional[str] = None,
+             precision: str = "int8", rescore_factor: int = 4) -> Optional["QuantizedIndex"]:
+        """Memory-map a saved compressed copy of vectors, or None if missing or stale"""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("precision") != precision or (fingerprint is not None and meta.get("fingerprint") != fingerprint):
+            return None
+
+        index = cls(precision=precision, rescore_factor=rescore_factor)
+        index.vectors = vectors
+        index.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        if precision == "int8":
+            index.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        if len(index.codes) != len(vectors):
+            return None
+        return index
+
+
+def as_vector_index(embeddings) -> VectorIndex:
+    """Wrap a plain embeddings array in an ExactIndex; pass indexes through"""
+    if isinstance(embeddings, VectorIndex):
+        return embeddings
+    return ExactIndex(embeddings)
@@ -0,0 +1,75 @@
+"""Recall-vs-latency benchmark of the IVF index against the exact backend.
+
+Uses synthetic clustered, L2-normalized vectors so it runs offline:
+
+    python benchmarks/bench_ann.py --rows 200000 --queries 200
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embedding_store import l2_normalize
+from app.vector_index import ExactIndex, IVFIndex
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def clustered_vectors(rng, n, n_clusters=200):
+    """Gaussian blobs around random centres, like topic clusters in a catalog"""
+    centres = rng.standard_normal((n_clusters, DIM), dtype=np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    return l2_normalize(centres[labels] + 0.6 * rng.standard_normal((n, DIM), dtype=np.float32))
+
+
+def run(index, queries, k, masks, **search_kwargs):
+    results, timings = [], []
+    for query, mask in zip(queries, masks):
+        start = time.perf_counter()
+        ids, _ = index.search(query, k, mask, **search_kwargs)
+        timings.append(time.perf_counter() - start)
+        results.append(ids)
+    return results, float(np.mean(timings)) * 1000
+
+
+def recall(results, truth):
+    return float(np.mean([len(set(r) & set(t)) / max(len(t), 1) for r, t in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--filter-fraction", type=float, default=0.1,
+                        help="Fraction of rows passing the filter in the filtered run")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng, args.rows)
+    queries = clustered_vectors(rng, args.queries)
+
+    exact = ExactIndex(vectors)
+    start = time.perf_counter()
+    ivf = IVFIndex().build(vectors)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s, {len(ivf.centroids)} lists, {args.rows} rows")
+
+    for label, masks in (
+        ("unfiltered", [None] * args.queries),
+        (f"filtered {args.filter_fraction:.0%}", [rng.random(args.rows) < args.filter_fraction for _ in queries])
+    ):
+        truth, exact_ms = run(exact, queries, args.top_k, masks)
+        print(f"\n{label}: exact {exact_ms:.3f} ms/query")
+        print(f"{'nprobe':>7} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > len(ivf.centroids):
+                break
+            results, ivf_ms = run(ivf, queries, args.top_k, masks, nprobe=nprobe)
+            print(f"{nprobe:>7} {recall(results, truth):>9.3f} {ivf_ms:>9.3f} {exact_ms / ivf_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Throughput and peak memory of catalog ingest, offline.
+
+Writes a catalog CSV of --rows rows (the replicated catalog repeated under new
+URLs) and runs each step in a fresh interpreter, so peak RSS is per step:
+
+  * preprocess: read and clean the CSV chunk by chunk (iter_preprocessed_chunks)
+    with 1 and --workers processes
+  * load: load_and_preprocess_data plus build_embedding_store, what the API
+    does on startup (the whole catalog in memory)
+  * stream: build_embedding_index (python main.py --mode index), which streams
+    the CSV and encodes batches straight into the memory-mapped store
+
+Encoding uses the hashing encoder from fakes.py, so the numbers are about the
+pipeline rather than the model:
+
+    python benchmarks/bench_ingest.py --rows 1000000 --workers 4 --output ingest.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+
+def write_catalog(path, rows, block_rows=50_000):
+    """CSV of rows rows, written block by block so the benchmark itself stays small"""
+    from bench_pipeline import replicate_catalog
+    block = replicate_catalog(min(rows, block_rows))
+    urls = block['url'].to_numpy()
+    written = 0
+    while written < rows:
+        part = block.iloc[:rows - written].copy()
+        part['url'] = urls[:len(part)] + f"#copy{written // len(block)}"
+        part.to_csv(path, mode="a" if written else "w", header=not written, index=False)
+        written += len(part)
+
+
+def run_step(step, csv_path, store_dir, workers):
+    """Run one step in this process; returns rows and seconds"""
+    from app.data_processing import iter_preprocessed_chunks, load_and_preprocess_data, build_embedding_index
+    from app.embedding_store import build_embedding_store, file_hash
+    from fakes import HashEncoder
+
+    start = time.perf_counter()
+    if step == "preprocess":
+        rows = sum(len(chunk) for chunk in iter_preprocessed_chunks(csv_path, workers=workers))
+    elif step == "load":
+        df = load_and_preprocess_data(csv_path)
+        rows = len(build_embedding_store(df, HashEncoder(), store_dir, csv_hash=file_hash(csv_path)))
+    else:
+        rows = len(build_embedding_index(csv_path, store_dir, model=HashEncoder()))
+    return rows, time.perf_counter() - start
+
+
+def measure(step, csv_path, workdir, workers=1):
+    """Run a step in a fresh interpreter and return its throughput and peak RSS"""
+    store_dir = os.path.join(workdir, f"store_{step}")
+    shutil.rmtree(store_dir, ignore_errors=True)
+    result = subprocess.run(
+        [sys.executable, __file__, "--step", step, "--csv", csv_path, "--store", store_dir, "--workers", str(workers)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes of the parallel preprocess run")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--step", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        # Child process: one step, then its own peak RSS (ru_maxrss is in KiB on Linux)
+        with contextlib.redirect_stdout(sys.stderr):
+            rows, seconds = run_step(args.step, args.csv, args.store, args.workers)
+        print(json.dumps({
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_s": rows / seconds,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        }))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        csv_path = os.path.join(workdir, "catalog.csv")
+        write_catalog(csv_path, args.rows)
+        report = {
+            "benchmark": "ingest",
+            "config": {"rows": args.rows, "workers": args.workers, "csv_mb": os.path.getsize(csv_path) / 2**20},
+            "preprocess": {"workers_1": measure("preprocess", csv_path, workdir)},
+            "load": measure("load", csv_path, workdir),
+            "stream": measure("stream", csv_path, workdir)
+        }
+        if args.workers > 1:
+            report["preprocess"][f"workers_{args.workers}"] = measure("preprocess", csv_path, workdir, args.workers)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Two-call versus fused (LLM_MODE=fused) Gemini flow, offline.
+
+Both flows run the same queries over a replicated catalog with the hashing
+encoder and the stub model from fakes.py, which sleeps --llm-latency-ms per
+call. The report has per-query latency, LLM calls and prompt bytes per query,
+how often results respect the requested duration, and calculate_metrics of the
+fused rankings against the two-call ones:
+
+    python benchmarks/bench_llm_modes.py --rows 10000 --queries 100 --llm-latency-ms 300
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import replicate_catalog, percentiles_ms
+
+
+def make_queries(source, n_queries):
+    """Source titles, every other one asking for a duration limit in the text"""
+    titles = source['title'].tolist()
+    limits = (20, 30, 45)
+    queries, limits_asked = [], []
+    for i in range(n_queries):
+        query = titles[i % len(titles)] + (f" {i // len(titles)}" if i >= len(titles) else "")
+        limit = limits[i % len(limits)] if i % 2 else None
+        queries.append(query + (f", assessment under {limit} minutes" if limit else ""))
+        limits_asked.append(limit)
+    return queries, limits_asked
+
+
+def run_mode(mode, queries, store, encoder, index, filters, gemini, top_k):
+    from app.gemini import extract_parameters, response_cache
+    from app.rerankers import get_reranker
+    from app.search import search_assessments, search_assessments_fused, query_embedding_cache
+
+    response_cache.memory.clear()
+    query_embedding_cache.clear()
+    calls, prompt_bytes = gemini.calls, gemini.prompt_bytes
+    reranker = get_reranker("gemini", genai_client=gemini)
+    latencies, outputs = [], []
+    for query in queries:
+        start = time.perf_counter()
+        if mode == "fused":
+            results, _, _ = search_assessments_fused(
+                query, store, encoder, index, gemini, top_k=top_k, filters=filters
+            )
+        else:
+            params = extract_parameters(query, gemini)
+            results, _ = search_assessments(
+                query, store, encoder, index, gemini, top_k=top_k,
+                duration_limit=params.get("duration_limit"), filters=filters, reranker=reranker
+            )
+        latencies.append(time.perf_counter() - start)
+        outputs.append(results)
+    return outputs, {
+        "latency_ms": percentiles_ms(latencies),
+        "llm_calls_per_query": (gemini.calls - calls) / len(queries),
+        "prompt_bytes_per_query": (gemini.prompt_bytes - prompt_bytes) / len(queries)
+    }
+
+
+def duration_respected(outputs, limits_asked):
+    """Share of results within the duration asked for, over queries that asked"""
+    checked = [
+        float(np.mean(results['duration'] <= limit))
+        for results, limit in zip(outputs, limits_asked)
+        if limit and len(results)
+    ]
+    return float(np.mean(checked)) if checked else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="simulated Gemini latency per call")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_llm_modes_")
+    os.environ["TRACE_LOG_PATH"] = os.path.join(workdir, "traces.log")
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            from app.catalog_store import CatalogStore
+            from app.data_processing import load_and_preprocess_data, create_embeddings, build_vector_index
+            from app.evaluation import calculate_metrics
+            from fakes import HashEncoder, FakeGeminiModel
+
+            csv_path = os.path.join(workdir, "catalog.csv")
+            replicate_catalog(args.rows).to_csv(csv_path, index=False)
+            df = load_and_preprocess_data(csv_path)
+            encoder = HashEncoder()
+            _, embeddings = create_embeddings(df, csv_path, os.path.join(workdir, "embeddings"), model=encoder)
+            store = CatalogStore.from_dataframe(df)
+            filters = store.filter_columns()
+            index = build_vector_index(embeddings, store_dir=os.path.join(workdir, "embeddings"))
+            queries, limits_asked = make_queries(df.iloc[:min(len(df), 47)], args.queries)
+            gemini = FakeGeminiModel(latency_ms=args.llm_latency_ms)
+
+            report = {"benchmark": "llm_modes", "config": vars(args), "modes": {}}
+            rankings = {}
+            for mode in ("two-call", "fused"):
+                outputs, stats = run_mode(mode, queries, store, encoder, index, filters, gemini, args.top_k)
+                stats["duration_respected"] = duration_respected(outputs, limits_asked)
+                report["modes"][mode] = stats
+                rankings[mode] = [results['url'].tolist() for results in outputs]
+            recall_k, map_k = calculate_metrics(rankings["fused"], rankings["two-call"], args.top_k)
+            report["fused_vs_two_call"] = {f"recall@{args.top_k}": recall_k, f"map@{args.top_k}": map_k}
+            two_call_p50 = report["modes"]["two-call"]["latency_ms"]["p50"]
+            report["fused_vs_two_call"]["p50_speedup"] = two_call_p50 / report["modes"]["fused"]["latency_ms"]["p50"]
+    finally:
+        from app.tracing import shutdown_tracing
+        shutdown_tracing()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Gemini client behaviour under injected latency and errors, offline.
+
+The stub LLM server runs in-process with a fault profile per scenario, and
+extract_parameters_async (the first LLM call of every request) is driven
+through AsyncGeminiClient with different policies:
+
+  * baseline: one 10 s attempt, no retries, no deadline, no circuit breaker
+    (the client as it was before deadlines existed)
+  * retry: GEMINI_TIMEOUT attempts retried with jittered backoff within an
+    LLM_DEADLINE budget per request, circuit breaker on
+  * retry+hedge: the same plus a hedged second request after --hedge-ms
+
+The report has per-request latency percentiles, the share of requests that
+fell back to default parameters, requests the server saw, and retry, hedge
+and breaker counters:
+
+    python benchmarks/bench_llm_resilience.py --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from app.config import GEMINI_TIMEOUT, LLM_DEADLINE, LLM_MAX_RETRIES, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET
+from app.gemini import AsyncGeminiClient, CircuitBreaker, extract_parameters_async, llm_deadline
+from app.metrics import LLM_FALLBACKS, LLM_SKIPPED, LLM_RETRIES, LLM_HEDGES, LLM_BREAKER_OPENED
+from bench_pipeline import percentiles_ms
+from stub_llm_server import StubServer, make_handler
+
+SCENARIOS = {
+    "healthy": {},
+    "errors_20pct": {"error_rate": 0.2, "error_status": 503},
+    "slow_tail_10pct": {"slow_rate": 0.1, "slow_ms": 3000},
+    "outage": {"error_rate": 1.0, "error_status": 503}
+}
+
+COUNTERS = {
+    "fallbacks": (LLM_FALLBACKS, ("extract_parameters",)),
+    "skipped": (LLM_SKIPPED, ("extract_parameters",)),
+    "retries": (LLM_RETRIES, ()),
+    "hedged": (LLM_HEDGES, ()),
+    "breaker_opened": (LLM_BREAKER_OPENED, ())
+}
+
+
+def start_server(latency_ms, jitter_ms, faults, counts):
+    handler = make_handler(latency_ms, jitter_ms, faults)
+    lock = threading.Lock()
+
+    class CountingHandler(handler):
+        def do_POST(self):
+            with lock:
+                counts["requests"] += 1
+            super().do_POST()
+
+    server = StubServer(("127.0.0.1", 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(policy, endpoint, concurrency, hedge_ms):
+    if policy == "baseline":
+        return AsyncGeminiClient(
+            api_key="bench", endpoint=endpoint, timeout=10.0, max_concurrency=concurrency,
+            max_retries=0, hedge_delay=0, breaker=CircuitBreaker(failure_threshold=0)
+        )
+    return AsyncGeminiClient(
+        api_key="bench", endpoint=endpoint, timeout=GEMINI_TIMEOUT, max_concurrency=concurrency,
+        max_retries=LLM_MAX_RETRIES, hedge_delay=hedge_ms / 1000 if policy == "retry+hedge" else 0,
+        breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+    )
+
+
+async def run_policy(policy, endpoint, n_requests, concurrency, hedge_ms):
+    client = make_client(policy, endpoint, concurrency, hedge_ms)
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            if policy == "baseline":
+                await extract_parameters_async(f"Java developer test {i} under 30 minutes", client, cache=None)
+            else:
+                with llm_deadline(LLM_DEADLINE):
+                    await extract_parameters_async(f"Java developer test {i} under 30 minutes", client, cache=None)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--hedge-ms", type=float, default=300.0, help="hedge delay of the retry+hedge policy")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--policies", default="baseline,retry,retry+hedge")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {"benchmark": "llm_resilience", "config": vars(args), "scenarios": {}}
+    with contextlib.redirect_stdout(sys.stderr):
+        for scenario in args.scenarios.split(","):
+            faults, counts = dict(SCENARIOS[scenario]), {"requests": 0}
+            server = start_server(args.latency_ms, args.jitter_ms, faults, counts)
+            endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+            results = {}
+            for policy in args.policies.split(","):
+                before = {name: counter.value(*labels) for name, (counter, labels) in COUNTERS.items()}
+                counts["requests"] = 0
+                latencies, elapsed = asyncio.run(
+                    run_policy(policy, endpoint, args.requests, args.concurrency, args.hedge_ms)
+                )
+                deltas = {name: counter.value(*labels) - before[name] for name, (counter, labels) in COUNTERS.items()}
+                results[policy] = {
+                    "latency_ms": percentiles_ms(latencies),
+                    "wall_s": elapsed,
+                    "fallback_rate": deltas.pop("fallbacks") / args.requests,
+                    "server_requests": counts["requests"],
+                    **deltas
+                }
+            server.shutdown()
+            server.server_close()
+            report["scenarios"][scenario] = results
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
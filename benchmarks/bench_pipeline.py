@@ -0,0 +1,248 @@
+"""End-to-end offline benchmark of the recommendation pipeline.
+
+Replicates data/shl_assessments.csv synthetically to the requested sizes, then
+measures cold and warm start (load_and_preprocess_data, create_embeddings,
+filters and index), per-query latency of search_assessments, batch
+throughput, calculate_metrics time, retrieval quality and peak RSS. Gemini is
+replaced by a deterministic fake and the embedding model by a hashing
+encoder, so no network access is needed. Each size runs in a fresh process
+so peak RSS is per size. Results are written as JSON for diffing across commits:
+
+    python benchmarks/bench_pipeline.py --rows 47,100000,1000000 --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+SOURCE_CSV = os.path.join(ROOT, "data", "shl_assessments.csv")
+
+
+def replicate_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    """The source catalog first, then perturbed variants of it up to rows rows"""
+    source = pd.read_csv(SOURCE_CSV)
+    rng = np.random.default_rng(seed)
+    positions = np.arange(rows)
+    catalog = source.iloc[positions % len(source)].reset_index(drop=True)
+    variant = positions // len(source)
+    synthetic = variant > 0
+    if not synthetic.any():
+        return catalog
+
+    # Distinct URLs and titles, a few extra catalog words and a new duration per variant
+    suffix = pd.Series(variant[synthetic]).astype(str).to_numpy()
+    vocabulary = np.unique(" ".join(source['description'].fillna("")).lower().split())
+    extra_words = rng.choice(vocabulary, size=(int(synthetic.sum()), 3))
+    catalog.loc[synthetic, 'url'] = catalog.loc[synthetic, 'url'].to_numpy() + "?variant=" + suffix
+    catalog.loc[synthetic, 'title'] = catalog.loc[synthetic, 'title'].to_numpy() + " (Variant " + suffix + ")"
+    catalog.loc[synthetic, 'description'] = (
+        catalog.loc[synthetic, 'description'].fillna("").to_numpy() + " "
+        + pd.Series([" ".join(words) for words in extra_words]).to_numpy()
+    )
+    catalog.loc[synthetic, 'duration'] = rng.integers(5, 90, int(synthetic.sum()))
+    return catalog
+
+
+def percentiles_ms(latencies):
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "max": float(values.max())
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_size(rows: int, n_queries: int, top_k: int, reranker_name: str, llm_latency_ms: float) -> dict:
+    """Benchmark one catalog size in a scratch directory; runs in its own process"""
+    workdir = tempfile.mkdtemp(prefix=f"bench_{rows}_")
+    # Keep traces of benchmark queries out of logs/
+    os.environ["TRACE_LOG_PATH"] = os.path.join(workdir, "traces.log")
+    try:
+        # Progress messages from the app must not mix with the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            return _run_size(workdir, rows, n_queries, top_k, reranker_name, llm_latency_ms)
+    finally:
+        from app.tracing import shutdown_tracing
+        shutdown_tracing()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_size(workdir, rows, n_queries, top_k, reranker_name, llm_latency_ms):
+    # Imported here so the app picks up TRACE_LOG_PATH in the fresh process
+    from app.data_processing import load_and_preprocess_data, create_embeddings, build_vector_index
+    from app.evaluation import calculate_metrics
+    from app.catalog_store import CatalogStore
+    from app.gemini import response_cache
+    from app.rerankers import get_reranker
+    from app.search import search_assessments, search_assessments_batch, query_embedding_cache
+    from fakes import HashEncoder, FakeGeminiModel
+
+    result = {"rows": rows}
+    start = time.perf_counter()
+    csv_path = os.path.join(workdir, "catalog.csv")
+    replicate_catalog(rows).to_csv(csv_path, index=False)
+    result["synthesize_s"] = time.perf_counter() - start
+    store_dir = os.path.join(workdir, "embeddings")
+
+    start = time.perf_counter()
+    df = load_and_preprocess_data(csv_path)
+    load_s = time.perf_counter() - start
+
+    encoder = HashEncoder()
+    start = time.perf_counter()
+    create_embeddings(df, csv_path, store_dir, model=encoder)
+    embed_cold_s = time.perf_counter() - start
+
+    # Second start: the embedding store is current and only gets memory-mapped
+    start = time.perf_counter()
+    _, embeddings_array = create_embeddings(df, csv_path, store_dir, model=encoder)
+    embed_warm_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = CatalogStore.from_dataframe(df)
+    store_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filters = store.filter_columns()
+    index = build_vector_index(embeddings_array, store_dir=store_dir)
+    index_s = time.perf_counter() - start
+
+    result["startup"] = {
+        "load_and_preprocess_s": load_s,
+        "create_embeddings_cold_s": embed_cold_s,
+        "create_embeddings_warm_s": embed_warm_s,
+        "catalog_store_s": store_s,
+        "filters_and_index_s": index_s,
+        "cold_start_s": load_s + embed_cold_s + store_s + index_s,
+        "warm_start_s": load_s + embed_warm_s + store_s + index_s
+    }
+
+    # Queries: source descriptions and titles, made distinct when cycled so no cache is hit
+    source = df.iloc[:min(len(df), 47)]
+    base_queries = source['description'].fillna("").tolist() + source['title'].tolist()
+    queries = [
+        base_queries[i % len(base_queries)] + (f" {i // len(base_queries)}" if i >= len(base_queries) else "")
+        for i in range(n_queries)
+    ]
+    constraints = [{"duration_limit": 30} if i % 3 == 2 else {} for i in range(n_queries)]
+
+    gemini = FakeGeminiModel(latency_ms=llm_latency_ms)
+    reranker = get_reranker(reranker_name, genai_client=gemini)
+
+    response_cache.memory.clear()
+    query_embedding_cache.clear()
+    latencies, predictions = [], []
+    for query, params in zip(queries, constraints):
+        start = time.perf_counter()
+        results, _ = search_assessments(
+            query, store, encoder, index, gemini, top_k=top_k, filters=filters, reranker=reranker, **params
+        )
+        latencies.append(time.perf_counter() - start)
+        predictions.append(results['url'].tolist())
+    result["latency_ms"] = percentiles_ms(latencies)
+    result["throughput_qps"] = len(queries) / sum(latencies)
+
+    response_cache.memory.clear()
+    query_embedding_cache.clear()
+    start = time.perf_counter()
+    search_assessments_batch(
+        queries, store, encoder, index, gemini, top_k=top_k, constraints=constraints,
+        filters=filters, reranker=reranker
+    )
+    result["batch_throughput_qps"] = len(queries) / (time.perf_counter() - start)
+
+    # Quality: each unconstrained source description should find its own row among the variants
+    quality_ids = [i for i in range(min(len(source), n_queries)) if not constraints[i]]
+    quality_predictions = [predictions[i] for i in quality_ids]
+    ground_truth = [[source['url'].iloc[i]] for i in quality_ids]
+    result["quality"] = {}
+    for k in (3, 10):
+        recall_k, map_k = calculate_metrics(quality_predictions, ground_truth, k)
+        result["quality"][f"recall@{k}"] = recall_k
+        result["quality"][f"map@{k}"] = map_k
+
+    # calculate_metrics cost on 10k prediction lists
+    repeat = max(1, 10_000 // max(len(predictions), 1))
+    truth = [[row[0]] if row else [] for row in predictions]
+    start = time.perf_counter()
+    calculate_metrics(predictions * repeat, truth * repeat, 10)
+    result["calculate_metrics_ms_per_10k"] = (time.perf_counter() - start) * 1000 * 10_000 / (len(predictions) * repeat)
+
+    result["llm_calls"] = gemini.calls
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="47,10000,100000",
+                        help="comma-separated catalog sizes, e.g. 47,100000,1000000")
+    parser.add_argument("--queries", type=int, default=94)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--reranker", default="gemini", help="gemini (fake client), heuristic or none")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated Gemini latency per call")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(",")]
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_size, (rows, args.queries, args.top_k, args.reranker, args.llm_latency_ms)))
+
+    report = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Size and ranking quality of the rerank prompt encodings, offline.
+
+Reranks the vector search candidates of the same queries with
+rerank_with_gemini and extract_and_rerank once per LLM_PROMPT_FORMAT ("json":
+pretty-printed records with full descriptions, "table": compact rows under
+the token budget), with the hashing encoder and the stub model from fakes.py,
+which ranks candidates by words shared with the query in what the prompt
+shows of them. Two query sets are used:
+
+  * title: the title of a catalog row
+  * description: words from the end of a row's description, which the
+    table encoding truncates away for longer descriptions (the worst case)
+
+The report has prompt bytes and estimated tokens per request for the rerank
+and fused prompts, the candidates left out by the budget, calculate_metrics
+of each format against the row the query came from, and of the table
+rankings against the json ones:
+
+    python benchmarks/bench_prompt.py --rows 47 --top-k 10
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import replicate_catalog
+
+FORMATS = ("json", "table")
+
+
+def make_queries(source):
+    """Title and description-tail queries, each with the URL of the row it came from"""
+    titles = source['title'].tolist()
+    tails = [" ".join(description.split()[-8:]) for description in source['description'].fillna("")]
+    urls = [[url] for url in source['url'].tolist()]
+    return {"title": (titles, urls), "description": (tails, urls)}
+
+
+def run_format(prompt_format, queries, store, encoder, index, filters, top_k):
+    import app.gemini as gemini_module
+    from app.gemini import rerank_with_gemini, extract_and_rerank
+    from app.metrics import LLM_PROMPT_TOKENS, LLM_PROMPT_ROWS_DROPPED
+    from app.search import encode_queries, retrieve_candidates
+    from fakes import FakeGeminiModel
+
+    gemini_module.LLM_PROMPT_FORMAT = prompt_format
+    embeddings = encode_queries(encoder, queries, cache=None)
+    candidates = [retrieve_candidates(embedding, store, index, filters, top_k) for embedding in embeddings]
+    stats, rankings = {}, []
+    for call, llm_call in (("rerank", rerank_with_gemini), ("fused", extract_and_rerank)):
+        gemini = FakeGeminiModel()
+        tokens, dropped = LLM_PROMPT_TOKENS.value(call), LLM_PROMPT_ROWS_DROPPED.value(call)
+        for query, query_candidates in zip(queries, candidates):
+            results = llm_call(query, query_candidates, gemini, cache=None)
+            if call == "rerank":
+                rankings.append(results['url'].tolist())
+        stats[call] = {
+            "prompt_bytes_per_request": gemini.prompt_bytes / len(queries),
+            "prompt_tokens_per_request": (LLM_PROMPT_TOKENS.value(call) - tokens) / len(queries),
+            "rows_dropped_per_request": (LLM_PROMPT_ROWS_DROPPED.value(call) - dropped) / len(queries)
+        }
+    return rankings, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=47, help="catalog rows (the source catalog has 47)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--k", type=int, default=3, help="K of calculate_metrics against the source row")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_prompt_")
+    os.environ["TRACE_LOG_PATH"] = os.path.join(workdir, "traces.log")
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            from app.catalog_store import CatalogStore
+            from app.data_processing import load_and_preprocess_data, create_embeddings, build_vector_index
+            from app.evaluation import calculate_metrics
+            from fakes import HashEncoder
+
+            csv_path = os.path.join(workdir, "catalog.csv")
+            replicate_catalog(args.rows).to_csv(csv_path, index=False)
+            df = load_and_preprocess_data(csv_path)
+            encoder = HashEncoder()
+            _, embeddings = create_embeddings(df, csv_path, os.path.join(workdir, "embeddings"), model=encoder)
+            store = CatalogStore.from_dataframe(df)
+            filters = store.filter_columns()
+            index = build_vector_index(embeddings, store_dir=os.path.join(workdir, "embeddings"))
+
+            report = {"benchmark": "prompt", "config": vars(args), "query_sets": {}}
+            for name, (queries, truth) in make_queries(df.iloc[:min(len(df), 47)]).items():
+                results, rankings = {}, {}
+                for prompt_format in FORMATS:
+                    rankings[prompt_format], results[prompt_format] = run_format(
+                        prompt_format, queries, store, encoder, index, filters, args.top_k
+                    )
+                    recall_k, map_k = calculate_metrics(rankings[prompt_format], truth, args.k)
+                    results[prompt_format][f"recall@{args.k}"] = recall_k
+                    results[prompt_format][f"map@{args.k}"] = map_k
+                recall_k, map_k = calculate_metrics(rankings["table"], rankings["json"], args.top_k)
+                results["table_vs_json"] = {f"recall@{args.top_k}": recall_k, f"map@{args.top_k}": map_k}
+                for call in ("rerank", "fused"):
+                    results["table_vs_json"][f"{call}_token_ratio"] = (
+                        results["table"][call]["prompt_tokens_per_request"]
+                        / results["json"][call]["prompt_tokens_per_request"]
+                    )
+                report["query_sets"][name] = results
+    finally:
+        from app.tracing import shutdown_tracing
+        shutdown_tracing()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Accuracy, latency and memory of quantized catalog vectors and query encoders.
+
+Catalog part (offline): the catalog is replicated to --rows rows and encoded
+with the hashing encoder, then searched with the float32 exact index, a
+float16 copy and the int8 QuantizedIndex with and without full-precision
+rescoring. Rankings are compared with the float32 ones using
+calculate_metrics (recall@k / map@k against the float32 top k) and by the
+float32 similarity lost per result.
+
+Encoder part (needs sentence-transformers, plus torch for int8 and
+sentence-transformers[onnx] for onnx): each QUERY_ENCODER variant encodes
+the same queries; the report has load time, per-query encode latency, RSS
+growth, cosine agreement with the default model and calculate_metrics of
+its retrieval against the default model's. Variants that cannot be loaded
+are reported with the error.
+
+    python benchmarks/bench_quantization.py --rows 100000 --encoders default,int8,onnx --output quant.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from app.data_processing import LazyEmbeddingModel
+from app.embedding_store import l2_normalize
+from app.evaluation import calculate_metrics
+from app.vector_index import ExactIndex, QuantizedIndex, select_top_k
+from bench_pipeline import replicate_catalog, percentiles_ms
+from fakes import HashEncoder
+
+
+def current_rss_mb():
+    """Resident set size now (Linux), or None elsewhere"""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def search_all(search, queries, k):
+    predictions, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids = search(query, k)
+        latencies.append(time.perf_counter() - start)
+        predictions.append(ids.tolist())
+    return predictions, latencies
+
+
+def agreement(predictions, reference, k):
+    recall_k, map_k = calculate_metrics(predictions, reference, k)
+    return {f"recall@{k}_vs_float32": recall_k, f"map@{k}_vs_float32": map_k}
+
+
+def score_loss(predictions, reference, vectors, queries):
+    """Mean float32 similarity lost per result versus the float32 top k
+
+    Near-duplicate rows make recall against float32 drop on mere tie flips;
+    this shows how much worse the returned rows actually are.
+    """
+    losses = [
+        float(np.mean(vectors[ref] @ query) - np.mean(vectors[pred] @ query))
+        for pred, ref, query in zip(predictions, reference, queries)
+    ]
+    return float(np.mean(losses))
+
+
+def catalog_report(rows, n_queries, k, rescore_factor):
+    catalog = replicate_catalog(rows)
+    texts = (catalog['title'] + " " + catalog['description'].fillna("")).tolist()
+    encoder = HashEncoder()
+    vectors = l2_normalize(encoder.encode(texts))
+    source_texts = texts[:min(len(texts), 47)]
+    queries = l2_normalize(encoder.encode([source_texts[i % len(source_texts)] for i in range(n_queries)]))
+    # Quality: each query text should find the catalog row it was taken from
+    own_rows = [[i % len(source_texts)] for i in range(n_queries)]
+
+    exact = ExactIndex(vectors)
+    reference, latencies = search_all(lambda q, k: exact.search(q, k)[0], queries, k)
+    results = {"float32": {
+        "bytes": int(vectors.nbytes),
+        "latency_ms": percentiles_ms(latencies),
+        "own_row_recall@k": calculate_metrics(reference, own_rows, k)[0]
+    }}
+
+    half = ExactIndex(vectors.astype(np.float16))
+    int8 = QuantizedIndex("int8", rescore_factor).build(vectors)
+    float16 = QuantizedIndex("float16", rescore_factor).build(vectors)
+    variants = {
+        "float16": (half.vectors.nbytes, lambda q, k: half.search(q, k)[0]),
+        "int8_no_rescore": (int8.nbytes, lambda q, k: select_top_k(int8._approximate(q), k)),
+        f"int8_rescore_x{rescore_factor}": (int8.nbytes, lambda q, k: int8.search(q, k)[0]),
+        f"float16_rescore_x{rescore_factor}": (float16.nbytes, lambda q, k: float16.search(q, k)[0])
+    }
+    for name, (nbytes, search) in variants.items():
+        predictions, latencies = search_all(search, queries, k)
+        results[name] = {
+            "bytes": int(nbytes),
+            "memory_saved": 1 - nbytes / vectors.nbytes,
+            "latency_ms": percentiles_ms(latencies),
+            "own_row_recall@k": calculate_metrics(predictions, own_rows, k)[0],
+            "mean_score_loss": score_loss(predictions, reference, vectors, queries),
+            **agreement(predictions, reference, k)
+        }
+    return {"rows": rows, "queries": n_queries, "top_k": k, "results": results}
+
+
+def encoder_report(variants, n_queries, k):
+    import pandas as pd
+    catalog = pd.read_csv(os.path.join(ROOT, "data", "shl_assessments.csv"))
+    texts = (catalog['title'] + " " + catalog['description'].fillna("")).tolist()
+    queries = [texts[i % len(texts)][:200] for i in range(n_queries)]
+
+    report, reference, index = {}, None, None
+    for variant in variants:
+        rss_before = current_rss_mb()
+        try:
+            start = time.perf_counter()
+            model = LazyEmbeddingModel(variant=variant)
+            model.load()
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            report[variant] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        rss_after = current_rss_mb()
+
+        model.encode(queries[:1])  # warm-up
+        latencies, embeddings = [], []
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.append(model.encode([query])[0])
+            latencies.append(time.perf_counter() - start)
+        embeddings = l2_normalize(np.asarray(embeddings))
+
+        if reference is None:
+            # The first variant (normally "default") is the float32 reference
+            catalog_model = model if variant == "default" else LazyEmbeddingModel()
+            index = ExactIndex(l2_normalize(catalog_model.encode(texts)))
+            reference = embeddings
+        reference_rankings = [index.search(q, k)[0].tolist() for q in reference]
+        rankings = [index.search(q, k)[0].tolist() for q in embeddings]
+        report[variant] = {
+            "load_s": load_s,
+            "rss_growth_mb": rss_after - rss_before if rss_before is not None else None,
+            "encode_latency_ms": percentiles_ms(latencies),
+            "min_cosine_vs_reference": float(np.min(np.sum(embeddings * reference, axis=1))),
+            **agreement(rankings, reference_rankings, k)
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--encoders", default="default,int8,onnx",
+                        help="comma-separated QUERY_ENCODER variants, empty to skip the encoder part")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = {"benchmark": "quantization", "config": vars(args),
+                  "catalog": catalog_report(args.rows, args.queries, args.top_k, args.rescore_factor)}
+        variants = [variant for variant in args.encoders.split(",") if variant]
+        if variants:
+            try:
+                import sentence_transformers  # noqa: F401
+            except ImportError as e:
+                report["encoders"] = {"skipped": f"sentence-transformers is not installed ({e})"}
+            else:
+                report["encoders"] = encoder_report(variants, args.queries, args.top_k)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
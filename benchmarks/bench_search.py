@@ -0,0 +1,68 @@
+"""Micro-benchmark for the scoring and top-k selection step of search_assessments.
+
+Compares the previous implementation (per-query norms + full argsort) with the
+pre-normalized matrix-vector product + argpartition selection.
+
+    python benchmarks/bench_search.py --max-rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embedding_store import l2_normalize
+from app.vector_index import score_vectors, select_top_k
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def baseline(embeddings, query, k):
+    """The scoring path before pre-normalization"""
+    similarities = np.dot(embeddings, query) / (
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+    )
+    return np.argsort(similarities)[::-1][:k]
+
+
+def optimized(normalized, query, k):
+    """Single matrix-vector product over pre-normalized rows"""
+    similarities = score_vectors(normalized, l2_normalize(query))
+    return select_top_k(similarities, k)
+
+
+def time_call(fn, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-rows", type=int, default=1_000_000)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sizes = [n for n in (50, 1_000, 10_000, 100_000, 1_000_000) if n <= args.max_rows]
+
+    print(f"{'rows':>10} {'baseline ms':>12} {'optimized ms':>13} {'speedup':>8} {'same top-k':>11}")
+    for n in sizes:
+        embeddings = rng.standard_normal((n, DIM), dtype=np.float32)
+        normalized = l2_normalize(embeddings, dtype=args.dtype)
+        query = rng.standard_normal(DIM, dtype=np.float32)
+
+        same = np.array_equal(baseline(embeddings, query, args.top_k), optimized(normalized, query, args.top_k))
+        base_ms = time_call(baseline, embeddings, query, args.top_k)
+        opt_ms = time_call(optimized, normalized, query, args.top_k)
+        print(f"{n:>10} {base_ms:>12.3f} {opt_ms:>13.3f} {base_ms / opt_ms:>7.1f}x {str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
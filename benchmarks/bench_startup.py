@@ -0,0 +1,121 @@
+"""Process start and time-to-serve of the CLI and the API.
+
+Runs in fresh interpreters, with the current environment (set GEMINI_API_KEY,
+EMBEDDING_STORE_DIR etc. as for the API):
+
+  * wall time of `python main.py --help` and of `python -c "import api"`
+  * the slowest imports below api (python -X importtime)
+  * an API server started with uvicorn: seconds until /health answers, until
+    /ready is 200 and until the background warm-up has loaded the models,
+    plus the /startup phase report of the server itself
+
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+
+def wall_time(args, runs):
+    """Median and min wall time of a command, in seconds"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times)}
+
+
+def slowest_imports(module, limit):
+    """Cumulative import time (ms) of the top-level packages a module pulls in"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Depth-0 and depth-1 entries are the imports made by the module itself
+        if len(name) - len(name.lstrip()) <= 3:
+            totals[name.strip()] = int(cumulative) / 1000
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return dict(ranked[:limit])
+
+
+def wait_for(client, url, accept, deadline):
+    """Seconds until GET url returns a response accepted by accept(), or None on timeout"""
+    while time.perf_counter() < deadline:
+        try:
+            response = client.get(url)
+            if accept(response):
+                return response
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def serve_report(port, timeout):
+    env = dict(os.environ, TRACE_LOG_PATH=os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "traces.log"))
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = start + timeout
+    report = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            if wait_for(client, "/health", lambda r: r.status_code == 200, deadline) is not None:
+                report["health_s"] = time.perf_counter() - start
+            if wait_for(client, "/ready", lambda r: r.status_code == 200, deadline) is not None:
+                report["ready_s"] = time.perf_counter() - start
+            warm = wait_for(client, "/startup", lambda r: "warm" in r.json()["milestones"], deadline)
+            if warm is not None:
+                report["warm_s"] = time.perf_counter() - start
+                report["server_report"] = warm.json()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for the server")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "startup",
+        "config": vars(args),
+        "main_help": wall_time([sys.executable, "main.py", "--help"], args.runs),
+        "import_api": wall_time([sys.executable, "-c", "import api"], args.runs),
+        "import_api_slowest_ms": slowest_imports("api", 8),
+        "server": serve_report(args.port, args.timeout)
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
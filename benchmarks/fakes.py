@@ -0,0 +1,66 @@
+"""Offline stand-ins for the embedding model and Gemini, shared by the benchmarks.
+
+Both are deterministic, so repeated runs produce the same rankings and the
+timings reflect the pipeline rather than a model or the network.
+"""
+import re
+import time
+import zlib
+import numpy as np
+
+from stub_llm_server import answer
+
+DIM = 384  # all-MiniLM-L6-v2
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashEncoder:
+    """Feature-hashing bag-of-words encoder with the SentenceTransformer encode() signature
+
+    Texts sharing words get similar vectors, so retrieval quality numbers stay
+    meaningful without downloading a model.
+    """
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+        self.model_name = f"hash-{dim}"
+        self._slots = {}
+
+    def _slot(self, token):
+        slot = self._slots.get(token)
+        if slot is None:
+            digest = zlib.crc32(token.encode("utf-8"))
+            slot = self._slots[token] = (digest % self.dim, 1.0 if digest & 0x80000000 else -1.0)
+        return slot
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                column, sign = self._slot(token)
+                vectors[row, column] += sign
+        return vectors
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Answers generate_content() like genai.GenerativeModel, using the stub server's replies"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.prompt_bytes = 0
+
+    def generate_content(self, prompt: str, request_options=None):
+        self.calls += 1
+        self.prompt_bytes += len(prompt.encode("utf-8"))
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return FakeResponse(answer(prompt))
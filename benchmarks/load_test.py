@@ -0,0 +1,66 @@
+"""Concurrent load test for the /recommend endpoint.
+
+Start the stub LLM server and the API, then run for example:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8000/recommend --concurrency 32 --requests 500
+
+Run it once against this tree and once against a checkout of the previous
+implementation to compare p50/p99 latency and throughput.
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import numpy as np
+import pandas as pd
+
+
+async def run(url, queries, concurrency, total):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"query": queries[i % len(queries)]})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1) if len(latencies_ms) else None,
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 1) if len(latencies_ms) else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 1) if len(latencies_ms) else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /recommend")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/recommend")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--data", default="data/shl_assessments.csv")
+    args = parser.parse_args()
+
+    # Use catalog titles as a realistic set of distinct queries
+    queries = pd.read_csv(args.data)['title'].tolist()
+    print(json.dumps(asyncio.run(run(args.url, queries, args.concurrency, args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
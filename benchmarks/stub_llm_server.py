@@ -0,0 +1,146 @@
+"""Local stand-in for the Gemini generateContent REST endpoint.
+
+Answers parameter-extraction, rerank and fused prompts with valid JSON after a
+configurable delay, so the API can be load-tested without network access.
+Rankings order the candidates by words shared with the query:
+
+    python benchmarks/stub_llm_server.py --port 8900 --latency-ms 400
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8900 python main.py --mode api
+
+Faults can be injected to exercise timeouts, retries, hedging and the circuit
+breaker: a share of requests fails with an HTTP error, or answers slow_ms late:
+
+    python benchmarks/stub_llm_server.py --error-rate 0.2 --error-status 503 --slow-rate 0.05 --slow-ms 5000
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+# Candidates as JSON records (LLM_PROMPT_FORMAT=json) or table rows ("table")
+RECORD_PATTERN = re.compile(r'"title": "((?:[^"\\]|\\.)*)",\s*"description": "((?:[^"\\]|\\.)*)"')
+ROW_PATTERN = re.compile(r"^\d+\|([^|\n]*)\|([^|\n]*)\|", re.MULTILINE)
+
+
+def _ranking(query: str, prompt: str) -> list:
+    """Candidate ids ordered by words shared with the query (ties keep the prompt order), at most 10
+
+    The order depends on the titles and descriptions the prompt shows, so
+    prompt encodings can be compared offline.
+    """
+    words = set(WORD_PATTERN.findall(query.lower()))
+    candidates = RECORD_PATTERN.findall(prompt) or ROW_PATTERN.findall(prompt)
+    overlap = [
+        len(words & set(WORD_PATTERN.findall(f"{title} {description}".lower()))) for title, description in candidates
+    ]
+    return sorted(range(len(candidates)), key=lambda i: -overlap[i])[:10]
+
+
+def answer(prompt: str) -> str:
+    """Produce a plausible model answer for the prompts in app/gemini.py"""
+    match = re.search(r'Query: "(.*?)"\n', prompt, re.DOTALL)
+    query = match.group(1) if match else ""
+    duration = re.search(r"(\d+)\s*min", query)
+    if '"ranking"' in prompt:
+        # Fused prompt (LLM_MODE=fused): parameters of the query plus a ranking
+        return json.dumps({
+            "duration_limit": int(duration.group(1)) if duration else None,
+            "skills": [],
+            "level": None,
+            "ranking": _ranking(query, prompt)
+        })
+    if "Extract the following parameters" in prompt:
+        match = re.search(r"(\d+)\s*min", prompt)
+        return json.dumps({
+            "duration_limit": int(match.group(1)) if match else None,
+            "skills": [],
+            "level": None
+        })
+    return json.dumps(_ranking(query, prompt))
+
+
+def make_handler(latency_ms: float, jitter_ms: float, faults: Optional[dict] = None):
+    """Request handler class; faults is read on every request, so callers may change it while serving
+
+    faults keys: error_rate (share of requests answered with error_status),
+    slow_rate (share delayed by an extra slow_ms).
+    """
+    faults = faults if faults is not None else {}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = "".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            delay_ms = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+            if random.random() < faults.get("slow_rate", 0.0):
+                delay_ms += faults.get("slow_ms", 0.0)
+            time.sleep(max(0.0, delay_ms) / 1000)
+
+            if random.random() < faults.get("error_rate", 0.0):
+                self.send_error(faults.get("error_status", 503))
+                return
+
+            payload = json.dumps({
+                "candidates": [{
+                    "content": {"parts": [{"text": answer(prompt)}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0
+                }]
+            }).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on this request (timeout or a hedged request answered first)
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connection bursts (1 s SYN retries) under concurrent load
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-ms more")
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = {
+        "error_rate": args.error_rate, "error_status": args.error_status,
+        "slow_rate": args.slow_rate, "slow_ms": args.slow_ms
+    }
+    server = StubServer((args.host, args.port), make_handler(args.latency_ms, args.jitter_ms, faults))
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,44 @@
+"""Crawler for the SHL product catalog.
+
+Fetches catalog and assessment pages over a pooled HTTP session with bounded
+concurrency, a per-host rate limit and retries with backoff. Validators
+(ETag / Last-Modified) and parsed results are kept in a state file, so
+recrawls only download pages that changed and an interrupted crawl resumes
+where it stopped. Scraped assessments are merged into the catalog CSV by URL;
+after a complete crawl, rows of assessments no longer on the site are dropped.
+
+    python data/crawler/crawler.py --max-pages 200
+    python data/crawler/crawler.py --base-url http://127.0.0.1:8800   # local copy of the site
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
-import re
-import csv
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://www.shl.com"
+CATALOG_PATH = "/solutions/products/product-catalog/"
 
-# Target URL for SHL catalog
-TARGET_URL = "https://www.shl.com/solutions/products/product-catalog/"
+CRAWLER_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(CRAWLER_DIR), "shl_assessments.csv")
+DEFAULT_STATE = os.path.join(CRAWLER_DIR, "crawl_state.json")
 
-# Initialize the list of discovered URLs
-urls_to_visit = [TARGET_URL]
-visited_urls = set()
+FIELDNAMES = ['url', 'title', 'description', 'duration', 'test_type', 'remote_support', 'adaptive_support']
 
 # Regex for assessment page URLs
 assessment_pattern = re.compile(r'/solutions/products/product-catalog/view/[^/]+/?$')
 
-# Storage for scraped data
-assessments_data = []
-
-# Crawl limit
-MAX_CRAWL = 50
-
-
 assessment_type_map = {
     'A': 'Ability & Aptitude',
     'B': 'Biodata & Situational Judgement',
@@ -32,109 +50,400 @@ assessment_type_map = {
     'S': 'Simulations'
 }
 
+# Responses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Pages that no longer exist: not an error, they are just left out
+GONE_STATUSES = {404, 410}
 
-def crawler():
-    crawl_count = 0
-    while urls_to_visit and crawl_count < MAX_CRAWL:
-        current_url = urls_to_visit.pop(0)
-        if current_url in visited_urls:
-            continue
-        visited_urls.add(current_url)
-        print(f"Visiting: {current_url}")
+# Frontier priorities: assessment pages first, then catalog listing pages
+PRIORITY_ASSESSMENT = 0
+PRIORITY_CATALOG = 1
 
-        try:
-            response = requests.get(current_url)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Error fetching {current_url}: {e}")
-            continue
 
-        soup = BeautifulSoup(response.content, "html.parser")
+def parse_assessment(soup: BeautifulSoup, url: str) -> dict:
+    """Extract the catalog fields from an assessment page"""
+    title_el = soup.find('h1') or soup.find('h2', class_='product-title')
+    title = title_el.get_text(strip=True) if title_el else "Unknown Assessment"
 
-        # Enqueue new links
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.startswith('/'):
-                absolute = f"https://www.shl.com{href}"
-            else:
-                absolute = requests.compat.urljoin(current_url, href)
-            if absolute.startswith("https://www.shl.com") and absolute not in visited_urls:
-                if assessment_pattern.search(absolute):
-                    urls_to_visit.insert(0, absolute)
-                elif "/solutions/products/product-catalog/" in absolute:
-                    urls_to_visit.append(absolute)
-
-        # Scrape details if it's an assessment page
-        if assessment_pattern.search(current_url):
+    # Description
+    desc_el = soup.find('div', class_='description') or soup.find('div', id='description')
+    if desc_el:
+        description = desc_el.get_text(strip=True)
+    else:
+        main_area = soup.find('main') or soup.find('div', class_='content-area')
+        paragraphs = main_area.find_all('p') if main_area else []
+        description = paragraphs[0].get_text(strip=True) if paragraphs else ""
+
+    # Duration: scan <p> tags for the completion time
+    duration = 0
+    for p in soup.find_all('p'):
+        text = p.get_text(strip=True)
+        if re.search(r'Approximate Completion Time in minutes|Assessment length', text, re.IGNORECASE):
+            # Extract first integer found
+            num_match = re.search(r'(\d+)', text)
+            if num_match:
+                duration = int(num_match.group(1))
+                break
+
+    # Test Types
+    test_types = []
+    type_label = soup.find(string=re.compile(r'Test Type:', re.IGNORECASE))
+    if type_label:
+        parent = type_label.parent
+        for indicator in parent.find_all(string=re.compile(r'[A-Z]')):
+            for ch in indicator.strip():
+                if ch in assessment_type_map:
+                    test_types.append(assessment_type_map[ch])
+
+    # Remote Testing
+    remote_support = 'No'
+    remote_label = soup.find(string=re.compile(r'Remote Testing:', re.IGNORECASE))
+    if remote_label and remote_label.parent.find('span', class_=re.compile(r'green|circle|dot|indicator')):
+        remote_support = 'Yes'
+
+    # Adaptive/IRT (default No; extend if available)
+    adaptive_support = 'No'
+
+    return {
+        'url': url,
+        'title': title,
+        'description': description,
+        'duration': duration,
+        'test_type': ', '.join(test_types),
+        'remote_support': remote_support,
+        'adaptive_support': adaptive_support
+    }
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least min_interval seconds"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(host, 0.0))
+            self._next_allowed[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CrawlState:
+    """Per-URL validators and results plus the pending frontier, stored as JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = {}
+        self.frontier = []
+        self.visited = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.pages = data.get("pages", {})
+            self.frontier = data.get("frontier", [])
+            self.visited = data.get("visited", [])
+
+    def get(self, url: str) -> dict:
+        with self._lock:
+            return self.pages.get(url, {})
+
+    def update(self, url: str, entry: dict):
+        with self._lock:
+            self.pages[url] = entry
+
+    def remove(self, url: str):
+        with self._lock:
+            self.pages.pop(url, None)
+
+    def save(self, frontier, visited):
+        """Write the state atomically so an interrupted save never corrupts it"""
+        if not self.path:
+            return
+        with self._lock:
+            payload = {"pages": self.pages, "frontier": frontier, "visited": sorted(visited)}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+
+
+class Crawler:
+    """Concurrent, incremental crawler for one catalog site"""
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        state_path: str = DEFAULT_STATE,
+        concurrency: int = 4,
+        min_interval: float = 0.5,
+        timeout: float = 15.0,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_pages: int = None,
+        save_every: int = 25,
+        page_retries: int = 2
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.host = urlparse(self.base_url).netloc
+        self.start_url = self.base_url + CATALOG_PATH
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_pages = max_pages
+        self.save_every = save_every
+        # Times a page that failed after all fetch retries goes back into the frontier
+        self.page_retries = page_retries
+        self.state = CrawlState(state_path)
+        self.rate_limiter = HostRateLimiter(min_interval)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "shl-assessment-recommender-crawler"
+
+        self.stats = {"fetched": 0, "not_modified": 0, "gone": 0, "failed": 0, "retries": 0}
+        # True once a crawl reached every page it found, so its records are the whole catalog
+        self.complete = False
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def close(self):
+        self.session.close()
+
+    def normalize(self, href: str, page_url: str):
+        """Absolute catalog URL for a link, or None if it leaves the catalog"""
+        absolute, _ = urldefrag(urljoin(page_url, href))
+        parsed = urlparse(absolute)
+        if parsed.netloc != self.host or CATALOG_PATH not in parsed.path:
+            return None
+        return absolute
+
+    def fetch(self, url: str, entry: dict):
+        """GET with conditional headers, retrying transient failures with jittered backoff"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(self.host)
             try:
-                title_el = soup.find('h1') or soup.find('h2', class_='product-title')
-                title = title_el.get_text(strip=True) if title_el else "Unknown Assessment"
-
-                # Description
-                desc_el = soup.find('div', class_='description') or soup.find('div', id='description')
-                if desc_el:
-                    description = desc_el.get_text(strip=True)
-                else:
-                    main_area = soup.find('main') or soup.find('div', class_='content-area')
-                    paragraphs = main_area.find_all('p') if main_area else []
-                    description = paragraphs[0].get_text(strip=True) if paragraphs else ""
-
-                # Duration: improved extraction by scanning <p> tags
-                duration = 0
-                for p in soup.find_all('p'):
-                    text = p.get_text(strip=True)
-                    if re.search(r'Approximate Completion Time in minutes|Assessment length', text, re.IGNORECASE):
-                        # Extract first integer found
-                        num_match = re.search(r'(\d+)', text)
-                        if num_match:
-                            duration = int(num_match.group(1))
-                            break
-
-                # Test Types
-                test_types = []
-                type_label = soup.find(text=re.compile(r'Test Type:', re.IGNORECASE))
-                if type_label:
-                    parent = type_label.parent
-                    for indicator in parent.find_all(text=re.compile(r'[A-Z]')):
-                        for ch in indicator.strip():
-                            if ch in assessment_type_map:
-                                test_types.append(assessment_type_map[ch])
-
-                # Remote Testing
-                remote_support = 'No'
-                remote_label = soup.find(text=re.compile(r'Remote Testing:', re.IGNORECASE))
-                if remote_label and remote_label.parent.find('span', class_=re.compile(r'green|circle|dot|indicator')):
-                    remote_support = 'Yes'
-
-                # Adaptive/IRT (default No; extend if available)
-                adaptive_support = 'No'
-
-                assessments_data.append({
-                    'url': current_url,
-                    'title': title,
-                    'description': description,
-                    'duration': duration,
-                    'test_type': test_types,
-                    'remote_support': remote_support,
-                    'adaptive_support': adaptive_support
-                })
-                print(f"Extracted: {title} ({duration} min)")
-
-            except Exception as e:
-                print(f"Error extracting data from {current_url}: {e}")
-
-        crawl_count += 1
-
-# Run crawler and save to CSV
-crawler()
-
-with open('shl_assessments.csv', 'w', newline='', encoding='utf-8') as csvfile:
-    fieldnames = ['url', 'title', 'description', 'duration', 'test_type', 'remote_support', 'adaptive_support']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-    for item in assessments_data:
-        row = item.copy()
-        row['test_type'] = ', '.join(item['test_type'])
-        writer.writerow(row)
-
-print(f"Saved {len(assessments_data)} assessments to CSV.")
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit() and attempt < self.max_retries:
+                    self._count("retries")
+                    time.sleep(float(retry_after))
+                    continue
+            if attempt == self.max_retries:
+                raise error
+            self._count("retries")
+            time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def process(self, url: str):
+        """Fetch and parse one page; returns (links, record or None)"""
+        entry = self.state.get(url)
+        response = self.fetch(url, entry)
+
+        if response.status_code == 304 and "links" in entry:
+            # Unchanged since the last crawl: reuse what was parsed then
+            self._count("not_modified")
+            return entry["links"], entry.get("record")
+        if response.status_code in GONE_STATUSES:
+            self._count("gone")
+            self.state.remove(url)
+            return [], None
+        response.raise_for_status()
+        self._count("fetched")
+
+        soup = BeautifulSoup(response.content, "html.parser")
+        links = []
+        for a in soup.find_all('a', href=True):
+            absolute = self.normalize(a['href'], url)
+            if absolute is not None:
+                links.append(absolute)
+        links = list(dict.fromkeys(links))
+
+        record = None
+        if assessment_pattern.search(urlparse(url).path):
+            record = parse_assessment(soup, url)
+            print(f"Extracted: {record['title']} ({record['duration']} min)")
+
+        self.state.update(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "links": links,
+            "record": record,
+            "fetched_at": time.time()
+        })
+        return links, record
+
+    def crawl(self):
+        """Crawl the catalog and return the scraped assessment records"""
+        counter = itertools.count()
+        frontier = []
+        seen = set()
+
+        def push(url, retry=False):
+            if url in seen and not retry:
+                return
+            seen.add(url)
+            priority = PRIORITY_ASSESSMENT if assessment_pattern.search(urlparse(url).path) else PRIORITY_CATALOG
+            heapq.heappush(frontier, (priority, next(counter), url))
+
+        # Resume an interrupted crawl, otherwise start over (unchanged pages cost a 304)
+        if self.state.frontier:
+            print(f"Resuming crawl: {len(self.state.frontier)} pending, {len(self.state.visited)} done")
+            seen.update(self.state.visited)
+            for url in self.state.frontier:
+                push(url)
+        else:
+            push(self.start_url)
+        visited = set(self.state.visited)
+
+        records = {}
+        # Records of pages finished before an interruption
+        for url in visited:
+            record = self.state.get(url).get("record")
+            if record:
+                records[url] = record
+
+        in_flight = {}
+        processed = 0
+        # Failed pages are only visited once they succeed: they are queued again (behind
+        # the pages already waiting) up to page_retries times, then left for the next run
+        failures = {}
+        given_up = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawler") as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.concurrency and (
+                    self.max_pages is None or processed + len(in_flight) < self.max_pages
+                ):
+                    _, _, url = heapq.heappop(frontier)
+                    print(f"Visiting: {url}")
+                    in_flight[executor.submit(self.process, url)] = url
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    processed += 1
+                    try:
+                        links, record = future.result()
+                    except Exception as e:
+                        self._count("failed")
+                        failures[url] = failures.get(url, 0) + 1
+                        if failures[url] <= self.page_retries:
+                            print(f"Error fetching {url}: {e}; queued again")
+                            push(url, retry=True)
+                        else:
+                            print(f"Error fetching {url}: {e}; giving up")
+                            given_up.append(url)
+                        continue
+                    visited.add(url)
+                    if record:
+                        records[url] = record
+                    for link in links:
+                        push(link)
+
+                    if processed % self.save_every == 0:
+                        self.state.save(self._pending(frontier, in_flight) + given_up, visited)
+
+        # A finished crawl leaves no frontier, so the next run starts over incrementally
+        # (failed pages included); stopping at max_pages keeps the rest, and the pages
+        # given up on, for a resumed run
+        pending = self._pending(frontier, in_flight)
+        self.state.save(pending + given_up if pending else [], visited if pending else [])
+        # A crawl that found no assessment at all (e.g. the catalog page is gone) is not trusted
+        self.complete = not pending and not given_up and bool(records)
+        return list(records.values())
+
+    @staticmethod
+    def _pending(frontier, in_flight):
+        return [url for _, _, url in sorted(frontier)] + list(in_flight.values())
+
+
+def merge_into_csv(records, path: str = DEFAULT_OUTPUT, complete: bool = False) -> int:
+    """Update or add records by URL and return the number of rows
+
+    Other rows of the existing CSV are kept, unless complete is True (see
+    Crawler.complete): records of a complete crawl are the whole catalog, so
+    rows of assessments that are no longer on the site are dropped.
+    """
+    rows = {}
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                rows[row['url']] = row
+    if complete:
+        crawled = {record['url'] for record in records}
+        stale = [url for url in rows if url not in crawled]
+        for url in stale:
+            del rows[url]
+        if stale:
+            print(f"Dropped {len(stale)} assessments no longer in the catalog")
+    for record in records:
+        rows[record['url']] = {field: record.get(field, "") for field in FIELDNAMES}
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows.values())
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl the SHL product catalog into the assessments CSV")
+    parser.add_argument("--base-url", default=BASE_URL, help="site root, e.g. a local fixture server")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--state", default=DEFAULT_STATE, help="state file for incremental and resumed crawls")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--min-interval", type=float, default=0.5, help="seconds between requests to the host")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--page-retries", type=int, default=2, help="times a failed page is queued again")
+    args = parser.parse_args()
+
+    crawler = Crawler(
+        base_url=args.base_url,
+        state_path=args.state,
+        concurrency=args.concurrency,
+        min_interval=args.min_interval,
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        max_pages=args.max_pages,
+        page_retries=args.page_retries
+    )
+    try:
+        records = crawler.crawl()
+    finally:
+        crawler.close()
+
+    total = merge_into_csv(records, args.output, complete=crawler.complete)
+    print(f"Crawled {len(records)} assessments ({crawler.stats}); {total} rows in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,36 @@
 import argparse
-import uvicorn
-from app.config import API_HOST, API_PORT
+import os
+from app.config import API_HOST, API_PORT, API_WORKERS, CATALOG_POLL_INTERVAL, MULTI_WORKER_POLL_INTERVAL
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="SHL Assessment Recommendation System")
-    parser.add_argument("--mode", type=str, choices=["api", "web"], default="web",
-                      help="Run in API mode or web interface mode")
+    parser.add_argument("--mode", type=str, choices=["api", "web", "index"], default="web",
+                      help="Run in API mode, web interface mode, or build the embedding index")
+    parser.add_argument("--workers", type=int, default=API_WORKERS,
+                      help="Number of API worker processes (API mode)")
     args = parser.parse_args()
     
+    # Heavy modules are imported by the mode that needs them, so --help and the
+    # API's process start do not pay for the others
     if args.mode == "api":
+        import uvicorn
+    
+    if args.mode == "api" and args.workers > 1:
+        # Build the embedding store, IVF index and filter columns once, so every
+        # worker only memory-maps them and the OS shares the pages between workers
+        from app.catalog import CatalogManager
+        CatalogManager().reload()
+        # Workers read these from the environment they inherit: every worker watches the
+        # catalog, so a reload through one of them reaches all, and writes its own trace file
+        if CATALOG_POLL_INTERVAL <= 0:
+            os.environ["CATALOG_POLL_INTERVAL"] = str(MULTI_WORKER_POLL_INTERVAL)
+        os.environ["TRACE_PER_PROCESS"] = "true"
+        uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=args.workers)
+    elif args.mode == "api":
         # Run FastAPI
         uvicorn.run("api:app", host=API_HOST, port=API_PORT, reload=True)
+    elif args.mode == "index":
+        # Build the on-disk embedding store so the API can start without encoding
+        from app.data_processing import build_embedding_index
+        build_embedding_index()
     
\ No newline at end of file
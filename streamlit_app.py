@@ -1,9 +1,71 @@
+import asyncio
 import streamlit as st
 
-import pandas as pd
-from app.data_processing import load_and_preprocess_data, create_embeddings
-from app.search import search_assessments
-from app.gemini import setup_gemini, extract_parameters
+from app.catalog import CatalogManager
+from app.data_processing import query_encoder
+from app.search import search_assessments_stream
+from app.config import LLM_MODE, RERANKER
+from app.gemini import AsyncGeminiClient
+
+@st.cache_resource(show_spinner=False)
+def load_services():
+    """Catalog and query encoder, loaded once per server process and shared by all sessions"""
+    catalog = CatalogManager()
+    catalog.reload()
+    catalog.start_watching()
+    return catalog, query_encoder(catalog.embedding_model)
+
+def iterate_stream(make_stream):
+    """Drive the API's async search stream from this synchronous script, one event at a time
+
+    Each search gets its own event loop and Gemini client, closed when the
+    stream ends (or the script is rerun and the generator is dropped).
+    """
+    loop = asyncio.new_event_loop()
+    llm_client = AsyncGeminiClient()
+    stream = make_stream(llm_client)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(stream.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(stream.aclose())
+        loop.run_until_complete(llm_client.aclose())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+def show_results(event):
+    """Results of one stream event; the vector event says that Gemini is still refining"""
+    results = event.results
+    if event.stage == "vector":
+        st.caption("⏳ Closest matches by similarity, refining with Gemini...")
+    elif not event.reranked:
+        st.caption("Gemini did not answer in time, showing the closest matches by similarity")
+    st.markdown(f'<div class="subheader">Found {len(results)} relevant assessments</div>', unsafe_allow_html=True)
+    if event.trace_id:
+        st.markdown(f"*Trace ID: {event.trace_id}*")
+    
+    # Show summary of filters applied
+    if event.params.get("duration_limit"):
+        st.info(f"🕒 Filter applied: Maximum duration {event.params.get('duration_limit')} minutes")
+    
+    # Create grid for results
+    for i, (_, row) in enumerate(results.to_frame().iterrows(), 1):
+        with st.expander(f"**{i}. {row['title']}** - {row['duration']} min | {row['test_type']}"):
+            col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                st.markdown(f"**Description:**\n{row['description']}")
+            
+            with col2:
+                st.markdown("**Details:**")
+                st.markdown(f"🕒 **Duration:** {row['duration']} minutes")
+                st.markdown(f"📊 **Test Type:** {row['test_type']}")
+                st.markdown(f"🌐 **Remote Testing:** {row['remote_support']}")
+                st.markdown(f"⚙️ **Adaptive:** {row['adaptive_support']}")
+                st.markdown(f"[View Assessment Details]({row['url']})", unsafe_allow_html=True)
 
 def create_streamlit_app():
     """Create the Streamlit web application"""
@@ -54,18 +116,18 @@ def create_streamlit_app():
         </style>
         """, unsafe_allow_html=True)
     
+    # Header, drawn before loading so the page shows up right away
+    st.markdown('<div class="main-header">SHL Assessment Recommendation System</div>', unsafe_allow_html=True)
+    st.write("Enter a job description or query to find relevant assessments that match your requirements.")
+    
     # Load the data and models
     if 'data_loaded' not in st.session_state:
         with st.spinner("Loading models and data... Please wait."):
-            st.session_state.df = load_and_preprocess_data()
-            st.session_state.embedding_model, st.session_state.embeddings_array = create_embeddings(st.session_state.df)
-            st.session_state.gemini_model = setup_gemini()
+            catalog, embedding_model = load_services()
+            st.session_state.catalog = catalog
+            st.session_state.embedding_model = embedding_model
             st.session_state.data_loaded = True
     
-    # Header
-    st.markdown('<div class="main-header">SHL Assessment Recommendation System</div>', unsafe_allow_html=True)
-    st.write("Enter a job description or query to find relevant assessments that match your requirements.")
-    
     # Input section
     col1, col2 = st.columns([3, 1])
     
@@ -88,48 +150,30 @@ def create_streamlit_app():
     # Results section
     if search_btn:
         if query:
-            with st.spinner("Analyzing job description and finding relevant assessments..."):
-                # Extract parameters from the query
-                params = extract_parameters(query, st.session_state.gemini_model)
-                
-                # If user specified a duration, override the extracted value
-                if duration_limit > 0:
-                    params["duration_limit"] = duration_limit
-                
-                # Search for relevant assessments
-                results, trace_id = search_assessments(
+            snapshot = st.session_state.catalog.snapshot
+            fused = LLM_MODE == "fused" and RERANKER == "gemini"
+            results_area = st.empty()
+            
+            def make_stream(llm_client):
+                # Vector results first, then the Gemini-refined list (one call in fused mode)
+                return search_assessments_stream(
                     query=query,
-                    df=st.session_state.df,
+                    df=snapshot.store,
                     embedding_model=st.session_state.embedding_model,
-                    embeddings_array=st.session_state.embeddings_array,
-                    gemini_model=st.session_state.gemini_model,
+                    embeddings_array=snapshot.vector_index,
+                    llm_client=llm_client,
+                    executor=None,
                     top_k=10,
-                    duration_limit=params.get("duration_limit")
+                    duration_limit=duration_limit or None,
+                    filters=snapshot.filters,
+                    lexical_index=snapshot.lexical_index,
+                    fused=fused
                 )
-                
-                # Display results
-                st.markdown(f'<div class="subheader">Found {len(results)} relevant assessments</div>', unsafe_allow_html=True)
-                st.markdown(f"*Trace ID: {trace_id}*")
-                
-                # Show summary of filters applied
-                if params.get("duration_limit"):
-                    st.info(f"🕒 Filter applied: Maximum duration {params.get('duration_limit')} minutes")
-                
-                # Create grid for results
-                for i, (_, row) in enumerate(results.iterrows(), 1):
-                    with st.expander(f"**{i}. {row['title']}** - {row['duration']} min | {row['test_type']}"):
-                        col1, col2 = st.columns([3, 1])
-                        
-                        with col1:
-                            st.markdown(f"**Description:**\n{row['description']}")
-                        
-                        with col2:
-                            st.markdown("**Details:**")
-                            st.markdown(f"🕒 **Duration:** {row['duration']} minutes")
-                            st.markdown(f"📊 **Test Type:** {row['test_type']}")
-                            st.markdown(f"🌐 **Remote Testing:** {row['remote_support']}")
-                            st.markdown(f"⚙️ **Adaptive:** {row['adaptive_support']}")
-                            st.markdown(f"[View Assessment Details]({row['url']})", unsafe_allow_html=True)
+            
+            # Redraw the results area for each event instead of waiting for Gemini
+            for event in iterate_stream(make_stream):
+                with results_area.container():
+                    show_results(event)
         else:
             st.warning("⚠️ Please enter a job description or query.")
     
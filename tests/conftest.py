@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, ROOT)
+# The offline encoder, Gemini model and stub LLM server shared with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+# Keep the traces of test requests out of logs/
+os.environ.setdefault("TRACE_LOG_PATH", os.path.join(tempfile.mkdtemp(prefix="traces_"), "traces.log"))
+
+from stub_llm_server import StubServer, make_handler
+
+
+@contextmanager
+def stub_llm_server(latency_ms=0, faults=None):
+    """Run the stub Gemini endpoint in a thread; yields its base URL"""
+    server = StubServer(("127.0.0.1", 0), make_handler(latency_ms, 0, faults or {}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
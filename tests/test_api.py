@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+import api
+import app.metrics as metrics
+from app.catalog import CatalogManager
+from app.config import DATA_PATH
+from app.cache import SemanticCache
+from app.gemini import AsyncGeminiClient, CircuitBreaker, response_cache
+from app.metrics import LLM_FALLBACKS
+from app.search import search_assessments_stream
+from conftest import ROOT, stub_llm_server
+from fakes import FakeGeminiModel, HashEncoder
+
+
+@pytest.fixture
+def offline_api(tmp_path, monkeypatch):
+    """The API on the source catalog, with the hashing encoder and Gemini stand-ins
+
+    The sync Gemini model (reranking) answers after 100 ms; the async client
+    (parameter extraction) talks to the stub server.
+    """
+    encoder = HashEncoder()
+    manager = CatalogManager(
+        f"{ROOT}/{DATA_PATH}", str(tmp_path / "embeddings"), embedding_model=encoder, retrieval_mode="dense"
+    )
+    manager.reload()
+    gemini = FakeGeminiModel(latency_ms=100)
+    response_cache.memory.clear()
+    with stub_llm_server() as endpoint:
+        client = AsyncGeminiClient(
+            api_key="test", endpoint=endpoint, max_concurrency=32, breaker=CircuitBreaker()
+        )
+        monkeypatch.setattr(api, "catalog", manager)
+        monkeypatch.setattr(api, "embedding_model", encoder)
+        monkeypatch.setattr(api, "gemini_model", gemini)
+        monkeypatch.setattr(api, "llm_client", client)
+        yield TestClient(api.create_app()), gemini
+
+
+def catalog_titles(n):
+    return pd.read_csv(f"{ROOT}/{DATA_PATH}")['title'].tolist()[:n]
+
+
+def test_batch_gets_a_deadline_per_query(offline_api, monkeypatch):
+    http, _ = offline_api
+    # 12 queries with two 100 ms calls each take far longer than one 0.5 s budget in sequence
+    monkeypatch.setattr(api, "LLM_DEADLINE", 0.5)
+    titles = catalog_titles(12)
+    fallbacks = {call: LLM_FALLBACKS.value(call) for call in ("extract_parameters", "rerank")}
+    with stub_llm_server(latency_ms=100) as endpoint:
+        monkeypatch.setattr(api, "llm_client", AsyncGeminiClient(
+            api_key="test", endpoint=endpoint, max_concurrency=32, breaker=CircuitBreaker()
+        ))
+        start = time.perf_counter()
+        response = http.post("/recommend/batch", json={"queries": [{"query": title} for title in titles]})
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == len(titles)
+    # The reranks overlap instead of taking 12 x 100 ms one after another
+    assert elapsed < 0.8
+    # Every query reached Gemini for its extraction and rerank, none fell back
+    assert {call: LLM_FALLBACKS.value(call) for call in fallbacks} == fallbacks
+
+
+def test_batch_matches_single_queries(offline_api, monkeypatch):
+    http, _ = offline_api
+    monkeypatch.setattr(api, "semantic_cache", None)
+    queries = [{"query": title} for title in catalog_titles(8)]
+    queries.append({"query": "Java developer who can collaborate, 40 minutes", "test_types": ["Knowledge & Skills"]})
+    batch = http.post("/recommend/batch", json={"queries": queries})
+    assert batch.status_code == 200
+
+    def urls(recommendations):
+        return [recommendation["url"] for recommendation in recommendations]
+
+    for query, result in zip(queries, batch.json()["results"]):
+        single = http.post("/recommend", json=query)
+        assert single.status_code == 200
+        assert urls(result["recommendations"]) == urls(single.json()["recommendations"])
+
+
+@pytest.mark.parametrize("configured, sent, status", [
+    (None, None, 404),
+    (None, "anything", 404),
+    ("s3cret", None, 403),
+    ("s3cret", "wrong", 403),
+    ("s3cret", "s3cret", 200),
+])
+def test_admin_reload_fails_closed(offline_api, monkeypatch, configured, sent, status):
+    http, _ = offline_api
+    monkeypatch.setattr(api, "ADMIN_TOKEN", configured)
+    headers = {"X-Admin-Token": sent} if sent is not None else {}
+    response = http.post("/admin/reload", headers=headers)
+    assert response.status_code == status
+    if status == 200:
+        assert response.json()["reloaded"] is False
+
+
+@pytest.fixture
+def semantic_cache(offline_api, monkeypatch):
+    cache = SemanticCache(capacity=16, threshold=0.97)
+    monkeypatch.setattr(api, "semantic_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def failing_gemini(monkeypatch):
+    """Point the async Gemini client at an endpoint that always answers 503"""
+    with stub_llm_server(faults={"error_rate": 1.0, "error_status": 503}) as endpoint:
+        client = AsyncGeminiClient(api_key="test", endpoint=endpoint, max_retries=0, breaker=CircuitBreaker())
+        monkeypatch.setattr(api, "llm_client", client)
+        yield
+
+
+@pytest.mark.parametrize("path", ["/recommend", "/recommend/stream"])
+def test_semantic_cache_stores_reranked_results(offline_api, semantic_cache, path):
+    http, _ = offline_api
+    assert http.post(path, json={"query": "Java developer who can collaborate"}).status_code == 200
+    assert semantic_cache.stats()["size"] == 1
+
+
+@pytest.mark.parametrize("path", ["/recommend", "/recommend/stream"])
+def test_semantic_cache_skips_fallback_results(offline_api, semantic_cache, failing_gemini, path):
+    http, _ = offline_api
+    response = http.post(path, json={"query": "Java developer who can collaborate"})
+    assert response.status_code == 200
+    assert semantic_cache.stats()["size"] == 0
+    # The next identical query is not served the vector-order fallback from the cache
+    http.post(path, json={"query": "Java developer who can collaborate"})
+    assert semantic_cache.stats()["hits"] == 0
+
+
+def test_semantic_cache_skips_results_not_reranked_by_gemini(offline_api, semantic_cache):
+    http, _ = offline_api
+    response = http.post("/recommend", json={"query": "Java developer", "reranker": "heuristic"})
+    assert response.status_code == 200
+    assert semantic_cache.stats()["size"] == 0
+
+
+def test_server_timing_and_request_metrics(offline_api, monkeypatch):
+    http, _ = offline_api
+    monkeypatch.setattr(metrics, "SERVER_TIMING_ENABLED", True)
+    requests = metrics.REQUESTS.value("/recommend", "200")
+    response = http.post("/recommend", json={"query": "Java developer who can collaborate"})
+    assert response.status_code == 200
+    stages = [entry.split(";dur=")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert {"encode", "retrieve", "rerank"} <= set(stages)
+    assert metrics.REQUESTS.value("/recommend", "200") == requests + 1
+    assert 'shl_requests_total{endpoint="/recommend",status="200"}' in http.get("/metrics").text
+
+
+def test_stream_sends_vector_results_then_the_reranked_list(offline_api):
+    http, _ = offline_api
+    response = http.post("/recommend/stream", json={"query": "Java developer who can collaborate"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    vector, final = [json.loads(line) for line in response.text.splitlines()]
+    assert (vector["stage"], vector["reranked"], vector["trace_id"]) == ("vector", False, None)
+    assert (final["stage"], final["reranked"]) == ("final", True)
+    assert final["trace_id"] and 0 < len(final["recommendations"]) <= 10
+    assert len(vector["recommendations"]) == 10
+    # The final list matches the non-streaming endpoint
+    single = http.post("/recommend", json={"query": "Java developer who can collaborate"})
+    assert final["recommendations"] == single.json()["recommendations"]
+
+
+def test_stream_as_server_sent_events(offline_api):
+    http, _ = offline_api
+    response = http.post(
+        "/recommend/stream", json={"query": "Python programming"}, headers={"Accept": "text/event-stream"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = [message.split("\n") for message in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in messages] == ["event: vector", "event: final"]
+    assert [json.loads(lines[1].removeprefix("data: "))["stage"] for lines in messages] == ["vector", "final"]
+
+
+def test_stream_keeps_the_vector_order_when_the_llm_is_too_slow(offline_api):
+    snapshot = api.current_snapshot()
+    encoder = HashEncoder()
+
+    async def collect(endpoint):
+        client = AsyncGeminiClient(api_key="test", endpoint=endpoint, max_retries=0, breaker=CircuitBreaker())
+        try:
+            return [event async for event in search_assessments_stream(
+                "Java developer who can collaborate", snapshot.store, encoder, snapshot.vector_index, client,
+                api.search_executor, filters=snapshot.filters, timeout=0.1
+            )]
+        finally:
+            await client.aclose()
+
+    with stub_llm_server(latency_ms=1000) as endpoint:
+        start = time.perf_counter()
+        vector, final = asyncio.run(collect(endpoint))
+        elapsed = time.perf_counter() - start
+    assert elapsed < 0.8
+    assert (vector.stage, final.stage, final.reranked) == ("vector", "final", False)
+    assert final.results['row_id'].tolist() == vector.results['row_id'].tolist()
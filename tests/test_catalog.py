@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+import pytest
+from app.catalog import CatalogManager
+from app.config import DATA_PATH
+from conftest import ROOT
+from fakes import HashEncoder
+
+
+class CountingEncoder(HashEncoder):
+    """HashEncoder that counts the rows it encodes, slowly enough for workers to overlap"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
+
+    def encode(self, sentences, **kwargs):
+        time.sleep(0.2)
+        self.rows += len(sentences)
+        return super().encode(sentences, **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two catalog managers sharing one store directory, like two API workers"""
+    managers = [
+        CatalogManager(os.path.join(ROOT, DATA_PATH), str(tmp_path / "embeddings"), embedding_model=HashEncoder())
+        for _ in range(2)
+    ]
+    for manager in managers:
+        manager.reload()
+        manager.start_watching(interval=0.05)
+    yield managers
+    for manager in managers:
+        manager.stop_watching()
+
+
+def test_reload_request_reaches_the_other_workers(workers):
+    first, second = workers
+    first.reload(force=True)
+    first.request_reload(force=True)
+    assert wait_for(lambda: second.snapshot.version == 2)
+    # The worker that made the request does not reload a second time
+    time.sleep(0.2)
+    assert first.snapshot.version == 2
+
+
+def test_reload_requests_before_watching_are_ignored(workers, tmp_path):
+    first, second = workers
+    first.request_reload(force=True)
+    late = CatalogManager(os.path.join(ROOT, DATA_PATH), str(tmp_path / "embeddings"), embedding_model=HashEncoder())
+    late.reload()
+    late.start_watching(interval=0.05)
+    try:
+        assert wait_for(lambda: second.snapshot.version == 2)
+        time.sleep(0.2)
+        assert late.snapshot.version == 1
+    finally:
+        late.stop_watching()
+
+
+
+def test_one_worker_rebuilds_the_others_map_its_store(tmp_path):
+    encoders = [CountingEncoder() for _ in range(3)]
+    managers = [
+        CatalogManager(os.path.join(ROOT, DATA_PATH), str(tmp_path / "embeddings"), embedding_model=encoder)
+        for encoder in encoders
+    ]
+    threads = [threading.Thread(target=manager.reload) for manager in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rows = len(managers[0].snapshot.df)
+    # The catalog was encoded once in total, not once per worker
+    assert sum(encoder.rows for encoder in encoders) == rows
+    for manager in managers:
+        assert manager.snapshot.embeddings.shape[0] == rows
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pytest
+from app.catalog_store import STORE_COLUMNS, CatalogStore
+from app.config import DATA_PATH
+from app.data_processing import load_and_preprocess_data
+from app.filters import build_filter_columns
+from conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    df = load_and_preprocess_data(os.path.join(ROOT, DATA_PATH))
+    return df, CatalogStore.from_dataframe(df)
+
+
+def test_columns_match_the_dataframe(catalog):
+    df, store = catalog
+    ids = np.array([5, 0, len(df) - 1, 5])
+    for column in STORE_COLUMNS:
+        expected = df[column].to_numpy()[ids]
+        if column == 'duration':
+            expected = expected.astype(np.int32)
+        assert store.column(column, ids).tolist() == expected.tolist()
+    with pytest.raises(KeyError):
+        store.column('combined_text', ids)
+    # The store is shared by every request, so its arrays cannot be written to
+    with pytest.raises(ValueError):
+        store.title[0] = "changed"
+
+
+def test_filter_columns_match_the_dataframe_ones(catalog):
+    df, store = catalog
+    expected, got = build_filter_columns(df), store.filter_columns()
+    for field in ('duration', 'test_type_bits', 'remote', 'adaptive'):
+        np.testing.assert_array_equal(getattr(got, field), getattr(expected, field))
+
+
+def test_recommendations_are_built_once_per_row(catalog):
+    df, store = catalog
+    recommendation = store.recommendation(3)
+    assert store.recommendation(3) is recommendation
+    assert recommendation.model_dump() == {
+        "name": df['title'][3],
+        "url": df['url'][3],
+        "remote_testing_support": df['remote_support'][3],
+        "adaptive_support": df['adaptive_support'][3],
+        "duration": int(df['duration'][3]),
+        "test_type": df['test_type'][3],
+    }
+
+
+def test_candidates_keep_their_order_through_take(catalog):
+    df, store = catalog
+    candidates = store.select([7, 2, 9, 4], [0.9, 0.8, 0.7, 0.6])
+    assert candidates['row_id'].tolist() == [7, 2, 9, 4]
+    assert candidates['title'].tolist() == df['title'].to_numpy()[[7, 2, 9, 4]].tolist()
+    taken = candidates.take([2, 0])
+    assert taken['row_id'].tolist() == [9, 7]
+    assert taken['similarity_score'].tolist() == pytest.approx([0.7, 0.9])
+    assert candidates.take(slice(0, 2))['row_id'].tolist() == [7, 2]
+    assert taken.to_records(['url', 'duration']) == [
+        {"url": df['url'][i], "duration": int(df['duration'][i])} for i in (9, 7)
+    ]
+    assert [r.url for r in taken.recommendations()] == [df['url'][9], df['url'][7]]
+    assert taken.to_frame()['title'].tolist() == [df['title'][9], df['title'][7]]
+    assert store.select([], []).empty
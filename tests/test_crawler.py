@@ -0,0 +1,185 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "data", "crawler"))
+from crawler import CATALOG_PATH, FIELDNAMES, Crawler, merge_into_csv
+
+CATALOG = CATALOG_PATH.rstrip("/")
+FIXTURES = os.path.join(ROOT, "tests", "fixtures", "crawler")
+
+# Saved catalog pages by request path. Both listing pages link to some of the same
+# assessments (once relatively, once with a fragment); "flaky" fails on its first
+# request and "broken" always fails
+SITE = {
+    f"{CATALOG}/": "catalog.html",
+    f"{CATALOG}/?start=12": "catalog_start_12.html",
+    **{f"{CATALOG}/view/{name}/": f"{name}.html" for name in ("alpha", "beta", "gamma", "flaky")}
+}
+LAST_MODIFIED = "Wed, 01 Oct 2025 08:00:00 GMT"
+
+
+class CatalogSite:
+    """Fixture copy of the catalog site; pages maps paths to fixture files and may be changed between crawls"""
+
+    def __init__(self):
+        self.pages = dict(SITE)
+        self.hits = Counter()
+        self.not_modified = Counter()
+        # Conditional headers of the last request per path
+        self.validators = {}
+        self.url = None
+
+
+@pytest.fixture
+def catalog_site():
+    """Serve the saved pages with ETag and Last-Modified, answering 304 when they match"""
+    site = CatalogSite()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site.hits[self.path] += 1
+            site.validators[self.path] = (self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since"))
+            failing = self.path.endswith("/broken/") or (self.path.endswith("/flaky/") and site.hits[self.path] == 1)
+            name = site.pages.get(self.path)
+            if failing or name is None:
+                self.send_response(500 if failing else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with open(os.path.join(FIXTURES, name), "rb") as f:
+                payload = f.read()
+            etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                site.not_modified[self.path] += 1
+                self.send_response(304)
+                payload = b""
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield site
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def crawl(base_url, state_path, concurrency=2, **kwargs):
+    crawler = Crawler(
+        base_url=base_url, state_path=state_path, concurrency=concurrency, min_interval=0, max_retries=0,
+        backoff=0, **kwargs
+    )
+    try:
+        return crawler.crawl(), crawler
+    finally:
+        crawler.close()
+
+
+def test_crawl_follows_pagination_and_fetches_each_page_once(catalog_site, tmp_path):
+    base_url, hits = catalog_site.url, catalog_site.hits
+    records, _ = crawl(base_url, str(tmp_path / "state.json"))
+    assert sorted(record['title'] for record in records) == ["Alpha", "Beta", "Flaky", "Gamma"]
+    assert all(record['duration'] == 20 for record in records)
+    alpha = next(record for record in records if record['title'] == "Alpha")
+    assert alpha['test_type'] == "Knowledge & Skills"
+    assert alpha['remote_support'] == "Yes"
+    # Links repeated across pages, relative or with a fragment are fetched once
+    pages = [f"{CATALOG}/", f"{CATALOG}/?start=12"] + [f"{CATALOG}/view/{name}/" for name in ("alpha", "beta", "gamma")]
+    assert [hits[path] for path in pages] == [1] * len(pages)
+
+
+def test_failed_page_is_queued_again_a_bounded_number_of_times(catalog_site, tmp_path):
+    base_url, hits = catalog_site.url, catalog_site.hits
+    records, crawler = crawl(base_url, str(tmp_path / "state.json"), page_retries=2)
+    # The page that failed once is crawled on its second try, the broken one is given up
+    assert "Flaky" in [record['title'] for record in records]
+    assert hits[f"{CATALOG}/view/flaky/"] == 2
+    assert hits[f"{CATALOG}/view/broken/"] == 3
+    assert crawler.stats["failed"] == 4
+
+
+def test_page_given_up_on_is_kept_for_a_resumed_crawl(catalog_site, tmp_path):
+    base_url, hits = catalog_site.url, catalog_site.hits
+    state_path = str(tmp_path / "state.json")
+    # One page at a time: both catalog pages, alpha, beta, gamma, then flaky fails and
+    # the crawl stops at max_pages with broken still pending
+    crawl(base_url, state_path, concurrency=1, page_retries=0, max_pages=6)
+    with open(state_path, encoding="utf-8") as f:
+        state = json.load(f)
+    assert f"{base_url}{CATALOG}/view/flaky/" in state["frontier"]
+    assert f"{base_url}{CATALOG}/view/flaky/" not in state["visited"]
+    records, _ = crawl(base_url, state_path, concurrency=1, page_retries=0)
+    assert [record['title'] for record in records if record['title'] == "Flaky"] == ["Flaky"]
+    assert hits[f"{CATALOG}/view/flaky/"] == 2
+    assert hits[f"{CATALOG}/view/gamma/"] == 1
+
+
+def test_recrawl_sends_validators_and_reuses_unchanged_pages(catalog_site, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    first, _ = crawl(catalog_site.url, state_path)
+    assert all(catalog_site.validators[path] == (None, None) for path in SITE)
+
+    second, crawler = crawl(catalog_site.url, state_path)
+    # Every page from the first crawl is revalidated, answered 304 and taken from the state
+    for path in SITE:
+        etag, last_modified = catalog_site.validators[path]
+        assert etag is not None and last_modified == LAST_MODIFIED
+        assert catalog_site.not_modified[path] == 1
+    assert crawler.stats["fetched"] == 0
+    assert crawler.stats["not_modified"] == len(SITE)
+    assert sorted(second, key=lambda record: record['url']) == sorted(first, key=lambda record: record['url'])
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['url']: row for row in csv.DictReader(f)}
+
+
+def test_complete_crawl_drops_assessments_gone_from_the_site(catalog_site, tmp_path):
+    state_path, csv_path = str(tmp_path / "state.json"), str(tmp_path / "catalog.csv")
+    retired = f"{catalog_site.url}{CATALOG}/view/retired/"
+    with open(csv_path, "w", newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerow({field: "" for field in FIELDNAMES} | {"url": retired, "title": "Retired"})
+
+    # "flaky" and "broken" could not be crawled, so rows missing from this crawl may still be on the site
+    records, crawler = crawl(catalog_site.url, state_path, page_retries=0)
+    assert not crawler.complete
+    merge_into_csv(records, csv_path, complete=crawler.complete)
+    assert sorted(row['title'] for row in read_csv(csv_path).values()) == ["Alpha", "Beta", "Gamma", "Retired"]
+
+    # Gamma and broken are withdrawn: the listing no longer links them and gamma's page is gone
+    catalog_site.pages[f"{CATALOG}/?start=12"] = "catalog_start_12_withdrawn.html"
+    del catalog_site.pages[f"{CATALOG}/view/gamma/"]
+    records, crawler = crawl(catalog_site.url, state_path, page_retries=0)
+    assert crawler.complete
+    merge_into_csv(records, csv_path, complete=crawler.complete)
+    assert sorted(row['title'] for row in read_csv(csv_path).values()) == ["Alpha", "Beta", "Flaky"]
+
+
+def test_gone_page_is_not_a_failure(catalog_site, tmp_path):
+    del catalog_site.pages[f"{CATALOG}/view/gamma/"]
+    records, crawler = crawl(catalog_site.url, str(tmp_path / "state.json"))
+    assert "Gamma" not in [record['title'] for record in records]
+    assert crawler.stats["gone"] == 1
+    assert catalog_site.hits[f"{CATALOG}/view/gamma/"] == 1
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+from app.config import DATA_PATH
+from app.data_processing import create_embeddings, load_and_preprocess_data
+from app.embedding_store import (
+    MANIFEST_FILE, embeddings_path, l2_normalize, load_embedding_store, read_manifest, write_embedding_store
+)
+from conftest import ROOT
+from fakes import HashEncoder
+
+TEXTS = [f"assessment {i} for skill{i} and topic{i % 7}" for i in range(40)]
+
+
+def expected(texts):
+    return l2_normalize(HashEncoder().encode(texts))
+
+def write(store_dir, chunks, model_name="hash"):
+    return write_embedding_store(chunks, sum(len(chunk) for chunk in chunks), HashEncoder(), str(store_dir), model_name)
+
+
+def test_rebuild_swaps_manifest_and_vectors_together(tmp_path):
+    first = write(tmp_path, [TEXTS])
+    first_file = embeddings_path(str(tmp_path), read_manifest(str(tmp_path)))
+    texts = TEXTS[::-1]
+    write(tmp_path, [texts])
+    manifest = read_manifest(str(tmp_path))
+    # The new manifest names a new file; the old one is gone, its mapping still readable
+    assert embeddings_path(str(tmp_path), manifest) != first_file
+    assert not os.path.exists(first_file)
+    np.testing.assert_allclose(first, expected(TEXTS))
+    np.testing.assert_allclose(load_embedding_store(str(tmp_path), "hash"), expected(texts))
+    assert sorted(os.listdir(tmp_path)) == sorted([MANIFEST_FILE, os.path.basename(embeddings_path(str(tmp_path), manifest))])
+
+
+def test_copy_keeps_its_row_mapping_when_another_rebuild_lands(tmp_path):
+    write(tmp_path, [TEXTS])
+
+    def chunks():
+        yield TEXTS[:20]
+        # Another worker swaps in a store with a different row order mid-copy
+        write(tmp_path, [TEXTS[::-1][:30]])
+        yield TEXTS[20:]
+
+    result = write_embedding_store(chunks(), len(TEXTS), HashEncoder(), str(tmp_path), "hash")
+    np.testing.assert_allclose(result, expected(TEXTS))
+    np.testing.assert_allclose(load_embedding_store(str(tmp_path), "hash"), expected(TEXTS))
+    # Only the published store is left on disk
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_failed_build_leaves_the_previous_store(tmp_path):
+    write(tmp_path, [TEXTS])
+    before = sorted(os.listdir(tmp_path))
+
+    def chunks():
+        yield TEXTS[:20]
+        raise RuntimeError("CSV went away")
+
+    try:
+        write_embedding_store(chunks(), len(TEXTS), HashEncoder(), str(tmp_path), "hash")
+    except RuntimeError:
+        pass
+    assert sorted(os.listdir(tmp_path)) == before
+    np.testing.assert_allclose(load_embedding_store(str(tmp_path), "hash"), expected(TEXTS))
+
+
+class CountingEncoder(HashEncoder):
+    """HashEncoder that records the texts it is asked to encode"""
+
+    def __init__(self, dim=384):
+        super().__init__(dim)
+        self.encoded = []
+
+    def encode(self, sentences, **kwargs):
+        self.encoded.extend(sentences)
+        return super().encode(sentences, **kwargs)
+
+
+def test_create_embeddings_reencodes_changed_rows_and_model_changes(tmp_path):
+    csv_path = tmp_path / "catalog.csv"
+    store_dir = str(tmp_path / "store")
+    raw = pd.read_csv(os.path.join(ROOT, DATA_PATH))
+    raw.to_csv(csv_path, index=False)
+    create_embeddings(load_and_preprocess_data(str(csv_path)), str(csv_path), store_dir, CountingEncoder())
+
+    raw.loc[3, 'description'] = "Measures reading comprehension of technical manuals."
+    raw.to_csv(csv_path, index=False)
+    df = load_and_preprocess_data(str(csv_path))
+    encoder = CountingEncoder()
+    create_embeddings(df, str(csv_path), store_dir, encoder)
+    assert encoder.encoded == [df['combined_text'][3]]
+    assert read_manifest(store_dir)["model_name"] == "hash-384"
+
+    # Vectors of another model are never reused, and the store records the model used
+    encoder = CountingEncoder(dim=256)
+    _, embeddings = create_embeddings(df, str(csv_path), store_dir, encoder)
+    assert encoder.encoded == df['combined_text'].tolist()
+    assert read_manifest(store_dir)["model_name"] == "hash-256"
+    np.testing.assert_allclose(embeddings, l2_normalize(HashEncoder(256).encode(df['combined_text'].tolist())))
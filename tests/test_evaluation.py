@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import pytest
+from app.catalog_store import CatalogStore
+from app.config import RERANK_LIMIT
+from app.evaluation import calculate_metrics, evaluate_query_file, evaluate_rankings
+
+
+def loop_metrics(predictions, ground_truth, k):
+    """The per-query loop calculate_metrics replaced, counting each predicted and relevant ID once"""
+    recalls, aps = [], []
+    for pred, truth in zip(predictions, ground_truth):
+        truth = set(truth)
+        if not truth:
+            continue
+        pred_k = pred[:k]
+        recalls.append(len(set(pred_k) & truth) / len(truth))
+        ap, relevant_count, seen = 0, 0, set()
+        for i, p in enumerate(pred_k):
+            if p in truth and p not in seen:
+                relevant_count += 1
+                ap += relevant_count / (i + 1)
+            seen.add(p)
+        aps.append(ap / min(k, len(truth)))
+    mean = lambda values: sum(values) / len(values) if values else 0
+    return mean(recalls), mean(aps)
+
+
+@pytest.mark.parametrize("predictions, ground_truth, expected", [
+    ([["a", "a", "a"]], [["a", "b", "c"]], (1 / 3, 1 / 3)),
+    ([["a", "a", "b"]], [["a", "c"]], (0.5, 0.5)),
+    ([["a", "b", "a"]], [["a", "b"]], (1.0, 1.0)),
+])
+def test_repeated_predictions_count_once(predictions, ground_truth, expected):
+    assert calculate_metrics(predictions, ground_truth, 3) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("k", [1, 3, 5, 10])
+def test_matches_the_loop_with_duplicates(k):
+    rng = random.Random(k)
+    ids = [f"id{i}" for i in range(8)]
+    # A small ID pool, so predictions and ground truth both repeat IDs often
+    predictions = [rng.choices(ids, k=rng.randint(0, 12)) for _ in range(500)]
+    ground_truth = [rng.choices(ids, k=rng.randint(0, 4)) for _ in range(500)]
+    assert calculate_metrics(predictions, ground_truth, k) == pytest.approx(loop_metrics(predictions, ground_truth, k))
+
+
+def test_precision_and_mrr_ignore_repeats():
+    metrics = evaluate_rankings([["b", "b", "a"]], [["b", "c"]], ks=(3,))
+    assert metrics["precision@3"] == pytest.approx(1 / 3)
+    assert metrics["mrr@3"] == 1.0
+    assert metrics["recall@3"] == 0.5
+
+
+@pytest.mark.parametrize("predictions, ground_truth", [
+    # -1 codes for None made (query 1, None) collide with (query 0, "a")
+    ([["b"], [None]], [["a"], ["c"]]),
+    ([["a", None], [None, "c"]], [[None], ["c", "d"]]),
+])
+def test_missing_ids_do_not_collide_across_queries(predictions, ground_truth):
+    assert calculate_metrics(predictions, ground_truth, 2) == pytest.approx(loop_metrics(predictions, ground_truth, 2))
+    precision = evaluate_rankings(predictions, ground_truth, ks=(1,), per_query=True)["precision@1"]
+    assert precision.tolist() == [float(pred[0] in truth) for pred, truth in zip(predictions, ground_truth)]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    from app.config import DATA_PATH
+    from app.data_processing import load_and_preprocess_data
+    from app.embedding_store import l2_normalize
+    from conftest import ROOT
+    from fakes import HashEncoder
+    df = load_and_preprocess_data(os.path.join(ROOT, DATA_PATH))
+    encoder = HashEncoder()
+    return df, encoder, l2_normalize(encoder.encode(df['combined_text'].tolist()))
+
+
+@pytest.mark.parametrize("name", ["none", "heuristic"])
+def test_rerankers_keep_the_limit_they_are_given(catalog, name):
+    from app.rerankers import get_reranker
+    from app.search import encode_queries, retrieve_candidates
+    df, encoder, embeddings = catalog
+    query = df['title'][0]
+    store = CatalogStore.from_dataframe(df)
+    candidates = retrieve_candidates(
+        encode_queries(encoder, [query])[0], store, embeddings, store.filter_columns(), top_k=20
+    )
+    assert len(get_reranker(name).rerank(query, candidates, limit=20)) == 20
+    assert len(get_reranker(name).rerank(query, candidates, limit=3)) == 3
+
+
+def test_query_file_evaluation_ranks_past_the_default_limit(catalog, tmp_path):
+    df, encoder, embeddings = catalog
+    k = RERANK_LIMIT + 10
+    # Every assessment is relevant, so precision@k is 1.0 only if k results come back
+    path = tmp_path / "queries.jsonl"
+    path.write_text("\n".join(
+        json.dumps({"query": query, "relevant": df['url'].tolist()}) for query in df['title'][:5]
+    ))
+    metrics = evaluate_query_file(str(path), CatalogStore.from_dataframe(df), encoder, embeddings, ks=(k,))
+    assert metrics[f"precision@{k}"] == pytest.approx(1.0)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import pytest
+from app.cache import LRUCache, ResponseCache
+from app.catalog_store import CatalogStore
+from app.config import DATA_PATH
+from app.data_processing import load_and_preprocess_data
+from app.gemini import (
+    DEFAULT_PARAMS, CircuitBreaker, extract_and_rerank, extract_parameters, extract_parameters_async,
+    rerank_with_gemini, rerank_with_gemini_async
+)
+from app.prompts import candidate_block
+from conftest import ROOT
+from fakes import FakeResponse
+
+
+class CannedModel:
+    """Gemini SDK stand-in giving the same answer to every prompt"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt: str, request_options=None):
+        self.calls += 1
+        return FakeResponse(self.text)
+
+
+class CannedClient:
+    """AsyncGeminiClient stand-in giving the same answer to every prompt"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.breaker = CircuitBreaker()
+
+    async def generate(self, prompt: str) -> str:
+        return self.text
+
+
+@pytest.fixture(scope="module")
+def candidates():
+    store = CatalogStore.from_dataframe(load_and_preprocess_data(os.path.join(ROOT, DATA_PATH)))
+    return store.select(list(range(20)), [1.0 - i / 100 for i in range(20)])
+
+
+def empty_cache():
+    return ResponseCache(LRUCache(maxsize=16))
+
+
+def ids(results):
+    return results['url'].tolist()
+
+
+@pytest.mark.parametrize("answer", ['{"ranking": [3, 1]}', "[]", '["3", "1"]', "[true, 99, -1]", '"3"'])
+def test_unusable_ranking_falls_back_and_is_not_cached(candidates, answer):
+    cache = empty_cache()
+    results = rerank_with_gemini("Java developer", candidates, CannedModel(answer), cache)
+    assert ids(results) == ids(candidates)[:10]
+    assert cache.memory.stats()["size"] == 0
+    results = asyncio.run(rerank_with_gemini_async("Java developer", candidates, CannedClient(answer), cache))
+    assert ids(results) == ids(candidates)[:10]
+    assert cache.memory.stats()["size"] == 0
+
+
+def test_ranking_keeps_valid_ids_and_is_cached(candidates):
+    cache = empty_cache()
+    model = CannedModel("[3, 99, 1]")
+    results = rerank_with_gemini("Java developer", candidates, model, cache)
+    assert ids(results) == [ids(candidates)[3], ids(candidates)[1]]
+    # The second call is answered from the cache
+    assert ids(rerank_with_gemini("Java developer", candidates, model, cache)) == ids(results)
+    assert model.calls == 1
+
+
+def test_fused_answer_ranking_no_candidate_falls_back(candidates):
+    cache = empty_cache()
+    model = CannedModel('{"duration_limit": 30, "ranking": [42]}')
+    params, results = extract_and_rerank("Java developer in 30 minutes", candidates, model, cache)
+    assert ids(results) == ids(candidates)[:10]
+    assert params["duration_limit"] == 30
+    assert cache.memory.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("answer", [
+    '{"duration_limit": "30 minutes", "skills": ["Java"]}', '{"skills": "Java"}', '["Java"]', "not json"
+])
+def test_invalid_parameters_fall_back_and_are_not_cached(answer):
+    cache = empty_cache()
+    assert extract_parameters("Java developer in 30 minutes", CannedModel(answer), cache) == DEFAULT_PARAMS
+    params = asyncio.run(extract_parameters_async("Java developer in 30 minutes", CannedClient(answer), cache))
+    assert params == DEFAULT_PARAMS
+    assert cache.memory.stats()["size"] == 0
+
+
+def test_parameters_are_validated_and_cached():
+    cache = empty_cache()
+    model = CannedModel('{"duration_limit": "30", "skills": ["Java"], "level": null}')
+    params = extract_parameters("Java developer in 30 minutes", model, cache)
+    assert params == {"duration_limit": 30, "skills": ["Java"], "level": None}
+    assert extract_parameters("Java developer in 30 minutes", model, cache) == params
+    assert model.calls == 1
+
+
+def test_json_prompt_records_carry_the_ids_to_rank_by(candidates):
+    block, n_rows = candidate_block(candidates, prompt_format="json")
+    records = json.loads(block)
+    assert n_rows == len(candidates)
+    assert [record["id"] for record in records] == list(range(len(candidates)))
+    assert [record["title"] for record in records] == candidates['title'].tolist()
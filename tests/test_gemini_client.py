@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from app.gemini import AsyncGeminiClient, CircuitBreaker, LLMUnavailable, llm_deadline
+from conftest import stub_llm_server
+
+
+@pytest.fixture
+def stub_endpoint():
+    """A healthy stub Gemini endpoint answering after 400 ms"""
+    with stub_llm_server(latency_ms=400) as endpoint:
+        yield endpoint
+
+
+def run_saturated(endpoint, breaker, n_requests=20, deadline=None):
+    """n_requests concurrent calls through a client with 2 slots and a 1 s attempt timeout"""
+    client = AsyncGeminiClient(
+        api_key="test", endpoint=endpoint, timeout=1.0, max_concurrency=2, max_retries=0, breaker=breaker
+    )
+
+    async def one():
+        if deadline is None:
+            return await client.generate("Extract the following parameters: Java developer")
+        with llm_deadline(deadline):
+            return await client.generate("Extract the following parameters: Java developer")
+
+    async def run():
+        try:
+            return await asyncio.gather(*(one() for _ in range(n_requests)), return_exceptions=True)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_queueing_for_a_slot_is_not_an_upstream_failure(stub_endpoint):
+    # 20 requests over 2 slots wait up to ~4 s for a slot, far past the 1 s attempt timeout
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    results = run_saturated(stub_endpoint, breaker)
+    assert all(isinstance(result, str) for result in results)
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_exhausted_deadline_does_not_trip_the_breaker(stub_endpoint):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    results = run_saturated(stub_endpoint, breaker, deadline=1.5)
+    answered = [result for result in results if isinstance(result, str)]
+    skipped = [result for result in results if isinstance(result, LLMUnavailable)]
+    assert answered and skipped
+    assert len(answered) + len(skipped) == len(results)
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    # The next request still reaches Gemini
+    assert isinstance(run_saturated(stub_endpoint, breaker, n_requests=1)[0], str)
+
+
+def test_upstream_errors_still_open_the_breaker():
+    with stub_llm_server(faults={"error_rate": 1.0, "error_status": 503}) as endpoint:
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        run_saturated(endpoint, breaker, n_requests=3)
+        assert breaker.state == "open"
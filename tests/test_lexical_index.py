@@ -0,0 +1,98 @@
+import math
+import numpy as np
+import pytest
+import app.search as search
+from app.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize, weighted_fusion
+from app.search import hybrid_search
+from app.vector_index import ExactIndex
+
+DOCS = [
+    "Java programming test",
+    "Java Java Spring framework",
+    "Python programming",
+    "Leadership personality questionnaire",
+    "Numerical reasoning",
+]
+
+# Dense similarities to QUERY_VECTOR: 0.6, 0.0, 0.8, 1.0, -1.0, so the dense order is 3, 2, 0, 1, 4
+VECTORS = np.array([[0.6, 0.8], [0.0, 1.0], [0.8, 0.6], [1.0, 0.0], [-1.0, 0.0]], dtype=np.float32)
+QUERY_VECTOR = np.array([1.0, 0.0], dtype=np.float32)
+DENSE_ORDER = [3, 2, 0, 1, 4]
+
+
+def bm25_scores(query, docs, k1=1.5, b=0.75):
+    """Okapi BM25 of every document, term by term"""
+    tokenized = [tokenize(doc) for doc in docs]
+    avg_length = sum(map(len, tokenized)) / len(tokenized)
+    scores = [0.0] * len(docs)
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(term in tokens for tokens in tokenized)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, tokens in enumerate(tokenized):
+            tf = tokens.count(term)
+            scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avg_length))
+    return scores
+
+
+def test_bm25_matches_the_okapi_formula():
+    index = BM25Index.from_texts(DOCS)
+    expected = bm25_scores("java programming", DOCS)
+    ids, scores = index.search("java programming", 5)
+    # Only rows sharing a query term are returned, best first
+    assert ids.tolist() == sorted((i for i, score in enumerate(expected) if score > 0), key=lambda i: -expected[i])
+    np.testing.assert_allclose(scores, [expected[i] for i in ids], rtol=1e-5)
+    mask = np.array([False, True, True, True, True])
+    assert 0 not in index.search("java programming", 5, mask)[0].tolist()
+    assert len(index.search("the of and", 5)[0]) == 0
+
+
+def test_fusions_by_hand():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert fused == pytest.approx({1: 1 / 61 + 1 / 62, 2: 1 / 62, 3: 1 / 63 + 1 / 61})
+    fused = weighted_fusion(
+        [(np.array([0, 1, 2]), np.array([0.9, 0.5, 0.1])), (np.array([2, 3]), np.array([4.0, 2.0]))], [0.7, 0.3]
+    )
+    assert fused == pytest.approx({0: 0.7, 1: 0.35, 2: 0.3, 3: 0.0})
+    # An empty list adds nothing
+    assert weighted_fusion([(np.array([5]), np.array([1.0])), (np.array([]), np.array([]))], [0.5, 0.5]) == {5: 0.0}
+
+
+def test_hybrid_search_fuses_dense_and_bm25_ranks(monkeypatch):
+    monkeypatch.setattr(search, "HYBRID_FUSION", "rrf")
+    lexical = BM25Index.from_texts(DOCS)
+    lexical_order = lexical.search("java programming", 5)[0].tolist()
+
+    def rrf(doc):
+        score = 1 / (60 + DENSE_ORDER.index(doc) + 1)
+        return score + (1 / (60 + lexical_order.index(doc) + 1) if doc in lexical_order else 0)
+
+    ids, scores = hybrid_search("java programming", QUERY_VECTOR, ExactIndex(VECTORS), lexical, None, 3)
+    assert ids.tolist() == sorted(range(5), key=lambda doc: -rrf(doc))[:3]
+    # The fused ids come back with their dense similarity
+    np.testing.assert_allclose(scores, VECTORS[ids] @ QUERY_VECTOR)
+
+
+def test_weighted_hybrid_search(monkeypatch):
+    monkeypatch.setattr(search, "HYBRID_FUSION", "weighted")
+    monkeypatch.setattr(search, "HYBRID_DENSE_WEIGHT", 0.5)
+    lexical = BM25Index.from_texts(DOCS)
+    lexical_scores = bm25_scores("java programming", DOCS)
+    low, high = min(s for s in lexical_scores if s > 0), max(lexical_scores)
+    dense = VECTORS @ QUERY_VECTOR
+
+    def weighted(doc):
+        score = 0.5 * (dense[doc] + 1) / 2
+        return score + (0.5 * (lexical_scores[doc] - low) / (high - low) if lexical_scores[doc] > 0 else 0)
+
+    ids, _ = hybrid_search("java programming", QUERY_VECTOR, ExactIndex(VECTORS), lexical, None, 5)
+    assert ids.tolist() == sorted(range(5), key=lambda doc: -weighted(doc))
+
+
+@pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+def test_hybrid_search_without_lexical_matches_keeps_the_dense_order(monkeypatch, fusion):
+    monkeypatch.setattr(search, "HYBRID_FUSION", fusion)
+    ids, scores = hybrid_search(
+        "situational judgement", QUERY_VECTOR, ExactIndex(VECTORS), BM25Index.from_texts(DOCS), None, 5
+    )
+    assert ids.tolist() == DENSE_ORDER
+    np.testing.assert_allclose(scores, VECTORS[DENSE_ORDER] @ QUERY_VECTOR)
@@ -0,0 +1,49 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import app.metrics as metrics
+from app.metrics import Counter, Histogram, run_in_executor, server_timing_header, start_request_timings, timed
+
+
+def test_counter_and_histogram_render_in_prometheus_format():
+    counter = Counter("test_calls_total", "Calls", ("call",))
+    counter.inc("rerank")
+    counter.inc("rerank", amount=2)
+    assert counter.render() == [
+        "# HELP test_calls_total Calls", "# TYPE test_calls_total counter", 'test_calls_total{call="rerank"} 3'
+    ]
+    histogram = Histogram("test_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "encode")
+    # Buckets are cumulative and a value on a bound counts in that bucket
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stage="encode",le="0.1"} 2',
+        'test_seconds_bucket{stage="encode",le="1"} 3',
+        'test_seconds_bucket{stage="encode",le="+Inf"} 4',
+        'test_seconds_sum{stage="encode"} 2.65',
+        'test_seconds_count{stage="encode"} 4',
+    ]
+
+
+def test_timed_stages_reach_the_request_timings_across_threads(monkeypatch):
+    monkeypatch.setattr(metrics, "SERVER_TIMING_ENABLED", True)
+    observed = metrics.STAGE_SECONDS.count("test_stage")
+
+    def work():
+        with timed("test_stage"):
+            pass
+
+    async def request():
+        request_timings = start_request_timings()
+        timings = {}
+        with timed("test_stage", timings):
+            pass
+        with ThreadPoolExecutor(1) as executor:
+            await run_in_executor(executor, work)
+        return request_timings, timings
+
+    request_timings, timings = asyncio.run(request())
+    assert set(timings) == {"test_stage"}
+    # The executor thread's duration adds to the request's total for the stage
+    assert request_timings["test_stage"] >= timings["test_stage"]
+    assert metrics.STAGE_SECONDS.count("test_stage") == observed + 2
+    assert server_timing_header({"encode": 1.5, "rerank": 20}) == "encode;dur=1.500, rerank;dur=20.000"
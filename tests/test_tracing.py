@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+import queue
+import pandas as pd
+from app.tracing import DroppingQueueHandler, setup_tracing, shutdown_tracing, trace_recommendation
+
+
+def results(titles, scores=None):
+    frame = pd.DataFrame({"title": titles})
+    if scores is not None:
+        frame["similarity_score"] = scores
+    return frame
+
+
+def read_traces(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_trace_file_per_process(tmp_path):
+    shutdown_tracing()
+    path = str(tmp_path / "traces.log")
+    setup_tracing(path, per_process=True)
+    shutdown_tracing()
+    assert os.path.exists(f"{path}.{os.getpid()}")
+    assert not os.path.exists(path)
+
+
+def test_trace_records_one_json_line_per_request(tmp_path):
+    shutdown_tracing()
+    path = str(tmp_path / "traces.log")
+    setup_tracing(path, per_process=False)
+    trace_id = trace_recommendation(
+        "Java developer", {"duration_limit": 30}, results(["A", "B"], [0.91234, 0.5]), results(["B"]),
+        timings={"vector_search": 1.5}
+    )
+    # Not sampled: the request still gets an ID, but nothing is written
+    unsampled = trace_recommendation("Python", {}, results(["C"]), results(["C"]), sample_rate=0.0)
+    shutdown_tracing()
+    [trace] = read_traces(path)
+    assert trace["trace_id"] == trace_id and unsampled != trace_id
+    assert trace["query"] == "Java developer"
+    assert trace["params"] == {"duration_limit": 30}
+    assert trace["timings_ms"] == {"vector_search": 1.5}
+    assert trace["vector_results"] == [{"title": "A", "score": 0.9123}, {"title": "B", "score": 0.5}]
+    # Without separate final results, the reranked ones are final
+    assert trace["reranked_results"] == trace["final_results"] == ["B"]
+
+
+def test_full_queue_drops_and_counts_records():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.emit(logging.makeLogRecord({"msg": {"i": i}}))
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().msg["i"] for _ in range(2)] == [0, 1]
@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pytest
+import app.data_processing as data_processing
+from app.config import DATA_PATH
+from app.data_processing import LazyEmbeddingModel, load_and_preprocess_data, build_vector_index, query_encoder
+from app.embedding_store import build_embedding_store
+from app.vector_index import ExactIndex, QuantizedIndex, quantize_vectors, score_vectors, select_top_k
+from conftest import ROOT
+from fakes import HashEncoder
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return load_and_preprocess_data(os.path.join(ROOT, DATA_PATH))
+
+
+def build_store(catalog, store_dir, model_name="hash", dtype="float32"):
+    return build_embedding_store(catalog, HashEncoder(), str(store_dir), model_name=model_name, dtype=dtype)
+
+
+def saved_fingerprint(store_dir, backend):
+    with open(os.path.join(store_dir, backend, "meta.json"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_ivf_is_rebuilt_when_nlist_changes(catalog, tmp_path, monkeypatch):
+    embeddings = build_store(catalog, tmp_path)
+    monkeypatch.setattr(data_processing, "IVF_NLIST", 4)
+    assert build_vector_index(embeddings, "ivf", str(tmp_path)).nlist == 4
+    monkeypatch.setattr(data_processing, "IVF_NLIST", 6)
+    assert build_vector_index(embeddings, "ivf", str(tmp_path)).nlist == 6
+
+
+def test_loaded_ivf_uses_the_configured_nprobe(catalog, tmp_path, monkeypatch):
+    embeddings = build_store(catalog, tmp_path)
+    monkeypatch.setattr(data_processing, "IVF_NLIST", 6)
+    monkeypatch.setattr(data_processing, "IVF_NPROBE", 2)
+    build_vector_index(embeddings, "ivf", str(tmp_path))
+    monkeypatch.setattr(data_processing, "IVF_NPROBE", 5)
+    index = build_vector_index(embeddings, "ivf", str(tmp_path))
+    assert index.nprobe == 5
+
+
+def test_saved_ivf_reads_the_vectors_from_the_store(catalog, tmp_path, monkeypatch):
+    embeddings = build_store(catalog, tmp_path)
+    monkeypatch.setattr(data_processing, "IVF_NLIST", 6)
+    built = build_vector_index(embeddings, "ivf", str(tmp_path))
+    loaded = build_vector_index(embeddings, "ivf", str(tmp_path))
+    # Only the clusters are saved; the loaded index searches the store's own memory map
+    assert sorted(os.listdir(tmp_path / "ivf")) == ["assignments.npy", "centroids.npy", "meta.json", "removed.npy"]
+    assert loaded is not built and loaded.vectors is embeddings
+    queries = np.asarray(embeddings[:5])
+    for got, want in zip(loaded.search_batch(queries, 10), built.search_batch(queries, 10)):
+        np.testing.assert_array_equal(got[0], want[0])
+
+
+@pytest.mark.parametrize("backend", ["ivf", "quantized"])
+def test_index_is_rebuilt_for_another_model_or_dtype(catalog, tmp_path, backend):
+    build_vector_index(build_store(catalog, tmp_path), backend, str(tmp_path))
+    fingerprints = {saved_fingerprint(tmp_path, backend)}
+    for model_name, dtype in (("hash", "float16"), ("other-hash", "float16")):
+        build_vector_index(build_store(catalog, tmp_path, model_name, dtype), backend, str(tmp_path))
+        fingerprints.add(saved_fingerprint(tmp_path, backend))
+    assert len(fingerprints) == 3
+
+
+def baseline(scores, k):
+    """Full sort, equal scores in index order"""
+    return np.argsort(-scores, kind="stable")[:k]
+
+
+def test_select_top_k_orders_ties_by_index():
+    scores = np.array([0.5, 0.9, 0.9, 0.1, 0.9, 0.5, 0.9], dtype=np.float32)
+    for k in range(len(scores) + 2):
+        assert select_top_k(scores, k).tolist() == baseline(scores, k).tolist()
+
+
+def catalog_queries(catalog):
+    queries = HashEncoder().encode(catalog['title'].tolist() + ["Java developer", "sales manager"])
+    return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 20, 100, 1000])
+def test_exact_index_ranks_like_a_full_sort(catalog, tmp_path, k):
+    embeddings = build_store(catalog, tmp_path)
+    index = ExactIndex(embeddings)
+    queries = catalog_queries(catalog)
+    # Bag-of-words vectors give many rows exactly the same score, e.g. 0.0
+    mask = np.arange(len(catalog)) % 3 != 0
+    similarity_matrix = score_vectors(embeddings, queries.T)
+    batch = index.search_batch(queries, k)
+    masked_batch = index.search_batch(queries, k, [mask] * len(queries))
+    for column, query in enumerate(queries):
+        scores = score_vectors(embeddings, query)
+        assert index.search(query, k)[0].tolist() == baseline(scores, k).tolist()
+        eligible = np.flatnonzero(mask)
+        assert index.search(query, k, mask)[0].tolist() == eligible[baseline(scores[eligible], k)].tolist()
+        scores = similarity_matrix[:, column]
+        assert batch[column][0].tolist() == baseline(scores, k).tolist()
+        assert masked_batch[column][0].tolist() == eligible[baseline(scores[eligible], k)].tolist()
+
+
+@pytest.mark.parametrize("precision", ["int8", "float16"])
+def test_quantized_index_ranks_like_the_exact_index(catalog, tmp_path, precision):
+    embeddings = build_store(catalog, tmp_path)
+    codes, scales = quantize_vectors(embeddings, precision)
+    restored = codes.astype(np.float32) * (scales[:, None] if scales is not None else 1)
+    np.testing.assert_allclose(restored, embeddings, atol=1 / 127)
+    exact, quantized = ExactIndex(embeddings), QuantizedIndex(precision, rescore_factor=4).build(embeddings)
+    queries = catalog_queries(catalog)
+    mask = np.arange(len(catalog)) % 3 != 0
+    for query, batch_hit in zip(queries, quantized.search_batch(queries, 5, [mask] * len(queries))):
+        ids, scores = quantized.search(query, 5)
+        assert ids.tolist() == exact.search(query, 5)[0].tolist()
+        # Returned scores are the full-precision similarities
+        np.testing.assert_allclose(scores, score_vectors(embeddings[ids], query), rtol=1e-6)
+        assert batch_hit[0].tolist() == exact.search(query, 5, mask)[0].tolist()
+
+
+def test_quantized_index_is_reused_per_precision(catalog, tmp_path, monkeypatch):
+    embeddings = build_store(catalog, tmp_path)
+    monkeypatch.setattr(data_processing, "QUANTIZED_PRECISION", "int8")
+    built = build_vector_index(embeddings, "quantized", str(tmp_path))
+    loaded = build_vector_index(embeddings, "quantized", str(tmp_path))
+    # The saved codes are memory-mapped, the full vectors are the store's
+    assert isinstance(loaded.codes, np.memmap) and loaded.vectors is embeddings
+    np.testing.assert_array_equal(loaded.codes, built.codes)
+    monkeypatch.setattr(data_processing, "QUANTIZED_PRECISION", "float16")
+    rebuilt = build_vector_index(embeddings, "quantized", str(tmp_path))
+    assert rebuilt.codes.dtype == np.float16 and rebuilt.scales is None
+    with pytest.raises(ValueError):
+        quantize_vectors(embeddings, "int4")
+
+
+def test_query_encoder_variants_load_lazily():
+    catalog_model = HashEncoder()
+    assert query_encoder(catalog_model, "default") is catalog_model
+    for variant in ("int8", "onnx"):
+        encoder = query_encoder(catalog_model, variant)
+        assert isinstance(encoder, LazyEmbeddingModel)
+        # Same model as the catalog vectors, and nothing is loaded until a query is encoded
+        assert (encoder.model_name, encoder.variant, encoder.loaded) == (catalog_model.model_name, variant, False)
+    with pytest.raises(ValueError):
+        query_encoder(catalog_model, "int4")